@@ -0,0 +1,74 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+# Shared helpers for the daemon benchmarks.  Benchmarks are run from any directory, e.g.:
+#   python3 daemon/benchmarks/bench_pipeline.py --json-output result.json
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+DAEMON_DIR = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+# Make the daemon packages (plugins, events, trackers, etc.) importable the same way the daemon does
+if DAEMON_DIR not in sys.path:
+    sys.path.insert(0, DAEMON_DIR)
+
+
+def percentile(sorted_values, pct):
+    if len(sorted_values) == 0:
+        return None
+    index = min(len(sorted_values) - 1, int(round((pct / 100.0) * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(samples_sec):
+    ''' Summarizes a list of latencies in seconds as milliseconds '''
+    values = sorted(samples_sec)
+    if len(values) == 0:
+        return {'count': 0, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000.0, 4),
+        'p99_ms': round(percentile(values, 99) * 1000.0, 4),
+        'max_ms': round(values[-1] * 1000.0, 4),
+    }
+
+
+def peak_rss_kb():
+    # Linux reports ru_maxrss in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=DAEMON_DIR,
+                                       stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_result(benchmark_name, result, output_path=None):
+    '''
+    Wraps a benchmark result with environment details so runs can be compared across releases.
+    Prints the result and optionally writes it to output_path as JSON
+    '''
+    document = {
+        'benchmark': benchmark_name,
+        'timestamp': int(time.time()),
+        'git_revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'result': result,
+    }
+    print(json.dumps(document, indent=2))
+    if output_path is not None:
+        with open(output_path, 'w') as out_file:
+            json.dump(document, out_file, indent=2)
+    return document
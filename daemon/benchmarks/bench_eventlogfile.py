@@ -0,0 +1,124 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+# Compares eventlogfile_action (single queued writer thread) to the previous implementation, where every
+# action thread wrote through a logging.Logger with a RotatingFileHandler, with many concurrent producers.
+# A small max size is used so that log rotation happens during the run.
+#
+# usage: python3 daemon/benchmarks/bench_eventlogfile.py [--producers N] [--events N] [--json-output out.json]
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+import bench_common
+from comms.event_types import *
+from plugins.actions.eventlogfile_action import eventlogfile_action
+
+
+class LegacyEventLogFile:
+    ''' The previous eventlogfile_action write path, called directly from each producer thread '''
+    def __init__(self, log_file_path, max_size_mb, number_of_log_files):
+        self.file_logger = logging.getLogger(f'bench legacy {log_file_path}')
+        self.file_logger.propagate = False
+        handler = RotatingFileHandler(log_file_path, maxBytes=max_size_mb * 1024 * 1024, backupCount=number_of_log_files)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+        self.file_logger.addHandler(handler)
+        self.file_logger.setLevel(logging.DEBUG)
+        self.handler = handler
+
+    def submit(self, event_data):
+        self.file_logger.info(json.dumps(event_data))
+
+    def shutdown(self):
+        self.handler.close()
+
+
+def make_event(producer, i):
+    return {'event_type': SSHTRACE_EVENT_COMMAND_END, 'ptm_pid': 1000 + producer, 'user_id': 1000, 'username': 'bench',
+            'pts_pid': 2000 + producer, 'shell_pid': 3000 + producer, 'tty_id': producer, 'filename': '/usr/bin/ls',
+            'args': f'ls -la /tmp/{i}', 'exit_code': 0, 'stdout': 'total 0\n' * 4, 'stdout_size': 32,
+            'start_time': 1677084819930 + i, 'end_time': 1677084819940 + i, 'parent_pid': 3000 + producer}
+
+
+def run(writer, num_producers, events_per_producer):
+    latencies = [[] for _ in range(num_producers)]
+    barrier = threading.Barrier(num_producers + 1)
+
+    def produce(producer):
+        events = [make_event(producer, i) for i in range(events_per_producer)]
+        samples = latencies[producer]
+        barrier.wait()
+        for event_data in events:
+            start = time.perf_counter()
+            writer.submit(event_data)
+            samples.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=produce, args=(producer,)) for producer in range(num_producers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    producers_done = time.perf_counter() - start
+    # Shutting down waits for queued events and closes (flushes) the file
+    writer.shutdown()
+    all_written = time.perf_counter() - start
+
+    total_events = num_producers * events_per_producer
+    return {
+        'producer_events_per_sec': round(total_events / producers_done, 1),
+        'written_events_per_sec': round(total_events / all_written, 1),
+        'submit_latency': bench_common.latency_summary([sample for samples in latencies for sample in samples]),
+    }
+
+
+def count_lines(log_file_path):
+    directory = os.path.dirname(log_file_path)
+    base_name = os.path.basename(log_file_path)
+    total = 0
+    for file_name in os.listdir(directory):
+        if file_name.startswith(base_name):
+            with open(os.path.join(directory, file_name), 'rb') as log_file:
+                total += sum(1 for _ in log_file)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='eventlogfile_action benchmark')
+    parser.add_argument('--producers', type=int, default=32, help='Number of concurrent producer threads')
+    parser.add_argument('--events', type=int, default=5000, help='Events per producer')
+    parser.add_argument('--max-size-mb', type=int, default=5, help='Log size before rotation')
+    parser.add_argument('--json-output', default=None, help='Also write the result to this file')
+    args = parser.parse_args()
+
+    result = {'producers': args.producers, 'events_per_producer': args.events}
+    # Keep enough backups that every line can be counted
+    backups = 1000
+    for name in ['rotating_file_handler', 'eventlogfile_action']:
+        directory = tempfile.mkdtemp(prefix='sshlog-bench-')
+        log_file_path = os.path.join(directory, 'events.log')
+        try:
+            if name == 'rotating_file_handler':
+                writer = LegacyEventLogFile(log_file_path, args.max_size_mb, backups)
+            else:
+                writer = eventlogfile_action(f'bench_{name}', None, log_file_path=log_file_path, output_json=True,
+                                             max_size_mb=args.max_size_mb, number_of_log_files=backups)
+            result[name] = run(writer, args.producers, args.events)
+            result[name]['lines_written'] = count_lines(log_file_path)
+        finally:
+            shutil.rmtree(directory)
+
+    bench_common.write_result('eventlogfile', result, args.json_output)
+
+
+if __name__ == '__main__':
+    main()
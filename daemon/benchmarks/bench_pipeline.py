@@ -0,0 +1,429 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+# End-to-end throughput and latency benchmark for the daemon event pipeline:
+#   eventbus_sshtrace_push -> Tracker -> EventPlugin filters -> action executor -> actions
+#
+# Events are either generated synthetically or read from a capture file (daemon --capture).  Actions
+# deliver to local stand-in sinks: a UDP (or TCP) syslog listener, an HTTP server and a temp directory for
+# session logs.  No root, BPF or libsshlog is required.
+#
+# usage: python3 daemon/benchmarks/bench_pipeline.py [--events N] [--replay capture.gz] [--json-output out.json]
+
+import argparse
+import http.server
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+
+import bench_common
+from comms.event_types import *
+from events.event_bus import eventbus_sshtrace_push
+from events.event_capture import EventReplaySource
+from plugins.common.plugin_manager import PluginManager
+from trackers.tracker import Tracker
+
+# Actions use overflow_policy block so that every event is delivered, rather than dropped when the actions fall behind
+PIPELINE_CONFIG = '''
+events:
+  - event: bench_session_recording
+    triggers: [connection_established, connection_close, terminal_update]
+    actions:
+      - action: bench_sessionlog
+        plugin: sessionlog_action
+        log_directory: {session_dir}
+        overflow_policy: block
+
+  - event: bench_syslog_activity
+    triggers: [connection_established, connection_auth_failed, connection_close, command_start, command_finish, file_upload]
+    filters:
+      ignore_existing_logins: True
+    actions:
+      - action: bench_syslog
+
+  - event: bench_failed_commands
+    triggers: [command_finish]
+    filters:
+      command_exit_code: '!= 0'
+    actions:
+      - action: bench_webhook
+        plugin: webhook_action
+        webhook_url: http://127.0.0.1:{http_port}/hook
+        overflow_policy: block
+
+actions:
+  - action: bench_syslog
+    plugin: syslog_action
+    server_address: 127.0.0.1
+    port: {syslog_port}
+    udp: {syslog_udp}
+    overflow_policy: block
+'''
+
+# Additional rules keyed on a single username, to measure dispatch cost as the rule count grows
+EXTRA_RULE_CONFIG = '''
+  - event: bench_user_rule_{index}
+    triggers: [command_start, command_finish]
+    filters:
+      username: bench_user_{index}
+    actions:
+      - action: bench_syslog
+'''
+
+
+class UdpSink(threading.Thread):
+    ''' Counts datagrams sent to a local UDP port (stands in for a syslog server) '''
+    def __init__(self):
+        super(UdpSink, self).__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.received = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sock.recv(65536)
+                self.received += 1
+            except socket.timeout:
+                pass
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sock.close()
+
+
+class TcpSyslogSink(threading.Thread):
+    ''' Counts RFC 6587 octet counted messages sent to a local TCP port (stands in for a TCP syslog server) '''
+    def __init__(self):
+        super(TcpSyslogSink, self).__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.received = 0
+        self._stop_event = threading.Event()
+
+    def _receive(self, conn):
+        conn.settimeout(0.2)
+        buffer = b''
+        while not self._stop_event.is_set():
+            try:
+                data = conn.recv(65536)
+            except socket.timeout:
+                continue
+            if not data:
+                return
+            buffer += data
+            # Each frame is "<length> <message>"
+            while True:
+                space = buffer.find(b' ')
+                if space < 0:
+                    break
+                end = space + 1 + int(buffer[:space])
+                if len(buffer) < end:
+                    break
+                buffer = buffer[end:]
+                self.received += 1
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                self._receive(conn)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.sock.close()
+
+
+class _CountingHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length > 0:
+            self.rfile.read(length)
+        self.server.requests_received += 1
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpSink:
+    ''' Local HTTP server that accepts and counts webhook requests '''
+    def __init__(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _CountingHandler)
+        self.server.daemon_threads = True
+        self.server.requests_received = 0
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def received(self):
+        return self.server.requests_received
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def synthetic_events(num_events, num_sessions, terminal_bytes, seed=1):
+    '''
+    Generates a realistic mix of events: each session connects, runs commands, produces terminal
+    output, and disconnects.  Sessions are interleaved
+    '''
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    events = []
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789 \n'
+    terminal_text = ''.join(rng.choice(alphabet) for _ in range(terminal_bytes))
+
+    for session in range(num_sessions):
+        ptm_pid = 100000 + session
+        events.append({
+            'event_type': SSHTRACE_EVENT_ESTABLISHED_CONNECTION, 'ptm_pid': ptm_pid, 'user_id': 1000 + session,
+            'username': f'bench_user_{session}', 'pts_pid': ptm_pid + 1, 'shell_pid': ptm_pid + 2,
+            'tty_id': session, 'start_time': now_ms, 'end_time': 0,
+            'tcp_info': {'server_ip': '10.0.0.1', 'client_ip': f'10.1.{session // 250}.{session % 250}',
+                         'server_port': 22, 'client_port': 40000 + session}
+        })
+
+    body_events = max(0, num_events - 2 * num_sessions)
+    for i in range(body_events):
+        ptm_pid = 100000 + (i % num_sessions)
+        kind = rng.random()
+        if kind < 0.7:
+            events.append({'event_type': SSHTRACE_EVENT_TERMINAL_UPDATE, 'ptm_pid': ptm_pid,
+                           'terminal_data': '\x1b[32m' + terminal_text + '\x1b[0m',
+                           'data_len': terminal_bytes + 9})
+        else:
+            command_event = SSHTRACE_EVENT_COMMAND_START if kind < 0.85 else SSHTRACE_EVENT_COMMAND_END
+            events.append({'event_type': command_event, 'ptm_pid': ptm_pid, 'filename': 'ls',
+                           'start_time': now_ms, 'end_time': now_ms + 5, 'exit_code': rng.choice([0, 0, 0, 2]),
+                           'stdout_size': 0, 'stdout': '', 'args': '/bin/ls -la /tmp',
+                           'parent_pid': ptm_pid + 2, 'pid': ptm_pid + 10 + i})
+
+    for session in range(num_sessions):
+        ptm_pid = 100000 + session
+        events.append({
+            'event_type': SSHTRACE_EVENT_CLOSE_CONNECTION, 'ptm_pid': ptm_pid, 'user_id': 1000 + session,
+            'username': f'bench_user_{session}', 'pts_pid': ptm_pid + 1, 'shell_pid': ptm_pid + 2,
+            'tty_id': session, 'start_time': now_ms, 'end_time': now_ms + 1000,
+            'tcp_info': {'server_ip': '10.0.0.1', 'client_ip': f'10.1.{session // 250}.{session % 250}',
+                         'server_port': 22, 'client_port': 40000 + session}
+        })
+    return events
+
+
+def replay_events(capture_path):
+    events = []
+    with EventReplaySource(capture_path, speed=0) as source:
+        while source.is_ok():
+            events.extend(source.poll_many(max_events=4096, timeout_ms=0))
+    return events
+
+
+class ActionInstrumentation:
+    '''
+    Wraps every action's execute functions to record queue wait (push -> action start),
+    action run time and end-to-end latency (push -> action finished) per event
+    '''
+    def __init__(self, push_times):
+        self.push_times = push_times
+        self.queue_wait = []
+        self.action_time = []
+        self.end_to_end = []
+        self.invocations = 0
+        self.last_finish = 0
+
+    def _record(self, events, start, finish):
+        for event_data in events:
+            push_time = self.push_times.get(id(event_data))
+            if push_time is None:
+                continue
+            self.queue_wait.append(start - push_time)
+            self.end_to_end.append(finish - push_time)
+        self.action_time.append(finish - start)
+        self.invocations += len(events)
+        self.last_finish = max(self.last_finish, finish)
+
+    def wrap(self, action):
+        original_execute = action.execute
+
+        def timed_execute(event_data):
+            start = time.perf_counter()
+            try:
+                return original_execute(event_data)
+            finally:
+                self._record([event_data], start, time.perf_counter())
+
+        action.execute = timed_execute
+
+        original_execute_batch = getattr(action, 'execute_batch', None)
+        if original_execute_batch is not None:
+            def timed_execute_batch(events):
+                start = time.perf_counter()
+                try:
+                    return original_execute_batch(events)
+                finally:
+                    self._record(events, start, time.perf_counter())
+
+            action.execute_batch = timed_execute_batch
+
+        if action.is_async:
+            original_execute_async = action.execute_async
+            original_execute_batch_async = action.execute_batch_async
+
+            async def timed_execute_async(event_data):
+                start = time.perf_counter()
+                try:
+                    return await original_execute_async(event_data)
+                finally:
+                    self._record([event_data], start, time.perf_counter())
+
+            async def timed_execute_batch_async(events):
+                start = time.perf_counter()
+                try:
+                    return await original_execute_batch_async(events)
+                finally:
+                    self._record(events, start, time.perf_counter())
+
+            action.execute_async = timed_execute_async
+            action.execute_batch_async = timed_execute_batch_async
+
+
+def _wait_for_quiescence(instrumentation, idle_sec=0.5, timeout_sec=120.0):
+    ''' Waits until actions stop executing, meaning all queued work has drained '''
+    start = time.time()
+    last_count = -1
+    last_change = time.time()
+    while time.time() - start < timeout_sec:
+        if instrumentation.invocations != last_count:
+            last_count = instrumentation.invocations
+            last_change = time.time()
+        elif time.time() - last_change > idle_sec:
+            return
+        time.sleep(0.05)
+
+
+def run(events, extra_rules=0, rate=0, syslog_tcp=False):
+    work_dir = tempfile.mkdtemp(prefix='sshlog_bench_')
+    syslog_sink = TcpSyslogSink() if syslog_tcp else UdpSink()
+    syslog_sink.start()
+    http_sink = HttpSink()
+
+    config = PIPELINE_CONFIG.format(session_dir=os.path.join(work_dir, 'sessions'),
+                                    http_port=http_sink.port, syslog_port=syslog_sink.port,
+                                    syslog_udp=not syslog_tcp)
+    if extra_rules > 0:
+        rules = ''.join(EXTRA_RULE_CONFIG.format(index=i) for i in range(extra_rules))
+        config = config.replace('\nactions:\n', rules + '\nactions:\n', 1)
+    config_path = os.path.join(work_dir, 'bench.yaml')
+    with open(config_path, 'w') as config_file:
+        config_file.write(config)
+
+    session_tracker = Tracker()
+    plugin_manager = PluginManager([config_path], session_tracker)
+    if not plugin_manager.plugins_ok():
+        raise RuntimeError(f"Invalid benchmark configuration: {plugin_manager.validation_errors}")
+    plugin_manager.initialize_plugins()
+
+    push_times = {}
+    instrumentation = ActionInstrumentation(push_times)
+    for action in plugin_manager.action_plugins():
+        instrumentation.wrap(action)
+
+    dispatch_times = []
+    interval = (1.0 / rate) if rate > 0 else 0
+    start = time.perf_counter()
+    for i, event_data in enumerate(events):
+        if interval > 0:
+            # Pace the events for latency measurements below saturation
+            delay = start + (i * interval) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        push_time = time.perf_counter()
+        push_times[id(event_data)] = push_time
+        eventbus_sshtrace_push(event_data, session_tracker)
+        dispatch_times.append(time.perf_counter() - push_time)
+    dispatch_done = time.perf_counter()
+
+    _wait_for_quiescence(instrumentation)
+    # The last action to finish marks the end of the run, not the idle wait
+    finished = max(dispatch_done, instrumentation.last_finish)
+
+    action_stats = plugin_manager.action_stats()
+    plugin_manager.shutdown()
+    syslog_sink.stop()
+    http_sink.stop()
+
+    session_bytes = 0
+    session_dir = os.path.join(work_dir, 'sessions')
+    if os.path.isdir(session_dir):
+        for filename in os.listdir(session_dir):
+            session_bytes += os.path.getsize(os.path.join(session_dir, filename))
+
+    duration = finished - start
+    return {
+        'events': len(events),
+        'extra_rules': extra_rules,
+        'target_rate': rate,
+        'duration_sec': round(duration, 4),
+        'events_per_sec': round(len(events) / duration, 1) if duration > 0 else None,
+        'dispatch_events_per_sec': round(len(events) / (dispatch_done - start), 1),
+        'action_invocations': instrumentation.invocations,
+        'stages': {
+            'dispatch': bench_common.latency_summary(dispatch_times),
+            'queue_wait': bench_common.latency_summary(instrumentation.queue_wait),
+            'action': bench_common.latency_summary(instrumentation.action_time),
+            'end_to_end': bench_common.latency_summary(instrumentation.end_to_end),
+        },
+        'peak_rss_kb': bench_common.peak_rss_kb(),
+        'actions': action_stats,
+        'sinks': {
+            'syslog_messages': syslog_sink.received,
+            'http_requests': http_sink.received,
+            'sessionlog_bytes': session_bytes,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSHLog daemon pipeline benchmark")
+    parser.add_argument('--events', type=int, default=20000, help='Number of synthetic events to generate')
+    parser.add_argument('--sessions', type=int, default=50, help='Number of concurrent synthetic sessions')
+    parser.add_argument('--terminal-bytes', type=int, default=512, help='Size of each synthetic terminal update')
+    parser.add_argument('--replay', default=None, help='Use events from a daemon capture file instead of synthetic events')
+    parser.add_argument('--extra-rules', type=int, default=0, help='Add N single-user rules to the configuration')
+    parser.add_argument('--rate', type=float, default=0, help='Events per second to push.  0 pushes as fast as possible')
+    parser.add_argument('--syslog-tcp', action='store_true', help='Send syslog over TCP instead of UDP')
+    parser.add_argument('--json-output', default=None, help='Write machine-readable results to this file')
+    args = parser.parse_args()
+
+    if args.replay is not None:
+        bench_events = replay_events(args.replay)
+    else:
+        bench_events = synthetic_events(args.events, args.sessions, args.terminal_bytes)
+
+    result = run(bench_events, extra_rules=args.extra_rules, rate=args.rate, syslog_tcp=args.syslog_tcp)
+    bench_common.write_result('pipeline', result, args.json_output)
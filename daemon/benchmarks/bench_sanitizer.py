@@ -0,0 +1,105 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+# Compares the session log terminal sanitizer (TerminalSanitizer) to the previous approach of running two
+# regular expressions over every terminal_update chunk.  Measures throughput and counts how often each
+# approach leaves escape sequence garbage when sequences are split across chunks.
+#
+# usage: python3 daemon/benchmarks/bench_sanitizer.py [--megabytes N] [--json-output out.json]
+
+import argparse
+import random
+import re
+import time
+
+import bench_common
+from plugins.actions.sessionlog_action import key_to_text_mapping
+from plugins.common.terminal_sanitizer import TerminalSanitizer
+
+
+class LegacySanitizer:
+    ''' The previous sessionlog_action implementation, applied to each chunk independently '''
+    def __init__(self):
+        self.ansi_escape_regex = re.compile(r'(\x9B|\x1B\[)[0-?]*[ -/]*[@-~]')
+        self.special_char_regex = '|'.join(re.escape(char) for char in key_to_text_mapping)
+
+    def sanitize(self, term_data):
+        decolored_terminal_data = self.ansi_escape_regex.sub('', term_data)
+        return re.sub(self.special_char_regex, lambda m: key_to_text_mapping[m.group(0)], decolored_terminal_data)
+
+    def flush(self):
+        return ''
+
+
+def synthetic_terminal_output(num_chars, seed=1):
+    ''' Shell-like output: prompts with title and color sequences, colored ls output, plain text and keystrokes '''
+    rnd = random.Random(seed)
+    words = ['total', 'drwxr-xr-x', 'root', 'README.md', 'config.yaml', 'sshlog', 'error:', 'done', '4096', 'Jan']
+    pieces = []
+    length = 0
+    while length < num_chars:
+        kind = rnd.random()
+        if kind < 0.05:
+            piece = '\x1b]0;user@host: ~/src\x07\x1b[01;32muser@host\x1b[00m:\x1b[01;34m~/src\x1b[00m$ '
+        elif kind < 0.25:
+            piece = f'\x1b[0m\x1b[01;{rnd.choice([31, 32, 34, 36])}m{rnd.choice(words)}\x1b[0m  '
+        elif kind < 0.30:
+            piece = rnd.choice(['\x08\x1b[K', '\x03', '\x1b[A', '\x1b[?2004h', '\x7f', '\t'])
+        else:
+            piece = ' '.join(rnd.choice(words) for _ in range(rnd.randint(3, 12))) + '\r\n'
+        pieces.append(piece)
+        length += len(piece)
+    return ''.join(pieces)
+
+
+def split_chunks(text, min_size, max_size, seed=2):
+    ''' Splits the text at random offsets, the way terminal_update events split output '''
+    rnd = random.Random(seed)
+    chunks = []
+    offset = 0
+    while offset < len(text):
+        size = rnd.randint(min_size, max_size)
+        chunks.append(text[offset:offset + size])
+        offset += size
+    return chunks
+
+
+def run_sanitizer(sanitizer, chunks):
+    start = time.perf_counter()
+    output = [sanitizer.sanitize(chunk) for chunk in chunks]
+    output.append(sanitizer.flush())
+    elapsed = time.perf_counter() - start
+    return ''.join(output), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Terminal sanitizer benchmark')
+    parser.add_argument('--megabytes', type=float, default=8, help='Amount of terminal output to sanitize')
+    parser.add_argument('--json-output', default=None, help='Also write the result to this file')
+    args = parser.parse_args()
+
+    text = synthetic_terminal_output(int(args.megabytes * 1024 * 1024))
+    # The expected output is the whole stream sanitized at once, where no sequence is split
+    expected = LegacySanitizer().sanitize(text)
+
+    result = {'chars': len(text), 'runs': []}
+    for min_size, max_size in [(1, 64), (64, 1024), (1024, 8192)]:
+        chunks = split_chunks(text, min_size, max_size)
+        for name, sanitizer in [('two_regex', LegacySanitizer()), ('terminal_sanitizer', TerminalSanitizer(key_to_text_mapping))]:
+            output, elapsed = run_sanitizer(sanitizer, chunks)
+            result['runs'].append({
+                'sanitizer': name,
+                'chunk_size': f"{min_size}-{max_size}",
+                'chunks': len(chunks),
+                'mb_per_sec': round(len(text) / elapsed / (1024 * 1024), 2),
+                'chunks_per_sec': round(len(chunks) / elapsed, 1),
+                'matches_unsplit_output': output == expected,
+                'leaked_chars': len(output) - len(expected),
+            })
+
+    bench_common.write_result('sanitizer', result, args.json_output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+# Measures the memory used per active session by the session Tracker, compared to the previous tracker which kept
+# the whole connection_established event dict as the session.  Events are decoded from JSON, as they are when they
+# arrive from libsshlog, so every event has its own copies of the username and IP strings.
+#
+# usage: python3 daemon/benchmarks/bench_session_memory.py [--sessions N] [--users N] [--json-output out.json]
+
+import argparse
+import gc
+import json
+import socket
+import time
+import tracemalloc
+
+import bench_common
+from comms.event_types import *
+from trackers.tracker import Tracker
+
+
+class LegacyTracker:
+    ''' The previous Tracker storage: the event dict itself, with the activity fields added '''
+    def __init__(self):
+        self.connections = {}
+
+    def connection_established(self, event_data):
+        pid_key = event_data['ptm_pid']
+        self.connections[pid_key] = event_data
+        self.connections[pid_key]['last_activity_time'] = round(time.time() * 1000.0)
+        self.connections[pid_key]['last_command'] = ''
+
+
+def make_event_json(session, num_users, num_ips):
+    ptm_pid = 100000 + session * 3
+    return json.dumps({
+        'event_type': SSHTRACE_EVENT_ESTABLISHED_CONNECTION, 'ptm_pid': ptm_pid, 'user_id': 1000 + session % num_users,
+        'username': f'user_{session % num_users}', 'pts_pid': ptm_pid + 1, 'shell_pid': ptm_pid + 2,
+        'tty_id': session, 'start_time': 1677084819930 + session, 'end_time': 0,
+        'start_timeraw': 851155551084463 + session, 'end_timeraw': 0,
+        'tcp_info': {'server_ip': '10.0.0.1', 'client_ip': f'10.1.{(session % num_ips) // 250}.{(session % num_ips) % 250}',
+                     'server_port': 22, 'client_port': 30000 + session % 30000}
+    })
+
+
+def measure(tracker, event_json_list):
+    ''' Returns the bytes still allocated after every event has been given to the tracker '''
+    hostname = socket.gethostname()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for event_json in event_json_list:
+        event_data = json.loads(event_json)
+        # Added to every event by eventbus_sshtrace_push
+        event_data['hostname'] = hostname
+        tracker.connection_established(event_data)
+        del event_data
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session tracker memory benchmark')
+    parser.add_argument('--sessions', type=int, default=5000, help='Number of active sessions')
+    parser.add_argument('--users', type=int, default=20, help='Number of distinct usernames')
+    parser.add_argument('--ips', type=int, default=50, help='Number of distinct client IP addresses')
+    parser.add_argument('--json-output', default=None, help='Also write the result to this file')
+    args = parser.parse_args()
+
+    event_json_list = [make_event_json(session, args.users, args.ips) for session in range(args.sessions)]
+
+    result = {'sessions': args.sessions, 'users': args.users, 'ips': args.ips}
+    for name, tracker in [('event_dict', LegacyTracker()), ('session_record', Tracker())]:
+        retained = measure(tracker, event_json_list)
+        result[name] = {
+            'total_kb': round(retained / 1024.0, 1),
+            'bytes_per_session': round(retained / args.sessions, 1),
+        }
+
+    bench_common.write_result('session_memory', result, args.json_output)
+
+
+if __name__ == '__main__':
+    main()
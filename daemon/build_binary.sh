@@ -20,6 +20,8 @@ pip3 install -r ${SCRIPT_DIR}/requirements.txt
 
 # For example, output will be --hidden-import slack_sdk --hidden-import requests
 HIDDEN_IMPORTS=$(findimports --ignore-stdlib  ${SCRIPT_DIR}/plugins/actions/ ${SCRIPT_DIR}/plugins/filters/ | grep -v 'plugins\.' | grep -v "^\s*$" | sed 's/^\s*/--hidden-import /g' | xargs)
+# aiohttp is imported conditionally by plugins/common/http_client.py, bundle it so HTTP actions run on the asyncio loop
+HIDDEN_IMPORTS="${HIDDEN_IMPORTS} --hidden-import aiohttp"
 
 # Grab all the plugins and add them to the package so that they can be loaded dynamically at runtime
 # format is --add-data 'plugins/actions/logfile_action.py:plugins/actions'
@@ -45,6 +45,22 @@ def print_sessions(sessions_list: SessionListResponseDto, output_json=False):
         logger.info(out_table.get_string(sortby='User'))
 
 
+def print_history_event(event, output_json=False):
+    if output_json:
+        logger.info(json.dumps(event))
+    else:
+        event_formatter = LogFormatter()
+        try:
+            event_str = event_formatter.format(event)
+        except KeyError:
+            # Events recorded without session details (e.g., tcp_info) cannot use the log format
+            event_str = json.dumps(event)
+
+        event_time = event.get('end_time') or event.get('start_time')
+        time_str = _convert_epoch_ms_to_time(event_time) if event_time else ''
+        logger.info(time_str + " " + event_str)
+
+
 def print_event_structured(event, output_json=False):
     if output_json:
         logger.info(json.dumps(event))
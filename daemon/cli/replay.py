@@ -0,0 +1,58 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import sys
+import time
+import logging
+from plugins.common.session_recording import SessionRecordingReader
+from plugins.common.compressed_session_file import read_frames, COMPRESSION_FILE_EXTENSIONS
+
+logger = logging.getLogger('sshlog_client')
+
+
+def replay_recording(file_path, start_seconds=0.0, speed=1.0, idle_time_limit=None):
+    '''
+    Plays a session recording (sessionrecording_action) back to the terminal with its original timing
+    :param start_seconds: Offset into the recording to start playback from
+    :param speed: Playback speed multiplier
+    :param idle_time_limit: Optional maximum pause (in recording seconds) between outputs
+    '''
+    with SessionRecordingReader(file_path) as reader:
+        session_info = reader.header.get('sshlog', {})
+        logger.info(f"Replaying session of {session_info.get('username', 'unknown user')} "
+                    f"from {session_info.get('client_ip', 'unknown ip')}.  Press CTRL+C to exit\n\r")
+
+        last_event_time = None
+        playback_clock = time.monotonic()
+        for event_time, event_code, data in reader.events(start_seconds):
+            if event_code != 'o':
+                continue
+
+            if last_event_time is not None:
+                delay = event_time - last_event_time
+                if idle_time_limit is not None:
+                    delay = min(delay, idle_time_limit)
+                # Schedule against a clock instead of sleeping for each delay, so write time does not add up
+                playback_clock += delay / speed
+                sleep_time = playback_clock - time.monotonic()
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+            last_event_time = event_time
+
+            sys.stdout.write(data)
+            sys.stdout.flush()
+
+
+def print_session_log(file_path, start_time=None):
+    '''
+    Writes a compressed session log (sessionlog_action with compression) to stdout.  Only the frames from
+    start_time onwards are decompressed
+    :param start_time: Optional unix time to start from.  Output starts at the frame containing this time
+    '''
+    if not file_path.endswith(tuple(COMPRESSION_FILE_EXTENSIONS.values())):
+        raise ValueError(f"{file_path} is not a compressed session log, expected one of "
+                         f"{', '.join(COMPRESSION_FILE_EXTENSIONS.values())}")
+    for frame_time, text in read_frames(file_path, start_time=start_time):
+        sys.stdout.write(text)
+    sys.stdout.flush()
@@ -8,18 +8,28 @@ import os
 import sys
 from comms.mq_client import MQClient
 from comms.dtos import SessionListRequestDto, SessionListResponseDto, EventWatchRequestDto, \
-    ShellSendKeysRequestDto, KillSessionRequestDto
-from cli.formatter import print_sessions, print_event_structured
+    ShellSendKeysRequestDto, KillSessionRequestDto, HistoryRequestDto
+from cli.formatter import print_sessions, print_event_structured, print_history_event
 from cli.terminal_emulator import TerminalEmulator, TERM_QUIT_KEY
+from cli.replay import replay_recording, print_session_log
 from comms.event_types import *
 import json
 import os
 import time
+import datetime
 
 
+def parse_history_time(time_str):
+    # Local time, e.g. "2023-04-10" or "2023-04-10 16:15"
+    try:
+        return round(datetime.datetime.fromisoformat(time_str).timestamp() * 1000)
+    except ValueError:
+        logger.error(f"Invalid time {time_str}.  Expected a format like 2023-04-10 or '2023-04-10 16:15'")
+        sys.exit(1)
+
 def request_ptm_pid(tty_id):
-    # First get the sessions list, verify that our session is listed.
-    correlation_id = client.make_request(SessionListRequestDto())
+    # Ask the daemon for the session using this TTY, verify that our session is listed.
+    correlation_id = client.make_request(SessionListRequestDto(tty_id=tty_id))
 
     response = client.listen_for_response(correlation_id)
     if response is None:
@@ -27,9 +37,10 @@ def request_ptm_pid(tty_id):
         sys.exit(1)
     list_data = response.dto_payload  # type: SessionListResponseDto
     ptm_id = -1
-    for sess in list_data.sessions:
-        if sess.tty_id == tty_id:
-            ptm_id = sess.ptm_pid
+    # Older daemons ignore the filter and return every session
+    matching_sessions = [sess for sess in list_data.sessions if sess.tty_id == tty_id]
+    if len(matching_sessions) > 0:
+        ptm_id = matching_sessions[0].ptm_pid
 
     if ptm_id <= 0:
         logger.error(f"Cannot find session with TTY ID {tty_id}")
@@ -76,6 +87,29 @@ if __name__ == "__main__":
     parser_kill = subparsers.add_parser('kill', help='Kill a session')
     parser_kill.add_argument('tty_id', type=int, help='TTY ID of the session to kill')
 
+    # create the parser for the "history" subcommand
+    parser_history = subparsers.add_parser('history', help='Search recorded events (requires an eventstore_action)')
+    parser_history.add_argument('--user', '-u', default='', help='Only events for this username')
+    parser_history.add_argument('--ip', default='', help='Only events from this client IP')
+    parser_history.add_argument('--pid', type=int, default=-1, help='Only events for this session (PTM PID)')
+    parser_history.add_argument('--event-type', '-e', default='', help='Only events of this type (e.g., command_start)')
+    parser_history.add_argument('--since', default=None, help="Only events at or after this local time (e.g., '2023-04-10 16:15')")
+    parser_history.add_argument('--until', default=None, help='Only events before this local time')
+    parser_history.add_argument('--limit', '-n', type=int, default=50, help='Maximum number of events to show, newest first')
+    parser_history.add_argument('--action', default='', help='Name of the eventstore_action to search, if several are configured')
+
+    # create the parser for the "replay" subcommand
+    parser_replay = subparsers.add_parser('replay', help='Play back a session recording')
+    parser_replay.add_argument('file', help='Recording file (.cast) written by sessionrecording_action')
+    parser_replay.add_argument('--start', '-s', type=float, default=0.0, help='Start playback this many seconds into the recording')
+    parser_replay.add_argument('--speed', type=float, default=1.0, help='Playback speed multiplier')
+    parser_replay.add_argument('--idle-time-limit', '-i', type=float, default=None, help='Limit pauses between output to this many seconds')
+
+    # create the parser for the "sessionlog" subcommand
+    parser_sessionlog = subparsers.add_parser('sessionlog', help='Print a compressed session log')
+    parser_sessionlog.add_argument('file', help='Compressed session log (.gz or .zst) written by sessionlog_action')
+    parser_sessionlog.add_argument('--since', default=None, help="Start at the output written at this local time (e.g., '2023-04-10 16:15')")
+
     ## Upload CLI options
     # Upload is handled specially because the arguments (e.g., multiple file paths) is a little different
     #subparser_session = subparsers.add_parser("session", help="Query currently active SSH connections")
@@ -104,6 +138,30 @@ if __name__ == "__main__":
     # add ch to logger
     logger.addHandler(ch)
 
+    if args.command == 'replay':
+        # Recordings are played back locally, the daemon is not needed
+        if args.speed <= 0:
+            logger.error("Playback speed must be greater than 0")
+            sys.exit(1)
+        try:
+            replay_recording(args.file, start_seconds=args.start, speed=args.speed, idle_time_limit=args.idle_time_limit)
+        except (OSError, ValueError) as e:
+            logger.error(f"Unable to replay {args.file}: {e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if args.command == 'sessionlog':
+        # Session logs are read locally, the daemon is not needed
+        start_time = parse_history_time(args.since) / 1000.0 if args.since else None
+        try:
+            print_session_log(args.file, start_time=start_time)
+        except (OSError, ValueError, RuntimeError) as e:
+            logger.error(f"Unable to read {args.file}: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
     client = MQClient()
     if not client.initialized:
         sys.exit(1)
@@ -140,6 +198,39 @@ if __name__ == "__main__":
 
 
 
+    elif args.command == 'history':
+        start_time = parse_history_time(args.since) if args.since else 0
+        end_time = parse_history_time(args.until) if args.until else 0
+
+        # Request pages until the limit is reached or there are no more events
+        HISTORY_PAGE_SIZE = 200
+        remaining = args.limit
+        cursor_time, cursor_id = 0, 0
+        while remaining > 0:
+            request_dto = HistoryRequestDto(username=args.user, client_ip=args.ip, ptm_pid=args.pid,
+                                            event_type=args.event_type, start_time=start_time, end_time=end_time,
+                                            limit=min(remaining, HISTORY_PAGE_SIZE), cursor_time=cursor_time,
+                                            cursor_id=cursor_id, action_name=args.action)
+            correlation_id = client.make_request(request_dto)
+            # Queries over a large history can take longer than the other requests
+            response = client.listen_for_response(correlation_id, timeout_sec=10.0)
+            if response is None:
+                logger.error("Unable to communicate with sshlogd")
+                sys.exit(1)
+
+            history_data = response.dto_payload  # type: HistoryResponseDto
+            if history_data.error:
+                logger.error(history_data.error)
+                sys.exit(1)
+
+            for event in history_data.events:
+                print_history_event(event, output_json=args.json)
+
+            remaining -= len(history_data.events)
+            cursor_time, cursor_id = history_data.next_cursor_time, history_data.next_cursor_id
+            if cursor_id == 0:
+                break
+
     elif args.command == 'watch':
 
         watch_events = [
@@ -20,6 +20,9 @@ SHELL_SENDKEYS_REQUEST = 201
 KILL_SESSION_REQUEST = 301
 KILL_SESSION_RESPONSE = 302
 
+HISTORY_REQUEST = 401
+HISTORY_RESPONSE = 402
+
 class SerializableMessage:
     def __init__(self, dto_payload):
         self.payload_type = dto_payload.payload_type
@@ -58,6 +61,10 @@ class ResponseMessage(SerializableMessage):
 @dataclass_json
 @dataclass(frozen=True)
 class SessionListRequestDto:
+    # Only return sessions matching these values.  Empty (or -1) values are not filtered on
+    tty_id: int = -1
+    username: str = ''
+    client_ip: str = ''
     payload_type: int = SESSION_LIST_REQUEST
 
 
@@ -85,6 +92,25 @@ class KillSessionRequestDto:
     payload_type: int = KILL_SESSION_REQUEST
 
 
+@dataclass_json
+@dataclass(frozen=True)
+class HistoryRequestDto:
+    # Empty (or -1/0) values are not filtered on.  Times are epoch milliseconds
+    username: str = ''
+    client_ip: str = ''
+    ptm_pid: int = -1
+    event_type: str = ''
+    start_time: int = 0
+    end_time: int = 0
+    limit: int = 100
+    # Set to the next_cursor values of the previous response to get the next page
+    cursor_time: int = 0
+    cursor_id: int = 0
+    # Name of the eventstore_action to query, only needed if several are configured
+    action_name: str = ''
+    payload_type: int = HISTORY_REQUEST
+
+
 @dataclass_json
 @dataclass(frozen=True)
 class EventWatchResponseDto:
@@ -100,6 +126,17 @@ class KillSessionResponseDto:
     payload_type: int = KILL_SESSION_RESPONSE
 
 
+@dataclass_json
+@dataclass(frozen=True)
+class HistoryResponseDto:
+    events: List[Dict[str, Any]]
+    # Both are 0 when there are no more pages
+    next_cursor_time: int = 0
+    next_cursor_id: int = 0
+    error: str = ''
+    payload_type: int = HISTORY_RESPONSE
+
+
 @dataclass_json
 @dataclass(frozen=True)
 class SessionDto:
@@ -142,6 +179,10 @@ def deserialize_message(json_data):
         return ResponseMessage(KillSessionRequestDto.from_json(raw_dict['dto_payload']), client_id=raw_dict['client_id'], correlation_id=raw_dict['correlation_id'])
     elif raw_dict['payload_type'] == KILL_SESSION_RESPONSE:
         return ResponseMessage(KillSessionResponseDto.from_json(raw_dict['dto_payload']), client_id=raw_dict['client_id'], correlation_id=raw_dict['correlation_id'])
+    elif raw_dict['payload_type'] == HISTORY_REQUEST:
+        return RequestMessage(HistoryRequestDto.from_json(raw_dict['dto_payload']), client_id=raw_dict['client_id'], correlation_id=raw_dict['correlation_id'])
+    elif raw_dict['payload_type'] == HISTORY_RESPONSE:
+        return ResponseMessage(HistoryResponseDto.from_json(raw_dict['dto_payload']), client_id=raw_dict['client_id'], correlation_id=raw_dict['correlation_id'])
     else:
         raise NotImplementedError(f"Could not deserialize message type for JSON {json_data}")
 
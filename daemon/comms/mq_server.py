@@ -6,8 +6,9 @@ import threading
 import queue
 import zmq
 from .dtos import RequestMessage, ResponseMessage, deserialize_message
-from .dtos import SESSION_LIST_REQUEST, EVENT_WATCH_REQUEST, SHELL_SENDKEYS_REQUEST, KILL_SESSION_REQUEST
-from .request_handlers import ListSessionHandler, WatchHandler, KillSessionHandler
+from .dtos import SESSION_LIST_REQUEST, EVENT_WATCH_REQUEST, SHELL_SENDKEYS_REQUEST, KILL_SESSION_REQUEST, \
+    HISTORY_REQUEST
+from .request_handlers import ListSessionHandler, WatchHandler, KillSessionHandler, HistoryHandler
 from trackers.tracker import Tracker
 from .active_streams import ActiveStreams
 import logging
@@ -135,6 +136,10 @@ class MQLocalServer(threading.Thread):
             ksh = KillSessionHandler(request_message, self.response_queue, self.stay_alive)
             ksh.start()
 
+        elif request_message.dto_payload.payload_type == HISTORY_REQUEST:
+            logger.debug("Launching History task")
+            hh = HistoryHandler(request_message, self.response_queue, self.stay_alive)
+            hh.start()
 
         elif request_message.dto_payload.payload_type == EVENT_WATCH_REQUEST:
             if self.active_streams.is_active(request_message.correlation_id):
@@ -154,7 +159,7 @@ class MQLocalServer(threading.Thread):
             if session is None:
                 logger.error(f"Cannot find session to send key for PTM PID {ptm_pid}")
                 return
-            tty_id = session['tty_id']
+            tty_id = session.tty_id
             if tty_id < 0:
                 logger.error(f"Invalid TTY ID ({tty_id}) for send key PTM PID {ptm_pid}")
                 return
@@ -164,7 +169,7 @@ class MQLocalServer(threading.Thread):
             # and force a redraw, giving newly connected clients a cleanly redrawn terminal screen
             if request_message.dto_payload.force_redraw:
                 logger.debug("Redrawing shell via SIGWINCH")
-                os.kill(session['shell_pid'], SIGWINCH)
+                os.kill(session.shell_pid, SIGWINCH)
 
             if request_message.dto_payload.keys:
                 if self.enable_injection:
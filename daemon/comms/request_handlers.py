@@ -6,8 +6,9 @@ import threading
 from trackers.tracker import Tracker
 import queue
 from .dtos import SessionListResponseDto, SessionDto, EventWatchResponseDto, ResponseMessage, \
-    RequestMessage, KillSessionResponseDto
+    RequestMessage, KillSessionResponseDto, HistoryResponseDto
 from events.event_bus import eventbus_sshtrace_subscribe, eventbus_sshtrace_unsubscribe
+from plugins.common.event_store import get_event_store_path, query_events
 from comms.event_types import *
 import os
 import signal
@@ -46,25 +47,30 @@ class ListSessionHandler(RequestHandler):
                                                  response_queue, stay_alive_func,
                                                  group=group, target=target, name=name)
         self.session_tracker = session_tracker
+        self.request_dto = request_message.dto_payload
 
     def run(self):
+        request = self.request_dto
+        sessions = self.session_tracker.find_sessions(tty_id=request.tty_id if request.tty_id >= 0 else None,
+                                                      username=request.username or None,
+                                                      client_ip=request.client_ip or None)
         all_sessions = []
-        for session in self.session_tracker.get_sessions():
+        for session in sessions:
             all_sessions.append(SessionDto(
-                ptm_pid=session['ptm_pid'],
-                pts_pid=session['pts_pid'],
-                shell_pid=session['shell_pid'],
-                tty_id=session['tty_id'],
-                start_time=session['start_time'],
-                end_time=session['end_time'],
-                last_activity_time=session['last_activity_time'],
-                last_command=session['last_command'],
-                user_id=session['user_id'],
-                username=session['username'],
-                client_ip=session['tcp_info']['client_ip'],
-                client_port=session['tcp_info']['client_port'],
-                server_ip=session['tcp_info']['server_ip'],
-                server_port=session['tcp_info']['server_port']
+                ptm_pid=session.ptm_pid,
+                pts_pid=session.pts_pid,
+                shell_pid=session.shell_pid,
+                tty_id=session.tty_id,
+                start_time=session.start_time,
+                end_time=session.end_time,
+                last_activity_time=session.last_activity_time,
+                last_command=session.last_command,
+                user_id=session.user_id,
+                username=session.username,
+                client_ip=session.client_ip,
+                client_port=session.client_port,
+                server_ip=session.server_ip,
+                server_port=session.server_port
             ))
         resp_dto = SessionListResponseDto(sessions=all_sessions)
 
@@ -95,6 +101,41 @@ class KillSessionHandler(RequestHandler):
 
         self.return_data(resp_dto)
 
+class HistoryHandler(RequestHandler):
+
+    def __init__(self, request_message: RequestMessage, response_queue: queue.Queue,
+                 stay_alive_func,
+                group=None, target=None, name=None, args=(), kwargs=None):
+        self.request_dto = request_message.dto_payload
+        super(HistoryHandler, self).__init__(request_message.client_id, request_message.correlation_id,
+                                             response_queue, stay_alive_func,
+                                             group=group, target=target, name=name)
+
+    def run(self):
+        request = self.request_dto
+        database_path = get_event_store_path(request.action_name)
+        if database_path is None:
+            if request.action_name:
+                error = f"No eventstore_action named {request.action_name} is configured"
+            else:
+                error = "Event history requires exactly one eventstore_action to be configured (or an action name)"
+            self.return_data(HistoryResponseDto(events=[], error=error))
+            return
+
+        try:
+            events, next_cursor_time, next_cursor_id = query_events(
+                database_path, username=request.username, client_ip=request.client_ip, ptm_pid=request.ptm_pid,
+                event_type=request.event_type, start_time=request.start_time, end_time=request.end_time,
+                limit=request.limit, cursor_time=request.cursor_time, cursor_id=request.cursor_id)
+        except Exception as e:
+            logger.exception("Error querying event history")
+            self.return_data(HistoryResponseDto(events=[], error=f"Error querying event history: {e}"))
+            return
+
+        self.return_data(HistoryResponseDto(events=events, next_cursor_time=next_cursor_time,
+                                            next_cursor_id=next_cursor_id))
+
+
 class WatchHandler(RequestHandler):
 
     def __init__(self, request_message: RequestMessage,
@@ -8,15 +8,23 @@ from logging.handlers import RotatingFileHandler
 from comms.mq_server import MQLocalServer
 import sys
 import os
-from sshlog import SSHLog
 from trackers.tracker import Tracker
 from events.event_bus import eventbus_sshtrace_push
+from events.event_capture import EventCaptureWriter, EventReplaySource
+from events.event_collector import EventCollector
 from plugins.common.plugin_manager import PluginManager
 from comms.mq_base import PROC_LOCK_FILE
 from comms.pidlockfile import PIDLockFile, LockTimeout, AlreadyLocked
 import platform
+import time
 from web_server import SSHLogWebServer
 
+# Maximum number of events pulled from libsshlog per poll
+POLL_MAX_EVENTS = 256
+
+# How often to log action queue statistics (only logged when an action is backed up or dropping events)
+ACTION_STATS_LOG_INTERVAL_SEC = 60
+
 def run_main():
 
     parser = argparse.ArgumentParser(description="SSHLog Daemon")
@@ -52,6 +60,35 @@ def run_main():
         default=os.environ.get('SSHLOG_ENABLE_SESSION_INJECTION', '').lower() in ('true', '1', 'yes'),
         help='Enable command injection into active sessions (default: False)'
     )
+    parser.add_argument(
+        '--event-format',
+        choices=['json', 'binary'],
+        default=os.environ.get('SSHLOG_EVENT_FORMAT', 'json'),
+        help='Encoding used to pass events from libsshlog to the daemon (default: json)'
+    )
+
+    parser.add_argument(
+        '--capture',
+        default=os.environ.get('SSHLOG_CAPTURE_FILE', None),
+        help='Record the raw event stream to this file for later replay'
+    )
+    parser.add_argument(
+        '--replay',
+        default=None,
+        help='Replay events from a capture file instead of monitoring SSH via BPF'
+    )
+    parser.add_argument(
+        '--replay-speed',
+        default=1.0,
+        type=float,
+        help='Replay speed multiplier.  1.0 uses the original timing, 0 replays as fast as possible (default: 1.0)'
+    )
+    parser.add_argument(
+        '--event-buffer-size',
+        default=int(os.environ.get('SSHLOG_EVENT_BUFFER_SIZE', 65536)),
+        type=int,
+        help='Maximum number of collected events waiting to be processed.  Events are dropped when it is full, except when replaying (default: 65536)'
+    )
 
     args = parser.parse_args()
 
@@ -136,18 +173,49 @@ def run_main():
                                      port=args.diagnostic_web_port, enable_session_injection=args.enable_session_injection)
         web_server.start()
 
-    with SSHLog(loglevel=0) as sshb:
+    if args.replay is not None:
+        event_source = EventReplaySource(args.replay, speed=args.replay_speed)
+    else:
+        # Imported here so that replaying a capture does not require libsshlog to be installed
+        from sshlog import SSHLog, EVENT_FORMAT_JSON, EVENT_FORMAT_BINARY
+        event_format = EVENT_FORMAT_BINARY if args.event_format == 'binary' else EVENT_FORMAT_JSON
+        event_source = SSHLog(loglevel=0, event_format=event_format)
+
+    capture_writer = None
+    if args.capture is not None:
+        capture_writer = EventCaptureWriter(args.capture)
+
+    with event_source as sshb:
+
+        # A dedicated thread drains libsshlog so that slow event processing below cannot stall it
+        # Replayed events are never dropped, the replay waits for event processing instead.  Events are captured
+        # by the collector thread, before they wait in the ring and before the event bus decorates them
+        collector = EventCollector(sshb, ring_size=args.event_buffer_size, poll_max_events=POLL_MAX_EVENTS,
+                                   block_when_full=args.replay is not None, capture_writer=capture_writer)
+        collector.start()
 
         try:
-            while sshb.is_ok():
-                event_data = sshb.poll(timeout_ms=15)
-                if event_data is not None:
+            next_stats_log_time = time.monotonic() + ACTION_STATS_LOG_INTERVAL_SEC
+            while collector.is_ok():
+                if time.monotonic() >= next_stats_log_time:
+                    plugin_manager.log_action_stats()
+                    collector_stats = collector.stats()
+                    if collector_stats['overflow'] > 0:
+                        logger.info(f"Event collector stats: {collector_stats}")
+                    next_stats_log_time = time.monotonic() + ACTION_STATS_LOG_INTERVAL_SEC
+
+                for event_data in collector.poll_many(max_events=POLL_MAX_EVENTS, timeout_ms=100):
                     eventbus_sshtrace_push(event_data, session_tracker)
                     if web_server:
                         web_server.process_event(event_data)
         except KeyboardInterrupt:
             pass
 
+        collector.stop()
+
+    if capture_writer is not None:
+        capture_writer.close()
+
     server.shutdown()
     plugin_manager.shutdown()
 
@@ -53,9 +53,9 @@ def eventbus_sshtrace_push(event_data, session_tracker):
         # Lookup the active connection for this PID and attach some useful information to the event
         active_conn = session_tracker.get_session(event_data['ptm_pid'])
         if active_conn is not None:
-            event_data['username'] = active_conn['username']
-            event_data['tty_id'] = active_conn['tty_id']
-            event_data['tcp_info'] = active_conn['tcp_info']
+            event_data['username'] = active_conn.username
+            event_data['tty_id'] = active_conn.tty_id
+            event_data['tcp_info'] = active_conn.tcp_info
         else:
             event_data['username'] = ''
             event_data['tty_id'] = ''
@@ -0,0 +1,133 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import gzip
+import logging
+import struct
+import time
+from plugins.common.fast_json import dumps_bytes, loads
+
+logger = logging.getLogger('sshlog_daemon')
+
+# Capture files are a gzip stream containing a header followed by records of:
+#   float64 seconds since the capture started, uint32 payload length, JSON encoded event payload
+CAPTURE_FILE_MAGIC = b'SSHLOGCAP1\n'
+_RECORD_HEADER = struct.Struct('<dI')
+
+
+class EventCaptureWriter:
+    '''
+    Records the raw event stream (as returned by SSHLog.poll) to a compressed capture file
+    which can later be played back with EventReplaySource
+    '''
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.events_written = 0
+        self._file = gzip.open(file_path, 'wb')
+        self._file.write(CAPTURE_FILE_MAGIC)
+        self._start_time = time.monotonic()
+        logger.info(f"Capturing events to {file_path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, event_data):
+        payload = dumps_bytes(event_data)
+        self._file.write(_RECORD_HEADER.pack(time.monotonic() - self._start_time, len(payload)))
+        self._file.write(payload)
+        self.events_written += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f"Captured {self.events_written} events to {self.file_path}")
+
+
+class EventReplaySource:
+    '''
+    Plays back a capture file through the same interface as SSHLog (is_ok/poll/poll_many) so the daemon
+    can run without BPF.
+    speed=1.0 replays at the original timing, speed=N replays N times faster and
+    speed=0 replays as fast as events can be consumed
+    '''
+    def __init__(self, file_path, speed=1.0):
+        if speed < 0:
+            raise ValueError(f"Invalid replay speed {speed}.  Must be >= 0")
+        self.file_path = file_path
+        self.speed = speed
+        self.events_read = 0
+        self._file = None
+        self._next_record = None
+
+    def __enter__(self):
+        self._file = gzip.open(self.file_path, 'rb')
+        magic = self._file.read(len(CAPTURE_FILE_MAGIC))
+        if magic != CAPTURE_FILE_MAGIC:
+            self._file.close()
+            raise ValueError(f"{self.file_path} is not an sshlog capture file")
+
+        self._start_time = time.monotonic()
+        self._next_record = self._read_record()
+        logger.info(f"Replaying events from {self.file_path} at speed {self.speed}")
+        return self
+
+    def __exit__(self, *args):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        logger.info(f"Replayed {self.events_read} events from {self.file_path}")
+
+    def _read_record(self):
+        header = self._file.read(_RECORD_HEADER.size)
+        if len(header) < _RECORD_HEADER.size:
+            return None
+        offset_sec, payload_len = _RECORD_HEADER.unpack(header)
+        payload = self._file.read(payload_len)
+        if len(payload) < payload_len:
+            logger.warning(f"Truncated record at end of capture file {self.file_path}")
+            return None
+        return offset_sec, payload
+
+    def _seconds_until_due(self, offset_sec):
+        if self.speed == 0:
+            return 0.0
+        return self._start_time + (offset_sec / self.speed) - time.monotonic()
+
+    def is_ok(self):
+        # The replay is finished once the last record has been handed out
+        return self._next_record is not None
+
+    def poll(self, timeout_ms=100):
+        events = self.poll_many(max_events=1, timeout_ms=timeout_ms)
+        if len(events) == 0:
+            return None
+        return events[0]
+
+    def poll_many(self, max_events=256, timeout_ms=100):
+        events = []
+        deadline = time.monotonic() + (timeout_ms / 1000.0)
+
+        while len(events) < max_events and self._next_record is not None:
+            offset_sec, payload = self._next_record
+
+            wait_sec = self._seconds_until_due(offset_sec)
+            if wait_sec > 0:
+                if len(events) > 0:
+                    # Hand back what is already due rather than holding it until the next event
+                    break
+                remaining_sec = deadline - time.monotonic()
+                if wait_sec > remaining_sec:
+                    time.sleep(max(remaining_sec, 0))
+                    break
+                time.sleep(wait_sec)
+
+            events.append(loads(payload))
+            self.events_read += 1
+            self._next_record = self._read_record()
+
+        return events
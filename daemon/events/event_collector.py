@@ -0,0 +1,135 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger('sshlog_daemon')
+
+# Only warn about ring overflows this often
+OVERFLOW_WARNING_INTERVAL_SEC = 60
+
+
+class EventCollector:
+    '''
+    Drains an event source (SSHLog or EventReplaySource) on a dedicated thread into a bounded in-process ring.
+    The collector thread does nothing except poll, so slow event subscribers cannot delay draining libsshlog
+    and cause the kernel buffers to overflow.  The dispatch stage consumes events through the same
+    is_ok/poll_many interface as the event source.
+    When the ring is full, newly collected events are dropped and counted.  With block_when_full (for replayed
+    captures, which can always wait) the collector waits for space instead.
+    If a capture_writer is given, events are captured as they are collected, so the capture timing is not
+    affected by events waiting in the ring
+    '''
+    def __init__(self, event_source, ring_size=65536, poll_max_events=256, poll_timeout_ms=15,
+                 block_when_full=False, capture_writer=None):
+        if ring_size < 1:
+            raise ValueError("ring_size must be at least 1")
+        self.event_source = event_source
+        self.ring_size = ring_size
+        self.poll_max_events = poll_max_events
+        self.poll_timeout_ms = poll_timeout_ms
+        self.block_when_full = block_when_full
+        self.capture_writer = capture_writer
+
+        self._ring = collections.deque()
+        self._condition = threading.Condition()
+        # Signalled when events are taken from the ring, for block_when_full
+        self._space_condition = threading.Condition(self._condition)
+        self._stop_event = threading.Event()
+        self._source_finished = False
+        self._thread = None
+
+        self.collected = 0
+        self.overflow = 0
+        self.peak_occupancy = 0
+        self._last_overflow_warning = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sshlog-event-collector', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        try:
+            while not self._stop_event.is_set() and self.event_source.is_ok():
+                events = self.event_source.poll_many(max_events=self.poll_max_events, timeout_ms=self.poll_timeout_ms)
+                if len(events) > 0:
+                    if self.capture_writer is not None:
+                        for event_data in events:
+                            self.capture_writer.write(event_data)
+                    self._append(events)
+        except:
+            logger.exception("Error collecting events")
+        finally:
+            with self._condition:
+                self._source_finished = True
+                self._condition.notify_all()
+
+    def _append(self, events):
+        dropped = 0
+        with self._condition:
+            if self.block_when_full:
+                while len(events) > 0 and not self._stop_event.is_set():
+                    space = self.ring_size - len(self._ring)
+                    if space == 0:
+                        self._space_condition.wait(0.1)
+                        continue
+                    self._ring.extend(events[:space])
+                    self.collected += min(space, len(events))
+                    events = events[space:]
+                    self.peak_occupancy = max(self.peak_occupancy, len(self._ring))
+                    self._condition.notify()
+                return
+
+            space = self.ring_size - len(self._ring)
+            if len(events) > space:
+                dropped = len(events) - space
+                events = events[:space]
+            self._ring.extend(events)
+            self.collected += len(events)
+            self.overflow += dropped
+            if len(self._ring) > self.peak_occupancy:
+                self.peak_occupancy = len(self._ring)
+            self._condition.notify()
+
+        if dropped > 0 and time.monotonic() - self._last_overflow_warning > OVERFLOW_WARNING_INTERVAL_SEC:
+            self._last_overflow_warning = time.monotonic()
+            logger.warning(f"Event ring is full, {self.overflow} events dropped so far (ring size {self.ring_size}).  "
+                           f"Event processing is not keeping up")
+
+    def is_ok(self):
+        ''' True until the event source has finished and every collected event has been handed out '''
+        with self._condition:
+            return not self._source_finished or len(self._ring) > 0
+
+    def poll_many(self, max_events=256, timeout_ms=100):
+        ''' Returns up to max_events collected events, waiting up to timeout_ms if none are available '''
+        with self._condition:
+            if len(self._ring) == 0 and not self._source_finished:
+                self._condition.wait(timeout_ms / 1000.0)
+
+            count = min(max_events, len(self._ring))
+            popleft = self._ring.popleft
+            events = [popleft() for _ in range(count)]
+            if count > 0 and self.block_when_full:
+                self._space_condition.notify()
+            return events
+
+    def stats(self):
+        with self._condition:
+            return {
+                'ring_size': self.ring_size,
+                'occupancy': len(self._ring),
+                'peak_occupancy': self.peak_occupancy,
+                'collected': self.collected,
+                'overflow': self.overflow,
+            }
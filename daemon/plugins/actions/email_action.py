@@ -4,11 +4,18 @@
 
 from plugins.common.plugin import ActionPlugin
 import smtplib
+import threading
 from email.mime.text import MIMEText
 
 class email_action(ActionPlugin):
+    # Messages are sent over one persistent SMTP session.  Whatever is queued when the session is free
+    # is sent together, so a burst of events does not open a connection per message
+    default_max_concurrency = 1
+    default_batch_max_events = 50
+    default_batch_max_ms = 0
 
-    def init_action(self, sender, recipient, subject, smtp_server, smtp_port, body='', username=None, password=None):
+    def init_action(self, sender, recipient, subject, smtp_server, smtp_port, body='', username=None, password=None,
+                    timeout=30):
         self.sender = sender
         self.recipient = recipient
         self.subject = subject
@@ -17,22 +24,73 @@ class email_action(ActionPlugin):
         self.smtp_port = smtp_port
         self.username = username
         self.password = password
+        self.timeout = timeout
+
+        self.smtp = None
+        self.smtp_lock = threading.Lock()
         self.logger.info(f"Initialized action {self.name} with email recipient {recipient}")
 
     def shutdown_action(self):
-        pass
+        with self.smtp_lock:
+            self._disconnect()
 
-    def execute(self, event_data):
-        self.logger.info(f"{self.name} Email action triggered on {event_data['event_type']} Sending to {self.recipient}")
+    def _connect(self):
+        smtp = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            smtp.starttls()
+            # EHLO again, extensions can change once TLS is established
+            smtp.ehlo()
+            if self.username is not None and self.password is not None:
+                smtp.login(self.username, self.password)
+        except:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.logger.debug(f"{self.name} connected to SMTP server {self.smtp_server}:{self.smtp_port}")
+
+    def _disconnect(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except smtplib.SMTPException:
+            pass
+        except OSError:
+            pass
+        finally:
+            self.smtp.close()
+            self.smtp = None
+
+    def _build_message(self, event_data):
         message = MIMEText(self._insert_event_data(event_data, self.body))
         message['Subject'] = self._insert_event_data(event_data, self.subject)
         message['From'] = self.sender
         message['To'] = self.recipient
+        return message
 
-        smtp_server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-        smtp_server.ehlo()
-        smtp_server.starttls()
-        if self.username is not None and self.password is not None:
-            smtp_server.login(self.username, self.password)
-        smtp_server.sendmail(self.sender, self.recipient, message.as_string())
-        smtp_server.quit()
+    def _send(self, message):
+        # Reuse the open session.  If the server has dropped it (e.g., idle timeout), reconnect once and retry
+        for attempt in range(2):
+            if self.smtp is None:
+                self._connect()
+            try:
+                self.smtp.sendmail(self.sender, self.recipient, message.as_string())
+                return
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPHeloError, OSError):
+                self._disconnect()
+                if attempt > 0:
+                    raise
+                self.logger.info(f"{self.name} SMTP connection was lost, reconnecting")
+
+    def execute_batch(self, events):
+        with self.smtp_lock:
+            for event_data in events:
+                self.logger.info(f"{self.name} Email action triggered on {event_data['event_type']} Sending to {self.recipient}")
+                try:
+                    self._send(self._build_message(event_data))
+                except:
+                    self.logger.exception(f"Error sending e-mail for action {self.name}")
+
+    def execute(self, event_data):
+        self.execute_batch([event_data])
@@ -3,19 +3,29 @@
 # Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
 
 from plugins.common.plugin import ActionPlugin
-import logging
-from logging.handlers import RotatingFileHandler
-import json
+from plugins.common.fast_json import dumps_bytes
 import os
+import threading
+import time
 from events.log_formatter import LogFormatter
 
+# Size of the in-memory write buffer of the log file
+LOG_FILE_BUFFER_SIZE = 256 * 1024
+
+
 class eventlogfile_action(ActionPlugin):
+    # A single worker thread owns the log file.  Events are queued to it by the action executor, so
+    # event processing never waits on file writes, flushes or rotation
+    default_max_concurrency = 1
+    default_batch_max_events = 500
+    default_batch_max_ms = 200
 
-    def init_action(self, log_file_path, output_json=False, max_size_mb=20, number_of_log_files=2):
+    def init_action(self, log_file_path, output_json=False, max_size_mb=20, number_of_log_files=2, flush_interval_seconds=1):
         self.log_file_path = log_file_path
         self.output_json = output_json
         self.max_size_mb = max_size_mb
         self.number_of_log_files = number_of_log_files
+        self.flush_interval_seconds = flush_interval_seconds
         self.logger.info(f"Initialized action {self.name} with log file path {log_file_path}")
 
         self.event_formatter = LogFormatter()
@@ -25,29 +35,83 @@ class eventlogfile_action(ActionPlugin):
         if not os.path.isdir(dirpath):
             os.makedirs(dirpath)
 
-        self.file_logger = logging.getLogger(f'{self.name} logger')
-        handler = RotatingFileHandler(self.log_file_path, maxBytes=self.max_size_mb*1024*1024, backupCount=self.number_of_log_files)
-        formatter = logging.Formatter('%(asctime)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-        handler.setFormatter(formatter)
-        self.file_logger.addHandler(handler)
-        self.file_logger.setLevel(logging.DEBUG)
+        # Only the flush thread competes for this lock (and only when max_concurrency is raised, other workers)
+        self.file_lock = threading.Lock()
+        self.log_file = None
+        self.log_file_size = 0
+        self._open_log_file()
+
+        # The timestamp prefix is only formatted once per second
+        self.timestamp_second = None
+        self.timestamp_prefix = ''
 
+        self.flush_stop = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_loop, name=f"eventlogfile-flush-{self.name}", daemon=True)
+        self.flush_thread.start()
 
     def shutdown_action(self):
-        pass
+        self.flush_stop.set()
+        self.flush_thread.join()
+        with self.file_lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
 
+    def _open_log_file(self):
+        self.log_file = open(self.log_file_path, 'a', encoding='utf-8', buffering=LOG_FILE_BUFFER_SIZE)
+        self.log_file_size = self.log_file.tell()
 
-    def execute(self, event_data):
+    def _flush_loop(self):
+        while not self.flush_stop.wait(self.flush_interval_seconds):
+            with self.file_lock:
+                if self.log_file is not None:
+                    self.log_file.flush()
 
-        self.logger.debug(f"{self.name} processing event {event_data['event_type']}")
-        if self.output_json:
-            self.file_logger.info(json.dumps(event_data))
+    def _rollover(self):
+        '''
+        Rotates the log files the same way as logging's RotatingFileHandler:
+        log_file_path -> log_file_path.1 -> log_file_path.2 ... up to number_of_log_files backups
+        '''
+        self.log_file.close()
+        if self.number_of_log_files > 0:
+            for i in range(self.number_of_log_files - 1, 0, -1):
+                source_path = f"{self.log_file_path}.{i}"
+                if os.path.exists(source_path):
+                    os.replace(source_path, f"{self.log_file_path}.{i + 1}")
+            os.replace(self.log_file_path, f"{self.log_file_path}.1")
         else:
-            # Reformat each item into a log-friendly format
+            # Without backups, the log file is simply truncated
+            open(self.log_file_path, 'w').close()
+        self._open_log_file()
 
-            str_format = self.event_formatter.format(event_data)
+    def _timestamp(self):
+        now = int(time.time())
+        if now != self.timestamp_second:
+            self.timestamp_second = now
+            self.timestamp_prefix = time.strftime('%Y-%m-%d %H:%M:%S ', time.localtime(now))
+        return self.timestamp_prefix
 
-            self.file_logger.info(str_format)
+    def _format_event(self, event_data):
+        if self.output_json:
+            return dumps_bytes(event_data).decode('utf-8')
+        # Reformat each item into a log-friendly format
+        return self.event_formatter.format(event_data)
+
+    def _write_lines(self, lines):
+        text = ''.join(lines)
+        # Sizes are tracked in characters, which only differs from bytes for non-ascii text
+        max_size = self.max_size_mb * 1024 * 1024
+        with self.file_lock:
+            if max_size > 0 and self.log_file_size > 0 and self.log_file_size + len(text) >= max_size:
+                self._rollover()
+            self.log_file.write(text)
+            self.log_file_size += len(text)
 
+    def execute_batch(self, events):
+        timestamp = self._timestamp()
+        self._write_lines([timestamp + self._format_event(event_data) + '\n' for event_data in events])
 
-        
\ No newline at end of file
+    def execute(self, event_data):
+
+        self.logger.debug(f"{self.name} processing event {event_data['event_type']}")
+        self._write_lines([self._timestamp() + self._format_event(event_data) + '\n'])
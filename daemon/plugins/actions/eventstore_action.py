@@ -0,0 +1,74 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+from plugins.common.plugin import ActionPlugin
+from plugins.common.event_store import EventStoreWriter, event_time_ms, register_event_store, unregister_event_store
+import os
+import time
+
+# How often old events are deleted when retention_days is set
+RETENTION_CHECK_INTERVAL_SEC = 3600
+
+
+class eventstore_action(ActionPlugin):
+    # SQLite allows a single writer, events are inserted in batches by one worker thread
+    default_max_concurrency = 1
+    default_batch_max_events = 500
+    default_batch_max_ms = 500
+
+    def init_action(self, database_path, retention_days=None):
+        # The writer's connection is not thread safe
+        if self.executor.max_concurrency != 1:
+            raise RuntimeError(f"Action {self.name} writes from a single thread, max_concurrency must be 1")
+
+        self.database_path = database_path
+        self.retention_days = retention_days
+        self.last_retention_check = 0
+
+        # Ensure directory exists, readable only by owner (root)
+        dirpath = os.path.dirname(database_path)
+        if dirpath and not os.path.isdir(dirpath):
+            os.makedirs(dirpath, mode=0o700)
+
+        self.writer = EventStoreWriter(database_path)
+        # Makes the database available to "sshlog history" requests
+        register_event_store(self.name, database_path)
+        self.logger.info(f"Initialized action {self.name} with database {database_path}")
+
+    def shutdown_action(self):
+        unregister_event_store(self.name)
+        self.writer.close()
+
+    def _client_ip(self, event_data):
+        if 'tcp_info' in event_data:
+            return event_data['tcp_info']['client_ip']
+        session = self.session_tracker.get_session(event_data['ptm_pid']) if self.session_tracker is not None else None
+        if session is not None:
+            return session.client_ip
+        return None
+
+    def _username(self, event_data):
+        if event_data.get('username'):
+            return event_data['username']
+        session = self.session_tracker.get_session(event_data['ptm_pid']) if self.session_tracker is not None else None
+        if session is not None:
+            return session.username
+        return None
+
+    def _delete_expired_events(self):
+        if self.retention_days is None or time.time() - self.last_retention_check < RETENTION_CHECK_INTERVAL_SEC:
+            return
+        self.last_retention_check = time.time()
+        deleted = self.writer.delete_before(round((time.time() - self.retention_days * 86400) * 1000.0))
+        if deleted > 0:
+            self.logger.info(f"{self.name} deleted {deleted} events older than {self.retention_days} days")
+
+    def execute_batch(self, events):
+        self.writer.insert_events([(event_time_ms(event_data), event_data['event_type'], event_data.get('ptm_pid'),
+                                    self._username(event_data), self._client_ip(event_data), event_data)
+                                   for event_data in events])
+        self._delete_expired_events()
+
+    def execute(self, event_data):
+        self.execute_batch([event_data])
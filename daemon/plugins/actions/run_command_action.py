@@ -3,27 +3,272 @@
 # Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
 
 from plugins.common.plugin import ActionPlugin
+from plugins.common.fast_json import dumps_bytes
+import os
+import queue
+import select
+import signal
 import subprocess
+import threading
+import time
+
+# Seconds a command is given to exit after SIGTERM before its process group is killed
+KILL_GRACE_SECONDS = 2
+# A worker that exits sooner than this after starting is not restarted until this much time has passed
+WORKER_RESTART_MIN_SECONDS = 5
+# Coalescing entries older than the window are pruned once there are more than this many
+COALESCE_PRUNE_SIZE = 1000
+# Events waiting to be written to the worker.  Events are dropped if it stays full for WORKER_WRITE_TIMEOUT_SECONDS
+WORKER_QUEUE_SIZE = 1000
+# A worker that has not read its stdin for this long is considered stalled, and is killed and restarted
+WORKER_WRITE_TIMEOUT_SECONDS = 10
+
+_STOP = object()
+
 
 class run_command_action(ActionPlugin):
 
-    def init_action(self, command, args=[], timeout=None):
+    def init_action(self, command, args=[], timeout=None, coalesce_window_seconds=0, worker=False):
         self.command = command
         self.timeout = timeout
         self.args = args
+
+        # Identical argument lists (after {{value}} substitution) within the window only run once
+        self.coalesce_window_seconds = coalesce_window_seconds
+        self.coalesce_lock = threading.Lock()
+        self.last_run_times = {}
+
+        self.stats_lock = threading.Lock()
+        self.commands_run = 0
+        self.commands_failed = 0
+        self.commands_timed_out = 0
+        self.commands_coalesced = 0
+        self.duration_total_sec = 0.0
+        self.duration_max_sec = 0.0
+
+        # In worker mode the command is started once and each event is written to its stdin as one line of JSON.
+        # The writer thread owns the worker process, so a worker that stops reading never blocks the executor threads
+        self.worker = worker
+        self.worker_process = None
+        self.worker_start_time = None
+        self.worker_events_dropped = 0
+        self.worker_restarts = 0
+        self.worker_queue = None
+        self.worker_thread = None
+        if worker:
+            self.worker_queue = queue.Queue(WORKER_QUEUE_SIZE)
+            self.worker_thread = threading.Thread(target=self._worker_writer_loop,
+                                                  name=f"run-command-worker-{self.name}", daemon=True)
+            self.worker_thread.start()
+
         self.logger.info(f"Initialized action {self.name} with command {command}")
 
     def shutdown_action(self):
-        pass
+        if self.worker_thread is not None:
+            # Queued events are written before the worker's stdin is closed
+            self.worker_queue.put(_STOP)
+            self.worker_thread.join()
+
+    def stats(self):
+        stats = super().stats()
+        with self.stats_lock:
+            stats.update({
+                'commands_run': self.commands_run,
+                'commands_failed': self.commands_failed,
+                'commands_timed_out': self.commands_timed_out,
+                'commands_coalesced': self.commands_coalesced,
+                'command_avg_ms': round(self.duration_total_sec * 1000.0 / self.commands_run, 3) if self.commands_run > 0 else 0,
+                'command_max_ms': round(self.duration_max_sec * 1000.0, 3),
+                'worker_events_dropped': self.worker_events_dropped,
+                'worker_restarts': self.worker_restarts,
+            })
+        return stats
+
+    def _is_coalesced(self, args_list):
+        ''' Returns True if the same arguments already ran within coalesce_window_seconds '''
+        if self.coalesce_window_seconds <= 0:
+            return False
+        key = tuple(args_list)
+        now = time.monotonic()
+        with self.coalesce_lock:
+            last_run_time = self.last_run_times.get(key)
+            if last_run_time is not None and now - last_run_time < self.coalesce_window_seconds:
+                return True
+            self.last_run_times[key] = now
+            if len(self.last_run_times) > COALESCE_PRUNE_SIZE:
+                self.last_run_times = {k: v for k, v in self.last_run_times.items()
+                                       if now - v < self.coalesce_window_seconds}
+        return False
+
+    def _kill_process_group(self, process):
+        # Commands run in their own session, so anything they started is signalled too
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(KILL_GRACE_SECONDS)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+    def _run(self, args_list):
+        ''' Runs the command, killing its process group if it exceeds the timeout.  Returns (exit_code, timed_out) '''
+        process = subprocess.Popen(args_list, start_new_session=True)
+        try:
+            return process.wait(timeout=self.timeout), False
+        except subprocess.TimeoutExpired:
+            self._kill_process_group(process)
+            return process.returncode, True
+
+    def _start_worker(self):
+        ''' Starts the worker process.  Only called from the writer thread '''
+        self.worker_process = subprocess.Popen([self.command] + list(self.args), stdin=subprocess.PIPE, bufsize=0,
+                                               start_new_session=True)
+        # Written with timeouts, see _write_to_worker
+        os.set_blocking(self.worker_process.stdin.fileno(), False)
+        self.worker_start_time = time.monotonic()
+        self.logger.info(f"{self.name} started worker {self.command} (pid {self.worker_process.pid})")
+
+    def _stop_worker(self):
+        ''' Closes the worker's stdin and waits for it to exit.  Only called from the writer thread '''
+        process = self.worker_process
+        self.worker_process = None
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(self.timeout if self.timeout is not None else KILL_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            self._kill_process_group(process)
+
+    def _write_to_worker(self, line):
+        ''' Writes one line to the worker, starting it if needed.  Returns False if the line was not written '''
+        if self.worker_process is not None and self.worker_process.poll() is not None:
+            self.logger.warning(f"{self.name} worker {self.command} exited with code "
+                                f"{self.worker_process.returncode}")
+            self.worker_process = None
+        if self.worker_process is None:
+            # Do not restart a worker that keeps failing for every event
+            if self.worker_start_time is not None and \
+                    time.monotonic() - self.worker_start_time < WORKER_RESTART_MIN_SECONDS:
+                return False
+            if self.worker_start_time is not None:
+                self.worker_restarts += 1
+            self._start_worker()
+
+        stdin_fd = self.worker_process.stdin.fileno()
+        remaining = memoryview(line)
+        deadline = time.monotonic() + WORKER_WRITE_TIMEOUT_SECONDS
+        while len(remaining) > 0:
+            try:
+                remaining = remaining[os.write(stdin_fd, remaining):]
+                continue
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"{self.name} unable to write to worker {self.command}: {e}")
+                self._stop_worker()
+                return False
+
+            # The pipe is full, wait for the worker to read from it
+            timeout = deadline - time.monotonic()
+            if timeout <= 0 or len(select.select([], [stdin_fd], [], timeout)[1]) == 0:
+                self.logger.warning(f"{self.name} worker {self.command} has not read its input for "
+                                    f"{WORKER_WRITE_TIMEOUT_SECONDS}s, restarting it")
+                process = self.worker_process
+                self.worker_process = None
+                self._kill_process_group(process)
+                process.stdin.close()
+                self._discard_queued()
+                return False
+        return True
+
+    def _discard_queued(self):
+        ''' Drops the events queued for a stalled worker, so that they do not each wait for the write timeout '''
+        while True:
+            try:
+                line = self.worker_queue.get_nowait()
+            except queue.Empty:
+                return
+            if line is _STOP:
+                self.worker_queue.put_nowait(_STOP)
+                return
+            self._record_worker_drop()
+
+    def _worker_writer_loop(self):
+        while True:
+            line = self.worker_queue.get()
+            if line is _STOP:
+                break
+            if not self._write_to_worker(line):
+                self._record_worker_drop()
+        if self.worker_process is not None:
+            self._stop_worker()
+
+    def _record_worker_drop(self):
+        with self.stats_lock:
+            self.worker_events_dropped += 1
+            dropped = self.worker_events_dropped
+        # Only warn occasionally, since every event is dropped while the worker is down
+        if dropped == 1 or dropped % WORKER_QUEUE_SIZE == 0:
+            self.logger.warning(f"{self.name} worker {self.command} is not accepting events, "
+                                f"{dropped} events dropped so far")
+
+    def _send_to_worker(self, event_data):
+        ''' Queues the event for the writer thread.  Returns False if the queue stayed full and the event was dropped '''
+        try:
+            self.worker_queue.put(dumps_bytes(event_data) + b'\n', timeout=WORKER_WRITE_TIMEOUT_SECONDS)
+        except queue.Full:
+            self._record_worker_drop()
+            return False
+        return True
+
+    def _record(self, exit_code, timed_out, duration_sec):
+        with self.stats_lock:
+            self.commands_run += 1
+            if exit_code != 0:
+                self.commands_failed += 1
+            if timed_out:
+                self.commands_timed_out += 1
+            self.duration_total_sec += duration_sec
+            if duration_sec > self.duration_max_sec:
+                self.duration_max_sec = duration_sec
 
     def execute(self, event_data):
+        queue_wait_sec = self.executor.current_queue_wait()
+
+        if self.worker:
+            if self._send_to_worker(event_data):
+                self.logger.debug(f"{self.name} queued {event_data['event_type']} event for worker "
+                                  f"(queued {queue_wait_sec:.3f}s)")
+            return
+
         args_list = [self.command]
         for arg in self.args:
             # Swap out any {{value}} items in the arguments list
             args_list.append(self._insert_event_data(event_data, arg))
 
+        if self._is_coalesced(args_list):
+            with self.stats_lock:
+                self.commands_coalesced += 1
+            self.logger.debug(f"{self.name} skipped {args_list}, it already ran in the last "
+                              f"{self.coalesce_window_seconds} seconds")
+            return
+
         self.logger.info(f"{self.name} Command action triggered on {event_data['event_type']} executing {args_list}")
-        exit_code = subprocess.call(args_list, timeout=self.timeout)
+        start = time.monotonic()
+        exit_code, timed_out = self._run(args_list)
+        duration_sec = time.monotonic() - start
+        self._record(exit_code, timed_out, duration_sec)
 
-        if exit_code != 0:
-            self.logger.info(f"Command {args_list} returned failure exit code {exit_code}")
\ No newline at end of file
+        result = f"exit code {exit_code} in {duration_sec:.3f}s (queued {queue_wait_sec:.3f}s)"
+        if timed_out:
+            self.logger.warning(f"Command {args_list} timed out after {self.timeout}s and was killed, {result}")
+        elif exit_code != 0:
+            self.logger.info(f"Command {args_list} returned failure {result}")
+        else:
+            self.logger.info(f"Command {args_list} finished with {result}")
@@ -3,9 +3,13 @@
 # Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
 
 from plugins.common.plugin import ActionPlugin
+from plugins.common.session_file_cache import SessionFileCache
+from plugins.common.compressed_session_file import CompressedSessionFile, check_compression_available, \
+    COMPRESSION_FILE_EXTENSIONS
+from plugins.common.terminal_sanitizer import TerminalSanitizer
 from comms.event_types import *
 import os
-import re
+import threading
 import time
 import datetime
 
@@ -45,84 +49,133 @@ key_to_text_mapping = {
    }
 
 
-class sessionlog_action(ActionPlugin):
+# Terminal output is written in many small pieces, so each open session log gets a larger buffer
+SESSION_FILE_BUFFER_SIZE = 65536
 
-    def init_action(self, log_directory, timestamp_frequency_seconds=-1):
-        self.log_directory = log_directory
-        self.timestamp_frequency_seconds = timestamp_frequency_seconds
-        self.logger.info(f"Initialized action {self.name} with log directory {log_directory}")
-        self.ansi_escape_regex = re.compile(r'(\x9B|\x1B\[)[0-?]*[ -/]*[@-~]')
-        self.special_char_regex = '|'.join(re.escape(char) for char in key_to_text_mapping)
 
+class _SessionState:
+    ''' Per-session state kept between terminal updates '''
+    def __init__(self):
         self.last_timestamp = 0.0
+        self.sanitizer = TerminalSanitizer(key_to_text_mapping)
 
-        # Ensure directory exists
-        if not os.path.isdir(log_directory):
-            # Make the directory readable only by owner (root)
-            os.makedirs(log_directory, mode=0o700)
 
-    def shutdown_action(self):
-        pass
-
-    def _remove_coloring(self, term_data):
-        return self.ansi_escape_regex.sub('', term_data)
+class sessionlog_action(ActionPlugin):
 
-    def _convert_special_chars(self, term_data):
-        '''
-        Removes escape sequences and makes output data more suitable for log files
-        :return: Cleaned text
-        '''
+    def init_action(self, log_directory, timestamp_frequency_seconds=-1, max_open_files=256, flush_interval_seconds=5,
+                    compression=None, compression_frame_kb=256, compression_frame_seconds=60):
+        self.log_directory = log_directory
+        self.timestamp_frequency_seconds = timestamp_frequency_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+
+        # Optionally write compressed logs made of independent frames, with an index for seeking by time
+        self.compression = compression
+        self.compression_frame_kb = compression_frame_kb
+        self.compression_frame_seconds = compression_frame_seconds
+        if compression is not None:
+            check_compression_available(compression)
+        self.logger.info(f"Initialized action {self.name} with log directory {log_directory}")
 
-        return re.sub(self.special_char_regex, lambda m: key_to_text_mapping[m.group(0)], term_data)
+        # Session log files stay open (buffered) between events, up to max_open_files at a time.  The per-session
+        # state is kept only while the file is open, so neither grows without bound if close events are missed.
+        # session_states is guarded by session_files.lock
+        self.session_files = SessionFileCache(self._open_session_file, max_open_files=max_open_files,
+                                              on_evict=self._evict_session)
+        self.session_states = {}
 
+        # Ensure directory exists
+        self._make_log_directory()
 
-    def write_data(self, output_path, content):
+        # Buffered data is written out periodically so the logs stay close to real time
+        self.flush_stop = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_loop, name=f"sessionlog-flush-{self.name}", daemon=True)
+        self.flush_thread.start()
 
-        with open(output_path, 'a') as log_out:
-            log_out.write(content)
+    def shutdown_action(self):
+        self.flush_stop.set()
+        self.flush_thread.join()
+        with self.session_files.lock:
+            # Write out the terminal data each sanitizer is holding back before the files are closed
+            for ptm_pid, session_state in self.session_states.items():
+                held_back = session_state.sanitizer.flush()
+                if held_back:
+                    self.session_files.get(ptm_pid).write(held_back)
+            self.session_states.clear()
+            self.session_files.close_all()
+
+    def _evict_session(self, ptm_pid, session_file):
+        # Called by session_files when it closes the least recently used file
+        session_state = self.session_states.pop(ptm_pid, None)
+        if session_state is not None:
+            session_file.write(session_state.sanitizer.flush())
+
+    def _make_log_directory(self):
+        if not os.path.isdir(self.log_directory):
+            # Make the directory readable only by owner (root)
+            os.makedirs(self.log_directory, mode=0o700)
+
+    def _open_session_file(self, ptm_pid):
+        output_path = os.path.join(self.log_directory, f"ssh_{ptm_pid}.log")
+        try:
+            return self._open_file(output_path)
+        except FileNotFoundError:
+            # The log directory was removed while running
+            self._make_log_directory()
+            return self._open_file(output_path)
+
+    def _open_file(self, output_path):
+        if self.compression is None:
+            return open(output_path, 'a', buffering=SESSION_FILE_BUFFER_SIZE)
+        return CompressedSessionFile(output_path + COMPRESSION_FILE_EXTENSIONS[self.compression],
+                                     compression=self.compression,
+                                     frame_bytes=self.compression_frame_kb * 1024,
+                                     frame_seconds=self.compression_frame_seconds)
+
+    def _flush_loop(self):
+        while not self.flush_stop.wait(self.flush_interval_seconds):
+            self.session_files.flush_all()
+
+    def write_data(self, ptm_pid, content):
+        with self.session_files.lock:
+            self.session_files.get(ptm_pid).write(content)
 
     def execute(self, event_data):
-        filename = f"ssh_{event_data['ptm_pid']}.log"
-        output_path = os.path.join(self.log_directory, filename)
+        ptm_pid = event_data['ptm_pid']
 
         if event_data['event_type'] == SSHTRACE_EVENT_TERMINAL_UPDATE:
-
-            #connection_data = self.session_tracker.get_session(event_data['ptm_pid'])
-            if self.timestamp_frequency_seconds > 0 and time.time() - self.last_timestamp > self.timestamp_frequency_seconds:
-                self.last_timestamp = time.time()
-                # Output date string always in UTC
-                date_string = datetime.datetime.utcnow().isoformat() + "Z"
-                content = f"\n[[ sshlog time: {date_string} ]]\n"
-                self.write_data(output_path, content)
-
-            filename = f"ssh_{event_data['ptm_pid']}.log"
-            output_path = os.path.join(self.log_directory, filename)
-
-            terminal_data = event_data['terminal_data']
-            decolored_terminal_data = self._remove_coloring(terminal_data)
-            cleaned_terminal_data = self._convert_special_chars(decolored_terminal_data)
-            # for key, value in key_to_text_mapping.items():
-            #     if key in terminal_data:
-            #         terminal_data = terminal_data.replace(key, value)
-
-            if not os.path.isdir(self.log_directory):
-                os.makedirs(self.log_directory)
-
-            with open(output_path, 'a') as log_out:
-                log_out.write(cleaned_terminal_data)
-
-            # Intermediate outputs for debugging
-            # with open(output_path + '.orig', 'a') as log_out:
-            #     log_out.write(terminal_data)
-            # with open(output_path + '.mid', 'a') as log_out:
-            #     log_out.write(decolored_terminal_data)
+            # Held throughout, since writing another session's event may evict this session's state
+            with self.session_files.lock:
+                session_file = self.session_files.get(ptm_pid)
+                session_state = self.session_states.get(ptm_pid)
+                if session_state is None:
+                    session_state = _SessionState()
+                    self.session_states[ptm_pid] = session_state
+
+                content = ''
+                if self.timestamp_frequency_seconds > 0 and time.time() - session_state.last_timestamp > self.timestamp_frequency_seconds:
+                    session_state.last_timestamp = time.time()
+                    # Output date string always in UTC
+                    date_string = datetime.datetime.utcnow().isoformat() + "Z"
+                    content = f"\n[[ sshlog time: {date_string} ]]\n"
+
+                # Removes escape sequences and makes output data more suitable for log files
+                cleaned_terminal_data = session_state.sanitizer.sanitize(event_data['terminal_data'])
+
+                session_file.write(content + cleaned_terminal_data)
 
         elif event_data['event_type'] == SSHTRACE_EVENT_CLOSE_CONNECTION:
             end_time_iso_8601 = datetime.datetime.utcfromtimestamp(event_data['end_time'] / 1000.0).isoformat() + 'Z'
             content = f"\n[[ sshlog {event_data['event_type']} user: {event_data['username']} at {end_time_iso_8601} ]]\n"
-            self.write_data(output_path, content)
+
+            # The session is over, write out any held back terminal data and release its file and state
+            with self.session_files.lock:
+                session_state = self.session_states.pop(ptm_pid, None)
+                if session_state is not None:
+                    content = session_state.sanitizer.flush() + content
+                self.write_data(ptm_pid, content)
+                self.session_files.close(ptm_pid)
 
         elif event_data['event_type'] == SSHTRACE_EVENT_ESTABLISHED_CONNECTION:
             start_time_iso_8601 = datetime.datetime.utcfromtimestamp(event_data['start_time'] / 1000.0).isoformat() + 'Z'
             content = f"\n[[ sshlog {event_data['event_type']} user: {event_data['username']} at {start_time_iso_8601} ]]\n"
-            self.write_data(output_path, content)
+            self.write_data(ptm_pid, content)
@@ -0,0 +1,92 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+from plugins.common.plugin import ActionPlugin
+from plugins.common.session_file_cache import SessionFileCache
+from plugins.common.session_recording import SessionRecordingWriter, RECORDING_FILE_EXTENSION
+from comms.event_types import *
+import os
+import threading
+import time
+
+
+class sessionrecording_action(ActionPlugin):
+
+    def init_action(self, log_directory, index_interval_seconds=1.0, max_open_files=256, flush_interval_seconds=5):
+        self.log_directory = log_directory
+        self.index_interval_seconds = index_interval_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.logger.info(f"Initialized action {self.name} with log directory {log_directory}")
+
+        # Recordings of active sessions stay open (buffered) between events, up to max_open_files at a time
+        self.session_files = SessionFileCache(self._open_recording, max_open_files=max_open_files)
+
+        # Ensure directory exists
+        self._make_log_directory()
+
+        self.flush_stop = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_loop, name=f"sessionrecording-flush-{self.name}", daemon=True)
+        self.flush_thread.start()
+
+    def shutdown_action(self):
+        self.flush_stop.set()
+        self.flush_thread.join()
+        self.session_files.close_all()
+
+    def _make_log_directory(self):
+        if not os.path.isdir(self.log_directory):
+            # Make the directory readable only by owner (root)
+            os.makedirs(self.log_directory, mode=0o700)
+
+    def _get_session(self, ptm_pid):
+        return self.session_tracker.get_session(ptm_pid) if self.session_tracker is not None else None
+
+    def _header_info(self, ptm_pid, session):
+        header_info = {'ptm_pid': ptm_pid}
+        if session is not None:
+            header_info['username'] = session.username
+            header_info['client_ip'] = session.client_ip
+            header_info['tty_id'] = session.tty_id
+            header_info['session_start_time'] = session.start_time
+        return header_info
+
+    def _open_recording(self, ptm_pid):
+        # ptm_pids are reused, so the session start time is part of the file name.  Otherwise a later session with
+        # the same ptm_pid would be appended to an earlier recording
+        session = self._get_session(ptm_pid)
+        if session is not None:
+            file_name = f"ssh_{ptm_pid}_{session.start_time}{RECORDING_FILE_EXTENSION}"
+        else:
+            file_name = f"ssh_{ptm_pid}{RECORDING_FILE_EXTENSION}"
+        output_path = os.path.join(self.log_directory, file_name)
+        try:
+            return SessionRecordingWriter(output_path, self._header_info(ptm_pid, session), self.index_interval_seconds)
+        except FileNotFoundError:
+            # The log directory was removed while running
+            self._make_log_directory()
+            return SessionRecordingWriter(output_path, self._header_info(ptm_pid, session), self.index_interval_seconds)
+
+    def _flush_loop(self):
+        while not self.flush_stop.wait(self.flush_interval_seconds):
+            self.session_files.flush_all()
+
+    def execute(self, event_data):
+        ptm_pid = event_data['ptm_pid']
+
+        if event_data['event_type'] == SSHTRACE_EVENT_TERMINAL_UPDATE:
+            # Terminal updates do not carry a timestamp.  Use the time the event was queued for this action, so
+            # the recording timing is not distorted by time spent waiting in the queue
+            event_time = time.time() - self.executor.current_queue_wait()
+            session = self._get_session(ptm_pid)
+            with self.session_files.lock:
+                recording = self.session_files.get(ptm_pid)
+                if session is not None and recording.header_info.get('session_start_time') != session.start_time:
+                    # The recording is for an earlier session with this ptm_pid, whose close event was not handled
+                    self.session_files.close(ptm_pid)
+                    recording = self.session_files.get(ptm_pid)
+                recording.write_output(event_data['terminal_data'], event_time=event_time)
+
+        elif event_data['event_type'] == SSHTRACE_EVENT_CLOSE_CONNECTION:
+            # The session is over, release its recording
+            self.session_files.close(ptm_pid)
@@ -3,20 +3,79 @@
 # Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
 
 from plugins.common.plugin import ActionPlugin
-import requests
+from plugins.common.http_client import create_session, send_with_retries, AIOHTTP_AVAILABLE, create_async_session, \
+    send_with_retries_async, RETRY_STATUS_CODES, MAX_RATE_LIMIT_WAIT_SEC
+import asyncio
 import json
 import socket
+import threading
+import time
 from comms.event_types import *
 
+# Keep digest messages readable, additional groups are summarized on one line
+DIGEST_MAX_GROUPS = 25
+
+# At shutdown the final digest gets a single attempt with a shorter read timeout, and the digest thread is
+# given this long to finish it
+DIGEST_FINAL_POST_TIMEOUT = (5, 10)
+DIGEST_SHUTDOWN_TIMEOUT_SEC = 20
+
 class slack_action(ActionPlugin):
+    # With aiohttp installed, messages are posted from the shared asyncio loop rather than worker threads
+    async_available = AIOHTTP_AVAILABLE
 
-    def init_action(self, slack_webhook_url):
+    def init_action(self, slack_webhook_url, digest=False, digest_window_seconds=60,
+                    digest_group_by=['event_type', 'username', 'client_ip'], max_retries=3):
         self.slack_webhook_url = slack_webhook_url
+        self.max_retries = max_retries
+
+        # A single keep-alive connection.  Messages are posted one at a time so that a rate limit response
+        # (429 + Retry-After) pauses all sends for this webhook.  The aiohttp session and lock belong to the
+        # asyncio loop, so they are created by the first message
+        self.session = None
+        self.async_session = None
+        self.async_post_lock = None
+        if not self.is_async:
+            self.session = create_session(1)
+            self.post_lock = threading.Lock()
+
+        # In digest mode, events are grouped over a window and posted as one summary message
+        self.digest = digest
+        self.digest_window_seconds = digest_window_seconds
+        self.digest_group_by = digest_group_by if isinstance(digest_group_by, list) else [digest_group_by]
+        self.digest_groups = {}
+        self.digest_lock = threading.Lock()
+        self.digest_stop = threading.Event()
+        self.digest_thread = None
+        if digest and self.is_async:
+            self.executor.start_task(self._digest_loop_async())
+        elif digest:
+            self.digest_thread = threading.Thread(target=self._digest_loop, name=f"slack-digest-{self.name}", daemon=True)
+            self.digest_thread.start()
 
         self.logger.info(f"Initialized action {self.name} with slack channel {self.slack_webhook_url}")
 
     def shutdown_action(self):
-        pass
+        if self.digest_thread is not None:
+            # Also ends any wait between retries of a digest being posted
+            self.digest_stop.set()
+            self.digest_thread.join(DIGEST_SHUTDOWN_TIMEOUT_SEC)
+            if self.digest_thread.is_alive():
+                self.logger.warning(f"Slack action {self.name} digest was still being posted after "
+                                    f"{DIGEST_SHUTDOWN_TIMEOUT_SEC} seconds, shutting down without it")
+            self.digest_thread = None
+            self._log_unsent_digest()
+        if self.session is not None:
+            self.session.close()
+
+    async def shutdown_async(self):
+        # The digest task has been cancelled, post anything collected since the last window.  Only one attempt is
+        # made, so a rate limit cannot hold up shutdown
+        if self.digest:
+            await self._flush_digest_async(retry=False)
+            self._log_unsent_digest()
+        if self.async_session is not None:
+            await self.async_session.close()
 
     def _client_ip_str(self, event_data):
         client_port = event_data['tcp_info']['client_port']
@@ -24,9 +83,8 @@ class slack_action(ActionPlugin):
             return f"{event_data['tcp_info']['client_ip']}"
         else:
             return f"{event_data['tcp_info']['client_ip']}:{client_port}"
-    def execute(self, event_data):
-
 
+    def _format_message(self, event_data):
         message = ''
         session_id = f"{socket.gethostname()}:{event_data['ptm_pid']}"
 
@@ -44,18 +102,173 @@ class slack_action(ActionPlugin):
             message = f"{event_data['username']} finished executing command {event_data['filename']} on {session_id}\n{event_data['args']}"
         elif event_data['event_type'] == SSHTRACE_EVENT_FILE_UPLOAD:
             message = f"{event_data['username']} uploaded file {event_data['target_path']} on {session_id}"
-        elif event_data['event_type'] == SSHTRACE_EVENT_TERMINAL_UPDATE:
-            self.logger.warning("Terminal update events probably should not be sent to slack.  Assuming misconfigurationand skipping")
-            return
+        return message
 
-        self.logger.info(f"{self.name} Slack action triggered on {event_data['event_type']} sending slack message")
+    def _post_message(self, message, timeout=(5, 30), stop_event=None):
         content = {
             'text': message
         }
 
-        response = requests.post(self.slack_webhook_url,
-                                 data=json.dumps(content),
-                                 headers={'Content-Type': 'application/json'})
+        with self.post_lock:
+            response = send_with_retries(self.session, 'POST', self.slack_webhook_url, timeout,
+                                         max_retries=self.max_retries, stop_event=stop_event,
+                                         data=json.dumps(content),
+                                         headers={'Content-Type': 'application/json'})
 
+        return self._check_response(response)
+
+    async def _post_message_async(self, message, retry=True):
+        if self.async_session is None:
+            self.async_session = create_async_session(1)
+            self.async_post_lock = asyncio.Lock()
+
+        async with self.async_post_lock:
+            response = await send_with_retries_async(self.async_session, 'POST', self.slack_webhook_url, (5, 30),
+                                                     max_retries=self.max_retries if retry else 0,
+                                                     max_rate_limit_wait_seconds=MAX_RATE_LIMIT_WAIT_SEC if retry else 0,
+                                                     data=json.dumps({'text': message}),
+                                                     headers={'Content-Type': 'application/json'})
+
+        return self._check_response(response)
+
+    def _check_response(self, response):
+        ''' Returns False if the message was not accepted but could be on a later attempt (e.g., rate limited) '''
         self.logger.debug(f"Slack webhook response: {response.status_code} - {response.content}")
+        if response.status_code != 200:
+            self.logger.warning(f"Slack action {self.name} message was not accepted: {response.status_code} - {response.content}")
+        return response.status_code not in RETRY_STATUS_CODES
+
+    def _digest_key(self, event_data):
+        key = []
+        for field in self.digest_group_by:
+            if field == 'client_ip':
+                key.append(event_data.get('tcp_info', {}).get('client_ip', ''))
+            else:
+                key.append(event_data.get(field, ''))
+        return tuple(key)
+
+    def _digest_loop(self):
+        while not self.digest_stop.wait(self.digest_window_seconds):
+            self._flush_digest()
+        # Post anything collected since the last window before shutting down.  digest_stop is set, so this is a
+        # single attempt
+        self._flush_digest(timeout=DIGEST_FINAL_POST_TIMEOUT)
+
+    def _take_digest_groups(self):
+        with self.digest_lock:
+            groups = self.digest_groups
+            self.digest_groups = {}
+        return groups
+
+    def _requeue_digest_groups(self, groups):
+        ''' Merges a digest that could not be posted back in, so that it is posted with the next window '''
+        with self.digest_lock:
+            for key, group in groups.items():
+                current = self.digest_groups.get(key)
+                if current is None:
+                    self.digest_groups[key] = group
+                else:
+                    current['count'] += group['count']
+                    current['message'] = group['message']
+                    current['first_time'] = group['first_time']
+        self.logger.warning(f"Slack action {self.name} digest was not posted, it is kept for the next attempt")
+
+    def _log_unsent_digest(self):
+        ''' Called at shutdown, reports a digest that could not be posted '''
+        with self.digest_lock:
+            unsent_events = sum(group['count'] for group in self.digest_groups.values())
+        if unsent_events > 0:
+            self.logger.warning(f"Slack action {self.name} digest of {unsent_events} events was not posted "
+                                f"before shutdown")
+
+    def _flush_digest(self, timeout=(5, 30)):
+        groups = self._take_digest_groups()
+        if len(groups) == 0:
+            return
+
+        try:
+            posted = self._post_message(self._format_digest(groups), timeout=timeout, stop_event=self.digest_stop)
+        except Exception:
+            self.logger.exception(f"Error posting slack digest for action {self.name}")
+            posted = False
+        if not posted:
+            self._requeue_digest_groups(groups)
+
+    async def _digest_loop_async(self):
+        while True:
+            await asyncio.sleep(self.digest_window_seconds)
+            await self._flush_digest_async()
+
+    async def _flush_digest_async(self, retry=True):
+        groups = self._take_digest_groups()
+        if len(groups) == 0:
+            return
+
+        try:
+            posted = await self._post_message_async(self._format_digest(groups), retry=retry)
+        except asyncio.CancelledError:
+            # Shutting down.  Keep the digest for the final flush in shutdown_async
+            self._requeue_digest_groups(groups)
+            raise
+        except Exception:
+            self.logger.exception(f"Error posting slack digest for action {self.name}")
+            posted = False
+        if not posted:
+            self._requeue_digest_groups(groups)
+
+    def _format_digest(self, groups):
+        total_events = sum(group['count'] for group in groups.values())
+        # A digest that could not be posted is merged into the next one, so it can cover more than one window
+        window_seconds = max(self.digest_window_seconds, round(time.time() - min(group['first_time'] for group in groups.values())))
+        lines = [f"{total_events} events on {socket.gethostname()} in the last {window_seconds} seconds"]
+
+        # Largest groups first
+        sorted_groups = sorted(groups.items(), key=lambda item: item[1]['count'], reverse=True)
+        for key, group in sorted_groups[:DIGEST_MAX_GROUPS]:
+            if group['count'] == 1:
+                # A single event is more useful as the regular message
+                lines.append(f"• {group['message']}")
+                continue
+            key_desc = ' '.join(f"{field}={value}" for field, value in zip(self.digest_group_by, key))
+            first_time = time.strftime('%H:%M:%S', time.localtime(group['first_time']))
+            last_time = time.strftime('%H:%M:%S', time.localtime(group['last_time']))
+            lines.append(f"• {group['count']}x {key_desc} ({first_time} - {last_time})")
+
+        if len(sorted_groups) > DIGEST_MAX_GROUPS:
+            remaining = sorted_groups[DIGEST_MAX_GROUPS:]
+            lines.append(f"• ... and {sum(group['count'] for key, group in remaining)} more events in {len(remaining)} groups")
+
+        return '\n'.join(lines)
+
+    def _prepare_message(self, event_data):
+        ''' Returns the message to post now, or None if the event is skipped or added to the digest '''
+        if event_data['event_type'] == SSHTRACE_EVENT_TERMINAL_UPDATE:
+            self.logger.warning("Terminal update events probably should not be sent to slack.  Assuming misconfigurationand skipping")
+            return None
+
+        message = self._format_message(event_data)
+
+        if self.digest:
+            now = time.time()
+            key = self._digest_key(event_data)
+            with self.digest_lock:
+                group = self.digest_groups.get(key)
+                if group is None:
+                    self.digest_groups[key] = {'count': 1, 'message': message, 'first_time': now, 'last_time': now}
+                else:
+                    group['count'] += 1
+                    group['last_time'] = now
+            return None
+
+        self.logger.info(f"{self.name} Slack action triggered on {event_data['event_type']} sending slack message")
+        return message
+
+    def execute(self, event_data):
+        message = self._prepare_message(event_data)
+        if message is not None:
+            self._post_message(message)
 
+    async def execute_async(self, event_data):
+        message = self._prepare_message(event_data)
+        if message is not None:
+            await self._post_message_async(message)
@@ -3,13 +3,25 @@
 # Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
 
 from plugins.common.plugin import ActionPlugin
+import asyncio
 import socket
+import threading
 import datadog
 from comms.event_types import *
 
+DURATION_METRIC_TYPES = ['timing', 'distribution', 'histogram']
+
+# Tag set used in place of new tag sets once max_tag_sets is reached
+OVERFLOW_TAGS = ('tag_overflow:true',)
+
+
 class statsd_action(ActionPlugin):
 
-    def init_action(self, server_address, port=8125, statsd_prefix='sshlog'):
+    def init_action(self, server_address, port=8125, statsd_prefix='sshlog', flush_interval_seconds=10,
+                    max_tag_sets=1000, session_tags=False, duration_metric_type='timing'):
+
+        if duration_metric_type not in DURATION_METRIC_TYPES:
+            raise RuntimeError(f"Action {self.name} duration_metric_type must be one of {', '.join(DURATION_METRIC_TYPES)}")
 
         self.client = datadog.DogStatsd(
             host=server_address, port=port,
@@ -17,29 +29,90 @@ class statsd_action(ActionPlugin):
             namespace=statsd_prefix,
             constant_tags=[f"hostname:{socket.gethostname()}"]
         )
+        self.send_duration = getattr(self.client, duration_metric_type)
 
-        self.logger.info(f"Initialized action {self.name} with server {server_address}:{port}")
+        # pid and client_port tags create a new series for every session, so they are off unless requested
+        self.session_tags = session_tags
+        self.max_tag_sets = max_tag_sets
+        self.tag_sets = set()
+        self.tag_overflow_warned = False
 
-    def shutdown_action(self):
-        pass
+        # Metrics are aggregated in memory and sent every flush_interval_seconds:
+        # counters are summed per (metric, tags), durations are sent as individual samples
+        self.flush_interval_seconds = flush_interval_seconds
+        self.metrics_lock = threading.Lock()
+        self.counters = {}
+        self.durations = {}
 
+        # Runs on the shared asyncio loop with the action's events.  Metrics are sent over UDP, which does not block
+        self.executor.start_task(self._flush_loop())
 
-    def execute(self, event_data):
+        self.logger.info(f"Initialized action {self.name} with server {server_address}:{port}")
 
-        if event_data['event_type'] == SSHTRACE_EVENT_TERMINAL_UPDATE:
-            self.logger.warning(
-                "Terminal update events probably should not trigger stats.  Assuming misconfigurationand skipping")
+    async def shutdown_async(self):
+        # The flush task has been cancelled, send anything aggregated since the last flush
+        self._flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                self._flush()
+            except:
+                self.logger.exception(f"Error sending metrics for action {self.name}")
+
+    def _flush(self):
+        with self.metrics_lock:
+            counters = self.counters
+            durations = self.durations
+            self.counters = {}
+            self.durations = {}
+            # max_tag_sets limits the tag sets sent in each interval
+            self.tag_sets = set()
+
+        if len(counters) == 0 and len(durations) == 0:
             return
 
-        tags = [
-            f"user:{event_data['username']}",
-            f"pid:{event_data['ptm_pid']}",
-        ]
+        # Buffer the metrics so that many are packed into each UDP packet
+        self.client.open_buffer()
+        try:
+            for (metric, tags), count in counters.items():
+                self.client.increment(metric, count, tags=list(tags))
+            for (metric, tags), samples in durations.items():
+                for duration_ms in samples:
+                    self.send_duration(metric, duration_ms, tags=list(tags))
+        finally:
+            self.client.close_buffer()
+
+        self.logger.debug(f"Statsd action sent {len(counters)} counters and {len(durations)} duration series")
+
+    def _limit_tags(self, tags):
+        '''
+        Returns the tag set, or the overflow tag set if it would exceed max_tag_sets in the current flush interval.
+        Call with metrics_lock held
+        '''
+        if not self.max_tag_sets or tags in self.tag_sets:
+            return tags
+        if len(self.tag_sets) < self.max_tag_sets:
+            self.tag_sets.add(tags)
+            return tags
+        if not self.tag_overflow_warned:
+            self.tag_overflow_warned = True
+            self.logger.warning(f"Action {self.name} reached max_tag_sets ({self.max_tag_sets}).  "
+                                f"Metrics with new tag combinations are reported with {OVERFLOW_TAGS[0]}")
+        return OVERFLOW_TAGS
+
+    def _tags(self, event_data):
+        tags = [f"user:{event_data['username']}"]
+
+        if self.session_tags:
+            tags.append(f"pid:{event_data['ptm_pid']}")
 
         # For connection types, include the client IP and prot
         if 'tcp_info' in event_data:
             tags.append(f"client_ip:{event_data['tcp_info']['client_ip']}")
-            tags.append(f"client_port:{event_data['tcp_info']['client_port']}")
+            if self.session_tags:
+                tags.append(f"client_port:{event_data['tcp_info']['client_port']}")
 
         # Append special tags for different data types.  Useful for filtering metrics
         if event_data['event_type'] in [SSHTRACE_EVENT_COMMAND_START, SSHTRACE_EVENT_COMMAND_END]:
@@ -47,9 +120,41 @@ class statsd_action(ActionPlugin):
         elif event_data['event_type'] in [SSHTRACE_EVENT_FILE_UPLOAD]:
             tags.append(f"upload_file:{event_data['target_path']}")
 
-        self.logger.debug(f"Statsd action triggered")
+        return tuple(tags)
 
-        self.client.increment(event_data['event_type'], 1, tags=tags)  # Increment the counter.
+    def _duration(self, event_data):
+        ''' Returns the (metric, milliseconds) of finished commands and closed sessions, otherwise None '''
+        if event_data['event_type'] == SSHTRACE_EVENT_COMMAND_END:
+            metric = 'command_duration'
+        elif event_data['event_type'] == SSHTRACE_EVENT_CLOSE_CONNECTION:
+            metric = 'session_duration'
+        else:
+            return None
 
+        start_time = event_data.get('start_time', 0)
+        end_time = event_data.get('end_time', 0)
+        if start_time <= 0 or end_time < start_time:
+            return None
+        return metric, end_time - start_time
 
+    async def execute_async(self, event_data):
 
+        if event_data['event_type'] == SSHTRACE_EVENT_TERMINAL_UPDATE:
+            self.logger.warning(
+                "Terminal update events probably should not trigger stats.  Assuming misconfigurationand skipping")
+            return
+
+        tags = self._tags(event_data)
+        duration = self._duration(event_data)
+
+        with self.metrics_lock:
+            tags = self._limit_tags(tags)
+
+            counter_key = (event_data['event_type'], tags)
+            self.counters[counter_key] = self.counters.get(counter_key, 0) + 1
+
+            if duration is not None:
+                metric, duration_ms = duration
+                self.durations.setdefault((metric, tags), []).append(duration_ms)
+
+        self.logger.debug(f"Statsd action triggered")
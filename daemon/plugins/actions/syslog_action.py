@@ -3,51 +3,95 @@
 # Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
 
 from plugins.common.plugin import ActionPlugin
+import asyncio
 import json
+import socket
+from datetime import datetime
 import pysyslogclient
 from events.log_formatter import LogFormatter
+from plugins.common.syslog_transport import TcpSyslogTransport
 
 
 class syslog_action(ActionPlugin):
+    default_batch_max_events = 100
+    default_batch_max_ms = 100
 
     def init_action(self, server_address, port=514, program_name='sshlog', udp=True, output_json=False,
-                    facility=pysyslogclient.FAC_SYSTEM, severity=pysyslogclient.SEV_INFO):
+                    facility=pysyslogclient.FAC_SYSTEM, severity=pysyslogclient.SEV_INFO, tcp_buffer_size=10000):
 
         self.output_json = output_json
         self.facility = facility
         self.severity = severity
         self.program_name = program_name
+        self.udp = udp
         self.event_formatter = LogFormatter()
 
+        self.server_address = server_address
+        self.port = port
+        self.transport = None
+        # Runs on the shared asyncio loop.  UDP datagrams are sent with a non-blocking asyncio endpoint,
+        # created by the first message
+        self.udp_endpoint = None
         if udp:
-            proto = "UDP"
+            client = pysyslogclient.SyslogClientRFC5424(server_address, port, proto="UDP")
+            self.client_name = client.client_name
+            self.max_message_length = client.max_message_length
         else:
-            proto = "TCP"
-
-        self.client = pysyslogclient.SyslogClientRFC5424(server_address, port, proto=proto)
+            # One persistent connection, written by the transport's own thread.  Workers only queue messages
+            self.transport = TcpSyslogTransport(server_address, port, max_buffered_messages=tcp_buffer_size,
+                                                name=self.name)
+            self.client_name = socket.getfqdn() or socket.gethostname()
 
         self.logger.info(f"Initialized action {self.name} with server {server_address}:{port}")
 
     def shutdown_action(self):
-        pass
+        if self.transport is not None:
+            self.transport.close()
 
-    def execute(self, event_data):
+    async def shutdown_async(self):
+        if self.udp_endpoint is not None:
+            self.udp_endpoint.close()
+            self.udp_endpoint = None
 
+    def _format_message(self, event_data):
         if self.output_json:
-            message_content = json.dumps(event_data)
-        else:
-            # Reformat each item into a log-friendly format
-
-            message_content = self.event_formatter.format(event_data)
-
-
-        self.client.log(message_content,
-                   facility=self.facility,
-                   severity=self.severity,
-                   program=self.program_name,
-                   pid=event_data['ptm_pid'])
-
-        self.logger.debug(f"Syslog action triggered")
-
-
-
+            return json.dumps(event_data)
+        # Reformat each item into a log-friendly format
+        return self.event_formatter.format(event_data)
+
+    def _build_rfc5424_message(self, message_content, pid, timestamp_s):
+        # Same layout as pysyslogclient.SyslogClientRFC5424.log()
+        pri = self.facility * 8 + self.severity
+        return f"<{pri}>1 {timestamp_s} {self.client_name} {self.program_name} {pid} - {message_content}".encode('utf-8')
+
+    async def _get_udp_endpoint(self):
+        if self.udp_endpoint is None:
+            self.udp_endpoint, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=(self.server_address, self.port))
+        return self.udp_endpoint
+
+    async def execute_batch_async(self, events):
+        timestamp_s = pysyslogclient.datetime2rfc3339(datetime.utcnow(), is_utc=True)
+        messages = [self._build_rfc5424_message(self._format_message(event_data), event_data['ptm_pid'], timestamp_s)
+                    for event_data in events]
+
+        if self.transport is not None:
+            # The TCP transport has its own sender thread, queueing never blocks the loop
+            self.transport.send(messages)
+            self.logger.debug(f"Syslog action queued {len(messages)} events")
+            return
+
+        try:
+            endpoint = await self._get_udp_endpoint()
+        except OSError:
+            self.logger.warning(f"Unable to connect to syslog server for action {self.name}.  Dropped {len(messages)} messages")
+            return
+
+        # Each message is its own datagram
+        for message in messages:
+            endpoint.sendto(message[:self.max_message_length])
+
+        self.logger.debug(f"Syslog action triggered for {len(messages)} events")
+
+    async def execute_async(self, event_data):
+        await self.execute_batch_async([event_data])
@@ -3,31 +3,128 @@
 # Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
 
 from plugins.common.plugin import ActionPlugin
-import requests
+from plugins.common.http_client import create_session, send_with_retries, AIOHTTP_AVAILABLE, create_async_session, \
+    send_with_retries_async
 import urllib.parse
 
+# Same encoding as requests uses for a dict passed as data
+FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
 class webhook_action(ActionPlugin):
+    # Batching defaults for bulk_post.  Without bulk_post every event is its own request, so events are not batched
+    # unless batch_max_events is configured
+    bulk_post_batch_max_events = 50
+    bulk_post_batch_max_ms = 100
+    # With aiohttp installed, requests are sent from the shared asyncio loop rather than worker threads
+    async_available = AIOHTTP_AVAILABLE
+
+    def __init__(self, name, session_tracker, batch_max_events=None, batch_max_ms=None, **kwargs):
+        # The executor is created before init_action, so the batch defaults are chosen here
+        if kwargs.get('bulk_post', False):
+            if batch_max_events is None:
+                batch_max_events = self.bulk_post_batch_max_events
+            if batch_max_ms is None:
+                batch_max_ms = self.bulk_post_batch_max_ms
+        super().__init__(name, session_tracker, batch_max_events=batch_max_events, batch_max_ms=batch_max_ms,
+                         **kwargs)
 
-    def init_action(self, webhook_url, do_get_request=False):
+    def init_action(self, webhook_url, do_get_request=False, bulk_post=False, connect_timeout=5, read_timeout=30,
+                    max_retries=3, retry_backoff_seconds=0.5):
         self.webhook_url = webhook_url
         self.do_get_request = do_get_request
+        # When enabled, each batch of events is sent as a single POST containing a JSON array
+        self.bulk_post = bulk_post
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        if bulk_post and do_get_request:
+            raise RuntimeError(f"Action {self.name} cannot use bulk_post with do_get_request")
+
+        # Connections are kept alive and shared by the action's workers.  The aiohttp session belongs to the
+        # asyncio loop, so it is created by the first request
+        self.session = None
+        self.async_session = None
+        if not self.is_async:
+            self.session = create_session(self.executor.max_concurrency)
         self.logger.info(f"Initialized action {self.name} with url {webhook_url}")
 
     def shutdown_action(self):
-        pass
+        if self.session is not None:
+            self.session.close()
+
+    async def shutdown_async(self):
+        if self.async_session is not None:
+            await self.async_session.close()
+
+    def _get_async_session(self):
+        if self.async_session is None:
+            self.async_session = create_async_session(self.executor.max_concurrency)
+        return self.async_session
+
+    def execute_batch(self, events):
+        if self.bulk_post:
+            response = send_with_retries(self.session, 'POST', self.webhook_url, self.timeout,
+                                         max_retries=self.max_retries, backoff_seconds=self.retry_backoff_seconds,
+                                         json=events)
+            self.logger.info(f"{self.name} webhook action triggered on a batch of {len(events)} events")
+            self._check_response(response)
+            return
+
+        for event_data in events:
+            try:
+                self.execute(event_data)
+            except:
+                self.logger.exception(f"Error sending webhook for action {self.name}")
 
     def execute(self, event_data):
         if self.do_get_request:
             # Structure a get request payload
             query_args = urllib.parse.urlencode(event_data)
             url = self.webhook_url + '?' + query_args
-            response = requests.get(url)
+            response = send_with_retries(self.session, 'GET', url, self.timeout,
+                                         max_retries=self.max_retries, backoff_seconds=self.retry_backoff_seconds)
 
         else:
             url = self.webhook_url
-            response = requests.post(url, data=event_data)
+            response = send_with_retries(self.session, 'POST', url, self.timeout,
+                                         max_retries=self.max_retries, backoff_seconds=self.retry_backoff_seconds,
+                                         data=event_data)
 
         self.logger.info(f"{self.name} webhook action triggered on {event_data['event_type']}")
+        self._check_response(response)
 
+    def _check_response(self, response):
         if response.status_code != 200:
             self.logger.info(f"Received {response.status_code} response for webhook action {self.name}")
+
+    async def execute_batch_async(self, events):
+        if self.bulk_post:
+            response = await send_with_retries_async(self._get_async_session(), 'POST', self.webhook_url, self.timeout,
+                                                     max_retries=self.max_retries,
+                                                     backoff_seconds=self.retry_backoff_seconds, json=events)
+            self.logger.info(f"{self.name} webhook action triggered on a batch of {len(events)} events")
+            self._check_response(response)
+            return
+
+        for event_data in events:
+            try:
+                await self.execute_async(event_data)
+            except:
+                self.logger.exception(f"Error sending webhook for action {self.name}")
+
+    async def execute_async(self, event_data):
+        if self.do_get_request:
+            url = self.webhook_url + '?' + urllib.parse.urlencode(event_data)
+            response = await send_with_retries_async(self._get_async_session(), 'GET', url, self.timeout,
+                                                     max_retries=self.max_retries,
+                                                     backoff_seconds=self.retry_backoff_seconds)
+        else:
+            response = await send_with_retries_async(self._get_async_session(), 'POST', self.webhook_url, self.timeout,
+                                                     max_retries=self.max_retries,
+                                                     backoff_seconds=self.retry_backoff_seconds,
+                                                     data=urllib.parse.urlencode(event_data, doseq=True),
+                                                     headers=FORM_HEADERS)
+
+        self.logger.info(f"{self.name} webhook action triggered on {event_data['event_type']}")
+        self._check_response(response)
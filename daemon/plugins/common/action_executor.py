@@ -0,0 +1,388 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import itertools
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from .fast_json import dumps_bytes, loads, materialize
+
+logger = logging.getLogger('sshlog_daemon')
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_SPILL = 'spill'
+OVERFLOW_POLICIES = [OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_SPILL]
+
+DEFAULT_SPILL_DIRECTORY = '/var/lib/sshlog/spill/'
+
+# Only warn about dropped events this often, so a stalled action does not flood the daemon log
+DROP_WARNING_INTERVAL_SEC = 60
+
+_STOP = object()
+
+
+class _SpillFile:
+    '''
+    Events that overflow a worker queue when the overflow policy is "spill".  Stored as one JSON line per event
+    and read back in order once the in-memory queue has drained.  The file name is stable for the action and worker,
+    so events left on disk by a daemon that did not shut down cleanly are handled after the restart
+    '''
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.count = 0
+        self._write_file = None
+        self._read_file = None
+        # Events from a previous run.  Their enqueue times are from another process's monotonic clock
+        self._replay_count = 0
+        if os.path.exists(file_path):
+            self._open_existing()
+
+    def _open_existing(self):
+        with open(self.file_path, 'rb') as existing_file:
+            content = existing_file.read()
+        # A line that was being written when the daemon stopped is incomplete and is discarded
+        complete_len = content.rfind(b'\n') + 1
+        self.count = content.count(b'\n', 0, complete_len)
+        if self.count == 0:
+            os.remove(self.file_path)
+            return
+        self._replay_count = self.count
+        self._write_file = open(self.file_path, 'r+b')
+        self._write_file.truncate(complete_len)
+        self._write_file.seek(complete_len)
+        self._read_file = open(self.file_path, 'rb')
+
+    def append(self, enqueue_time, event_data):
+        if self._write_file is None:
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            self._write_file = open(self.file_path, 'wb')
+            self._read_file = open(self.file_path, 'rb')
+        self._write_file.write(dumps_bytes([enqueue_time, materialize(event_data)]) + b'\n')
+        self._write_file.flush()
+        self.count += 1
+
+    def pop(self):
+        enqueue_time, event_data = loads(self._read_file.readline())
+        if self._replay_count > 0:
+            self._replay_count -= 1
+            enqueue_time = time.monotonic()
+        self.count -= 1
+        if self.count == 0:
+            self.close()
+        return enqueue_time, event_data
+
+    def close(self):
+        if self._write_file is not None:
+            self._write_file.close()
+            self._read_file.close()
+            self._write_file = None
+            self._read_file = None
+            os.remove(self.file_path)
+
+
+def _remove_stale_spill_files(spill_directory, name, max_concurrency):
+    '''
+    Spill files for worker numbers this action no longer has (max_concurrency was lowered, or files named by the
+    process id of an older version) cannot be replayed in order, so they are removed with a warning
+    '''
+    if not os.path.isdir(spill_directory):
+        return
+    current_files = {f"{name}-{i}.spill" for i in range(max_concurrency)}
+    stale_pattern = re.compile(re.escape(name) + r'-\d+(-\d+)?\.spill')
+    for file_name in os.listdir(spill_directory):
+        if file_name in current_files or not stale_pattern.fullmatch(file_name):
+            continue
+        file_path = os.path.join(spill_directory, file_name)
+        try:
+            with open(file_path, 'rb') as stale_file:
+                event_count = stale_file.read().count(b'\n')
+            os.remove(file_path)
+        except OSError:
+            logger.exception(f"Unable to remove stale spill file {file_path}")
+            continue
+        logger.warning(f"Action {name} removed stale spill file {file_path}, {event_count} events were not handled")
+
+
+class _Worker:
+    def __init__(self, queue_size, spill_file):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.spill_file = spill_file
+        # Guards the spill file and the decision to spill rather than queue
+        self.spill_lock = threading.Lock()
+        self.thread = None
+
+
+class OrderedActionExecutor:
+    '''
+    Runs an action's handler on a bounded number of worker threads with bounded queues.  Each event has an ordering
+    key (e.g., the session ptm_pid) and all events with the same key are handled by the same worker in the order they
+    were submitted, so events for one session are never handled out of order.  Events for different keys run in parallel.
+
+    When a worker queue is full the overflow policy decides what happens:
+      block       - the submitter waits for space (backpressure), which also holds up every other action
+      drop_oldest - the oldest queued event is discarded (the default)
+      drop_newest - the submitted event is discarded
+      spill       - the event is written to disk and handled once the queue has drained
+    '''
+    def __init__(self, handler, name, max_concurrency=4, queue_size=1000, overflow_policy=OVERFLOW_DROP_OLDEST,
+                 spill_directory=DEFAULT_SPILL_DIRECTORY, batch_handler=None, batch_max_events=1, batch_max_ms=0):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow_policy {overflow_policy}.  Valid policies are {OVERFLOW_POLICIES}")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        if batch_max_events < 1:
+            raise ValueError("batch_max_events must be at least 1")
+        if batch_max_ms < 0:
+            raise ValueError("batch_max_ms must not be negative")
+
+        self.handler = handler
+        self.max_concurrency = max_concurrency
+        # When batching, up to batch_max_events queued events are passed to batch_handler in one call.
+        # The worker waits up to batch_max_ms after the first event for more events to arrive
+        self.batch_handler = batch_handler if batch_max_events > 1 else None
+        self.batch_max_events = batch_max_events
+        self.batch_max_sec = batch_max_ms / 1000.0
+        self.name = name
+        self.overflow_policy = overflow_policy
+        self.queue_size = queue_size
+
+        # queue_size is split evenly between the workers, since each worker has its own queue
+        worker_queue_size = max(1, queue_size // max_concurrency)
+        self._workers = []
+        if overflow_policy == OVERFLOW_SPILL:
+            _remove_stale_spill_files(spill_directory, name, max_concurrency)
+        for i in range(max_concurrency):
+            spill_file = None
+            if overflow_policy == OVERFLOW_SPILL:
+                spill_file = _SpillFile(os.path.join(spill_directory, f"{name}-{i}.spill"))
+            self._workers.append(_Worker(worker_queue_size, spill_file))
+
+        self._start_lock = threading.Lock()
+        self._started = False
+        # Set by shutdown() before the stop requests are queued.  Later events are rejected, so a stop request can
+        # never be discarded by drop_oldest or stuck behind new events
+        self._stopping = False
+        self._round_robin = itertools.count()
+        # How long the event being handled by each worker thread waited in the queue
+        self._current = threading.local()
+
+        self._stats_lock = threading.Lock()
+        self._processed = 0
+        self._batches = 0
+        self._dropped = 0
+        self._spilled = 0
+        self._wait_total_sec = 0.0
+        self._wait_max_sec = 0.0
+        self._last_drop_warning = 0
+
+        replay_count = sum(worker.spill_file.count for worker in self._workers if worker.spill_file is not None)
+        if replay_count > 0:
+            logger.warning(f"Action {self.name} is handling {replay_count} events spilled to disk before a restart")
+            self._start()
+
+    def _start(self):
+        # Threads are started on first use so that actions which never fire do not hold threads
+        with self._start_lock:
+            if self._started:
+                return
+            for i, worker in enumerate(self._workers):
+                worker.thread = threading.Thread(target=self._run_worker, args=(worker,),
+                                                 name=f"action-{self.name}-{i}", daemon=True)
+                worker.thread.start()
+            self._started = True
+
+    def _next_item(self, worker, timeout=None):
+        ''' Returns the next work item, or None if nothing arrived before the timeout '''
+        try:
+            return worker.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+        if worker.spill_file is not None:
+            with worker.spill_lock:
+                if worker.spill_file.count > 0:
+                    return worker.spill_file.pop()
+
+        if timeout is not None and timeout <= 0:
+            return None
+        try:
+            return worker.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _drain_spill_file(self, worker):
+        # Anything left on disk was submitted before the stop request.  Events are read under the lock but handled
+        # outside it, the same as in _next_item()
+        if worker.spill_file is None:
+            return
+        while True:
+            with worker.spill_lock:
+                if worker.spill_file.count == 0:
+                    return
+                work_item = worker.spill_file.pop()
+            self._handle([work_item])
+
+    def _run_worker(self, worker):
+        while True:
+            work_item = self._next_item(worker)
+            if work_item is _STOP:
+                self._drain_spill_file(worker)
+                return
+
+            batch = [work_item]
+            if self.batch_handler is not None:
+                # Collect more events until the batch is full or the first event has waited long enough
+                deadline = time.monotonic() + self.batch_max_sec
+                while len(batch) < self.batch_max_events:
+                    work_item = self._next_item(worker, timeout=deadline - time.monotonic())
+                    if work_item is None:
+                        break
+                    if work_item is _STOP:
+                        # Flush what has been collected before stopping
+                        self._handle(batch)
+                        self._drain_spill_file(worker)
+                        return
+                    batch.append(work_item)
+
+            self._handle(batch)
+
+    def _handle(self, batch):
+        now = time.monotonic()
+        with self._stats_lock:
+            for enqueue_time, event_data in batch:
+                wait_sec = now - enqueue_time
+                self._wait_total_sec += wait_sec
+                if wait_sec > self._wait_max_sec:
+                    self._wait_max_sec = wait_sec
+            self._processed += len(batch)
+            self._batches += 1
+        try:
+            if self.batch_handler is not None:
+                self._current.wait_sec = now - batch[0][0]
+                self.batch_handler([event_data for enqueue_time, event_data in batch])
+            else:
+                for enqueue_time, event_data in batch:
+                    self._current.wait_sec = time.monotonic() - enqueue_time
+                    self.handler(event_data)
+        except:
+            logger.exception(f"Unhandled error in action executor {self.name}")
+
+    def _record_drop(self):
+        with self._stats_lock:
+            self._dropped += 1
+            dropped = self._dropped
+            warn = time.monotonic() - self._last_drop_warning > DROP_WARNING_INTERVAL_SEC
+            if warn:
+                self._last_drop_warning = time.monotonic()
+        if warn:
+            logger.warning(f"Action {self.name} queue is full, {dropped} events dropped so far "
+                           f"(overflow_policy: {self.overflow_policy}, queue_size: {self.queue_size})")
+
+    def submit(self, ordering_key, event_data):
+        '''
+        Queues an event for the handler
+        :param ordering_key: Events with the same (hashable) key are handled in order by the same worker.
+                             None means the event has no ordering requirement
+        :param event_data: The event to pass to the handler
+        '''
+        if self._stopping:
+            logger.debug(f"Action {self.name} is shutting down, event not handled")
+            return
+        if not self._started:
+            self._start()
+
+        if ordering_key is None:
+            worker = self._workers[next(self._round_robin) % len(self._workers)]
+        else:
+            worker = self._workers[hash(ordering_key) % len(self._workers)]
+
+        work_item = (time.monotonic(), event_data)
+
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            worker.queue.put(work_item)
+
+        elif self.overflow_policy == OVERFLOW_DROP_NEWEST:
+            try:
+                worker.queue.put_nowait(work_item)
+            except queue.Full:
+                self._record_drop()
+
+        elif self.overflow_policy == OVERFLOW_DROP_OLDEST:
+            while True:
+                try:
+                    worker.queue.put_nowait(work_item)
+                    break
+                except queue.Full:
+                    try:
+                        oldest = worker.queue.get_nowait()
+                    except queue.Empty:
+                        continue
+                    if oldest is _STOP:
+                        # shutdown() raced with this submit.  The stop request goes back and this event is dropped
+                        worker.queue.put(_STOP)
+                        self._record_drop()
+                        break
+                    self._record_drop()
+
+        else:
+            with worker.spill_lock:
+                # Once events are on disk, newer events must follow them there to keep the order
+                if worker.spill_file.count == 0:
+                    try:
+                        worker.queue.put_nowait(work_item)
+                        return
+                    except queue.Full:
+                        pass
+                worker.spill_file.append(*work_item)
+            with self._stats_lock:
+                self._spilled += 1
+
+    def current_queue_wait(self):
+        '''
+        Called from a handler, returns the seconds the event being handled (or the oldest event of the batch) waited
+        in the queue before it was handled
+        '''
+        return getattr(self._current, 'wait_sec', 0.0)
+
+    def stats(self):
+        ''' Returns queue depth, drop and wait time counters for sizing the queue '''
+        queue_depth = 0
+        for worker in self._workers:
+            queue_depth += worker.queue.qsize()
+            if worker.spill_file is not None:
+                queue_depth += worker.spill_file.count
+
+        with self._stats_lock:
+            return {
+                'queue_depth': queue_depth,
+                'queue_size': self.queue_size,
+                'max_concurrency': self.max_concurrency,
+                'overflow_policy': self.overflow_policy,
+                'processed': self._processed,
+                'batches': self._batches,
+                'dropped': self._dropped,
+                'spilled': self._spilled,
+                'wait_avg_ms': round(self._wait_total_sec * 1000.0 / self._processed, 3) if self._processed > 0 else 0,
+                'wait_max_ms': round(self._wait_max_sec * 1000.0, 3),
+            }
+
+    def shutdown(self, wait=True):
+        ''' Handles any queued events and stops the worker threads '''
+        self._stopping = True
+        if not self._started:
+            return
+        for worker in self._workers:
+            # Always blocks, the stop request must not be dropped
+            worker.queue.put(_STOP)
+        if wait:
+            for worker in self._workers:
+                worker.thread.join()
+        self._started = False
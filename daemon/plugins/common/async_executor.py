@@ -0,0 +1,305 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from .action_executor import OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_SPILL, \
+    OVERFLOW_POLICIES, DROP_WARNING_INTERVAL_SEC
+
+logger = logging.getLogger('sshlog_daemon')
+
+# Events are spread over this many ordering lanes.  Events with the same key always use the same lane, so they are
+# handled in order, and the action's semaphore limits how many lanes run the handler at once.  Having more lanes than
+# max_concurrency means one slow session only holds up the few sessions that share its lane.
+# Batching actions use max_concurrency lanes instead, since each lane collects its own batches
+ORDERING_LANES = 16
+
+_STOP = object()
+
+# How long the event being handled by the current lane waited in the queue
+_current_wait_sec = contextvars.ContextVar('current_wait_sec', default=0.0)
+
+
+class _ActionLoop:
+    ''' The asyncio event loop shared by all async actions.  It runs on one thread while any async action exists '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self.loop = None
+        self._thread = None
+
+    def acquire(self):
+        with self._lock:
+            if self._users == 0:
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run, args=(self.loop,), name='action-asyncio', daemon=True)
+                self._thread.start()
+            self._users += 1
+            return self.loop
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            loop = self.loop
+            thread = self._thread
+            self.loop = None
+            self._thread = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def _run(self, loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+
+_action_loop = _ActionLoop()
+
+
+class AsyncActionExecutor:
+    '''
+    The asyncio counterpart of OrderedActionExecutor, for actions that implement execute_async.  Handlers are
+    coroutines run on the shared action loop thread rather than on worker threads, and a per-action semaphore limits
+    how many run at once.  Events with the same ordering key are handled in the order they were submitted.
+
+    The overflow policies are the same as OrderedActionExecutor, except that spill is not supported and block is
+    used instead
+    '''
+    def __init__(self, handler, name, max_concurrency=4, queue_size=1000, overflow_policy=OVERFLOW_DROP_OLDEST,
+                 batch_handler=None, batch_max_events=1, batch_max_ms=0, shutdown_handler=None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow_policy {overflow_policy}.  Valid policies are {OVERFLOW_POLICIES}")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        if batch_max_events < 1:
+            raise ValueError("batch_max_events must be at least 1")
+        if batch_max_ms < 0:
+            raise ValueError("batch_max_ms must not be negative")
+        if overflow_policy == OVERFLOW_SPILL:
+            logger.warning(f"Action {name} runs on the asyncio loop, which does not support overflow_policy "
+                           f"{OVERFLOW_SPILL}.  Using {OVERFLOW_BLOCK}")
+            overflow_policy = OVERFLOW_BLOCK
+
+        self.handler = handler
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.batch_handler = batch_handler if batch_max_events > 1 else None
+        self.batch_max_events = batch_max_events
+        self.batch_max_sec = batch_max_ms / 1000.0
+        self.overflow_policy = overflow_policy
+        self.queue_size = queue_size
+        # Coroutine run on the loop once the queued events have been handled
+        self.shutdown_handler = shutdown_handler
+
+        # Events submitted but not yet taken by a lane.  Submitters wait on this for the block policy
+        self._pending = 0
+        self._pending_condition = threading.Condition()
+        self._round_robin = itertools.count()
+
+        self._stats_lock = threading.Lock()
+        self._processed = 0
+        self._batches = 0
+        self._dropped = 0
+        self._wait_total_sec = 0.0
+        self._wait_max_sec = 0.0
+        self._last_drop_warning = 0
+
+        self.loop = _action_loop.acquire()
+        self._lanes = None
+        self._lane_tasks = None
+        self._background_tasks = set()
+        asyncio.run_coroutine_threadsafe(self._start_lanes(), self.loop).result()
+
+    async def _start_lanes(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        lane_count = self.max_concurrency if self.batch_handler is not None else ORDERING_LANES
+        self._lanes = [asyncio.Queue() for _ in range(lane_count)]
+        self._lane_tasks = [asyncio.create_task(self._run_lane(lane)) for lane in self._lanes]
+
+    async def _next_item(self, lane, timeout):
+        ''' Returns the next work item, or None if nothing arrived before the timeout '''
+        try:
+            return lane.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        if timeout <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(lane.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _run_lane(self, lane):
+        while True:
+            work_item = await lane.get()
+            if work_item is _STOP:
+                return
+
+            batch = [work_item]
+            if self.batch_handler is not None:
+                # Collect more events until the batch is full or the first event has waited long enough
+                deadline = self.loop.time() + self.batch_max_sec
+                while len(batch) < self.batch_max_events:
+                    work_item = await self._next_item(lane, deadline - self.loop.time())
+                    if work_item is None:
+                        break
+                    if work_item is _STOP:
+                        # Flush what has been collected before stopping
+                        await self._handle(batch)
+                        return
+                    batch.append(work_item)
+
+            await self._handle(batch)
+
+    async def _handle(self, batch):
+        with self._pending_condition:
+            self._pending -= len(batch)
+            self._pending_condition.notify_all()
+
+        async with self._semaphore:
+            now = time.monotonic()
+            with self._stats_lock:
+                for enqueue_time, event_data in batch:
+                    wait_sec = now - enqueue_time
+                    self._wait_total_sec += wait_sec
+                    if wait_sec > self._wait_max_sec:
+                        self._wait_max_sec = wait_sec
+                self._processed += len(batch)
+                self._batches += 1
+            try:
+                if self.batch_handler is not None:
+                    _current_wait_sec.set(now - batch[0][0])
+                    await self.batch_handler([event_data for enqueue_time, event_data in batch])
+                else:
+                    for enqueue_time, event_data in batch:
+                        _current_wait_sec.set(time.monotonic() - enqueue_time)
+                        await self.handler(event_data)
+            except:
+                logger.exception(f"Unhandled error in async action executor {self.name}")
+
+    def _record_drop(self):
+        with self._stats_lock:
+            self._dropped += 1
+            dropped = self._dropped
+            warn = time.monotonic() - self._last_drop_warning > DROP_WARNING_INTERVAL_SEC
+            if warn:
+                self._last_drop_warning = time.monotonic()
+        if warn:
+            logger.warning(f"Action {self.name} queue is full, {dropped} events dropped so far "
+                           f"(overflow_policy: {self.overflow_policy}, queue_size: {self.queue_size})")
+
+    def _enqueue(self, lane, work_item):
+        # Runs on the loop
+        if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+            with self._pending_condition:
+                over_limit = self._pending > self.queue_size
+                if over_limit:
+                    self._pending -= 1
+            if over_limit:
+                self._record_drop()
+                if lane.qsize() == 0:
+                    # Nothing older in this lane, so the new event is the one dropped
+                    return
+                if lane.get_nowait() is _STOP:
+                    # Submitted after shutdown started.  The stop request is kept and the new event is dropped
+                    lane.put_nowait(_STOP)
+                    return
+        lane.put_nowait(work_item)
+
+    def submit(self, ordering_key, event_data):
+        '''
+        Queues an event for the handler.  Must not be called from the action loop thread
+        :param ordering_key: Events with the same (hashable) key are handled in order.
+                             None means the event has no ordering requirement
+        :param event_data: The event to pass to the handler
+        '''
+        if ordering_key is None:
+            lane = self._lanes[next(self._round_robin) % len(self._lanes)]
+        else:
+            lane = self._lanes[hash(ordering_key) % len(self._lanes)]
+
+        work_item = (time.monotonic(), event_data)
+
+        with self._pending_condition:
+            if self._pending >= self.queue_size:
+                if self.overflow_policy == OVERFLOW_BLOCK:
+                    self._pending_condition.wait_for(lambda: self._pending < self.queue_size)
+                elif self.overflow_policy == OVERFLOW_DROP_NEWEST:
+                    work_item = None
+            if work_item is not None:
+                self._pending += 1
+
+        if work_item is None:
+            self._record_drop()
+            return
+        self.loop.call_soon_threadsafe(self._enqueue, lane, work_item)
+
+    def start_task(self, coroutine):
+        '''
+        Runs a background coroutine for the action on the loop (e.g., a periodic flush).  It is cancelled at shutdown,
+        after the queued events have been handled and before the shutdown handler runs.  Thread safe
+        '''
+        def _start():
+            task = self.loop.create_task(coroutine)
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        self.loop.call_soon_threadsafe(_start)
+
+    def run(self, coroutine):
+        ''' Runs a coroutine on the loop and returns its result.  Must not be called from the action loop thread '''
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def current_queue_wait(self):
+        '''
+        Called from a handler, returns the seconds the event being handled (or the oldest event of the batch) waited
+        in the queue before it was handled
+        '''
+        return _current_wait_sec.get()
+
+    def stats(self):
+        ''' Returns queue depth, drop and wait time counters for sizing the queue '''
+        with self._pending_condition:
+            queue_depth = self._pending
+
+        with self._stats_lock:
+            return {
+                'queue_depth': queue_depth,
+                'queue_size': self.queue_size,
+                'max_concurrency': self.max_concurrency,
+                'overflow_policy': self.overflow_policy,
+                'processed': self._processed,
+                'batches': self._batches,
+                'dropped': self._dropped,
+                'spilled': 0,
+                'wait_avg_ms': round(self._wait_total_sec * 1000.0 / self._processed, 3) if self._processed > 0 else 0,
+                'wait_max_ms': round(self._wait_max_sec * 1000.0, 3),
+            }
+
+    async def _stop(self):
+        for lane in self._lanes:
+            lane.put_nowait(_STOP)
+        await asyncio.gather(*self._lane_tasks)
+
+        for task in list(self._background_tasks):
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+
+        if self.shutdown_handler is not None:
+            await self.shutdown_handler()
+
+    def shutdown(self):
+        ''' Handles any queued events, runs the shutdown handler and releases the loop '''
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._stop(), self.loop).result()
+        self.loop = None
+        _action_loop.release()
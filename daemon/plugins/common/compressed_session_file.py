@@ -0,0 +1,170 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import gzip
+import importlib
+import json
+import time
+
+if importlib.util.find_spec("zstandard") is not None:
+    import zstandard
+else:
+    zstandard = None
+
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_TYPES = [COMPRESSION_GZIP, COMPRESSION_ZSTD]
+
+COMPRESSION_FILE_EXTENSIONS = {
+    COMPRESSION_GZIP: '.gz',
+    COMPRESSION_ZSTD: '.zst',
+}
+
+# The sidecar index is stored next to the compressed file with this extension appended
+INDEX_FILE_EXTENSION = '.idx'
+
+
+def check_compression_available(compression):
+    ''' Raises a RuntimeError if the compression type is unknown or its library is not installed '''
+    if compression not in COMPRESSION_TYPES:
+        raise RuntimeError(f"Unknown compression {compression}, expected one of {', '.join(COMPRESSION_TYPES)}")
+    if compression == COMPRESSION_ZSTD and zstandard is None:
+        raise RuntimeError("zstd compression requires the zstandard python package")
+
+
+def _compress(compression, data):
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    # mtime=0 keeps the frames reproducible
+    return gzip.compress(data, mtime=0)
+
+
+def _decompress(compression, data):
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class CompressedSessionFile:
+    '''
+    A text file written as a series of independently compressed frames.  Concatenated gzip members (or zstd
+    frames) are still a valid .gz (or .zst) file, so standard tools can decompress the whole file.
+    A frame is written once frame_bytes of text has been collected, or when the file is flushed and the frame
+    is older than frame_seconds.
+
+    For each frame, a JSON line is appended to the sidecar index (<path>.idx):
+      {"time": <unix time of the first write>, "offset": <compressed offset>, "length": <compressed length>,
+       "text_offset": <uncompressed offset>, "text_length": <uncompressed length>}
+    so a reader can seek to a point in time and decompress only the frames after it.
+    '''
+    def __init__(self, path, compression=COMPRESSION_GZIP, frame_bytes=256 * 1024, frame_seconds=60):
+        check_compression_available(compression)
+        self.path = path
+        self.compression = compression
+        self.frame_bytes = frame_bytes
+        self.frame_seconds = frame_seconds
+
+        # Open both files before writing anything, so a missing directory fails in the constructor
+        self.file = open(path, 'ab')
+        self.index_file = open(path + INDEX_FILE_EXTENSION, 'a+')
+        self.offset = self.file.tell()
+        self.text_offset = self._last_text_offset()
+
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.frame_time = None
+
+    def _last_text_offset(self):
+        ''' Continues the uncompressed offsets of an existing file (e.g., reopened after being closed) '''
+        self.index_file.seek(0)
+        last_line = None
+        for line in self.index_file:
+            if line.strip():
+                last_line = line
+        if last_line is None:
+            return 0
+        entry = json.loads(last_line)
+        return entry['text_offset'] + entry['text_length']
+
+    def write(self, text):
+        if len(text) == 0:
+            return
+        if self.frame_time is None:
+            self.frame_time = time.time()
+        data = text.encode('utf-8')
+        self.buffer.append(data)
+        self.buffer_bytes += len(data)
+        if self.buffer_bytes >= self.frame_bytes:
+            self._write_frame()
+
+    def flush(self):
+        ''' Writes the current frame if it has been open longer than frame_seconds '''
+        if self.frame_time is not None and time.time() - self.frame_time >= self.frame_seconds:
+            self._write_frame()
+
+    def close(self):
+        try:
+            if self.buffer_bytes > 0:
+                self._write_frame()
+        finally:
+            self.file.close()
+            self.index_file.close()
+
+    def _write_frame(self):
+        data = b''.join(self.buffer)
+        compressed = _compress(self.compression, data)
+        self.file.write(compressed)
+        self.file.flush()
+
+        # The index entry is only written after the frame, so every indexed frame is complete
+        entry = {'time': round(self.frame_time, 3), 'offset': self.offset, 'length': len(compressed),
+                 'text_offset': self.text_offset, 'text_length': len(data)}
+        self.index_file.write(json.dumps(entry) + '\n')
+        self.index_file.flush()
+
+        self.offset += len(compressed)
+        self.text_offset += len(data)
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.frame_time = None
+
+
+def read_index(path):
+    ''' Returns the index entries of a compressed session file '''
+    entries = []
+    with open(path + INDEX_FILE_EXTENSION, 'r') as index_file:
+        for line in index_file:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def read_frames(path, start_time=None):
+    '''
+    Decompresses a compressed session file frame by frame, skipping frames that ended before start_time
+    :param path: Path of the compressed file (not the index)
+    :param start_time: Optional unix time to start reading from.  Reading starts at the frame containing this time
+    :return: Generator of (frame time, text)
+    '''
+    if path.endswith(COMPRESSION_FILE_EXTENSIONS[COMPRESSION_ZSTD]):
+        compression = COMPRESSION_ZSTD
+    else:
+        compression = COMPRESSION_GZIP
+    check_compression_available(compression)
+
+    entries = read_index(path)
+    first_entry = 0
+    if start_time is not None:
+        # The frame containing start_time is the last one that started at or before it
+        for i, entry in enumerate(entries):
+            if entry['time'] <= start_time:
+                first_entry = i
+            else:
+                break
+
+    with open(path, 'rb') as compressed_file:
+        for entry in entries[first_entry:]:
+            compressed_file.seek(entry['offset'])
+            data = _decompress(compression, compressed_file.read(entry['length']))
+            yield entry['time'], data.decode('utf-8', errors='replace')
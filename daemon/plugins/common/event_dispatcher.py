@@ -0,0 +1,97 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import logging
+from operator import itemgetter
+from events.event_bus import eventbus_sshtrace_subscribe, eventbus_sshtrace_unsubscribe
+
+logger = logging.getLogger('sshlog_daemon')
+
+_rule_order = itemgetter(0)
+
+
+class _TriggerIndex:
+    '''
+    Event plugins configured for a single trigger.  Plugins with an equality filter (e.g., username: jdoe) are
+    stored in a dictionary keyed on the value they accept, and all others are checked on every event
+    '''
+    def __init__(self):
+        # Rules are tuples of (config order, event plugin, remaining filters to run)
+        self.unindexed_rules = []
+        # key_name -> [key_func, {value: [rules]}, [all rules in this index]]
+        self.indexes = {}
+
+    def add(self, order, event_plugin, filters):
+        # Index on the most selective equality filter, the remaining filters run as usual
+        best_filter = None
+        best_key = None
+        for filter in filters:
+            key = filter.dispatch_key()
+            if key is not None and (best_key is None or len(key[2]) < len(best_key[2])):
+                best_filter = filter
+                best_key = key
+
+        if best_key is None:
+            self.unindexed_rules.append((order, event_plugin, filters))
+            return
+
+        key_name, key_func, values = best_key
+        rule = (order, event_plugin, [filter for filter in filters if filter is not best_filter])
+        if key_name not in self.indexes:
+            self.indexes[key_name] = [key_func, {}, []]
+        index = self.indexes[key_name]
+        for value in values:
+            index[1].setdefault(value, []).append(rule)
+        index[2].append(rule)
+
+    def match(self, event_data):
+        ''' Returns the rules that could match the event, in the order they were configured '''
+        if len(self.indexes) == 0:
+            return self.unindexed_rules
+
+        rules = list(self.unindexed_rules)
+        for key_name, (key_func, rules_by_value, all_rules) in self.indexes.items():
+            try:
+                rules.extend(rules_by_value.get(key_func(event_data), ()))
+            except:
+                # A filter that raises is treated as passing, so every rule in this index is a candidate
+                logger.exception(f"Error reading {key_name} from event for filter dispatch")
+                rules.extend(all_rules)
+
+        rules.sort(key=_rule_order)
+        return rules
+
+
+class EventDispatcher:
+    '''
+    Delivers each event to the event plugins it could match.  Rather than every event plugin subscribing to the
+    event bus and running all of its filters, the event plugins are indexed by trigger and equality filters
+    (username, command_name, upload_file_path), so the cost of an event scales with the number of rules that
+    match it.  Filter objects are shared between event plugins with the same filter configuration
+    (see PluginManager), and each is evaluated at most once per event
+    '''
+    def __init__(self, event_plugins):
+        self._trigger_indexes = {}
+
+        for order, event_plugin in enumerate(event_plugins):
+            for trigger in event_plugin.triggers:
+                if trigger not in self._trigger_indexes:
+                    self._trigger_indexes[trigger] = _TriggerIndex()
+                self._trigger_indexes[trigger].add(order, event_plugin, event_plugin.filters_for_trigger(trigger))
+
+        self._triggers = list(self._trigger_indexes.keys())
+        eventbus_sshtrace_subscribe(self._event_callback, self._triggers)
+
+    def shutdown(self):
+        eventbus_sshtrace_unsubscribe(self._event_callback, self._triggers)
+
+    def _event_callback(self, event_data):
+        trigger_index = self._trigger_indexes.get(event_data['event_type'])
+        if trigger_index is None:
+            return
+
+        filter_results = {}
+        for order, event_plugin, filters in trigger_index.match(event_data):
+            if len(filters) == 0 or event_plugin.passes_filters(event_data, filters, filter_results):
+                event_plugin.trigger_actions(event_data)
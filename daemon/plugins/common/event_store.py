@@ -0,0 +1,160 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from comms.event_types import *
+from .fast_json import dumps_bytes
+
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        time INTEGER NOT NULL,
+        event_type TEXT NOT NULL,
+        ptm_pid INTEGER,
+        username TEXT,
+        client_ip TEXT,
+        event_json TEXT NOT NULL
+    )''',
+    # Every query is ordered by time, so each filter column is indexed together with time
+    'CREATE INDEX IF NOT EXISTS events_time ON events (time, id)',
+    'CREATE INDEX IF NOT EXISTS events_username ON events (username, time, id)',
+    'CREATE INDEX IF NOT EXISTS events_client_ip ON events (client_ip, time, id)',
+    'CREATE INDEX IF NOT EXISTS events_ptm_pid ON events (ptm_pid, time, id)',
+    'CREATE INDEX IF NOT EXISTS events_event_type ON events (event_type, time, id)',
+]
+
+MAX_QUERY_LIMIT = 1000
+
+# Databases of the running event store actions (action name -> database path), for history requests
+_active_event_stores = {}
+_active_event_stores_lock = threading.Lock()
+
+
+def register_event_store(action_name, database_path):
+    with _active_event_stores_lock:
+        _active_event_stores[action_name] = database_path
+
+
+def unregister_event_store(action_name):
+    with _active_event_stores_lock:
+        _active_event_stores.pop(action_name, None)
+
+
+def get_event_store_path(action_name=''):
+    '''
+    Returns the database path for the named event store action, or for the only configured one if no name is given.
+    :return: The path, or None if the event store cannot be determined
+    '''
+    with _active_event_stores_lock:
+        if action_name:
+            return _active_event_stores.get(action_name)
+        if len(_active_event_stores) == 1:
+            return next(iter(_active_event_stores.values()))
+    return None
+
+
+def event_time_ms(event_data):
+    ''' The time of an event in epoch milliseconds.  Finished commands and closed connections use their end time '''
+    if event_data['event_type'] in [SSHTRACE_EVENT_COMMAND_END, SSHTRACE_EVENT_CLOSE_CONNECTION] and event_data.get('end_time'):
+        return event_data['end_time']
+    if event_data.get('start_time'):
+        return event_data['start_time']
+    return round(time.time() * 1000.0)
+
+
+def _dumps(event_data):
+    # The event_json column is TEXT
+    return dumps_bytes(event_data).decode('utf-8')
+
+
+class EventStoreWriter:
+    '''
+    Inserts events into the SQLite event database.  The database uses WAL mode, so history queries can read
+    while events are being written.  Not thread safe, use from a single thread
+    '''
+    def __init__(self, database_path):
+        self.database_path = database_path
+        # Events include commands and terminal output, so a new database is readable only by the owner (root).
+        # SQLite creates the -wal and -shm files with the same permissions
+        os.close(os.open(database_path, os.O_WRONLY | os.O_CREAT, 0o600))
+        # Created on the action's init thread, used by its worker thread
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        # Durable at checkpoints, without an fsync per transaction
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def insert_events(self, rows):
+        '''
+        Inserts events in a single transaction
+        :param rows: list of (time, event_type, ptm_pid, username, client_ip, event_data)
+        '''
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO events (time, event_type, ptm_pid, username, client_ip, event_json) VALUES (?, ?, ?, ?, ?, ?)',
+                [(event_time, event_type, ptm_pid, username, client_ip, _dumps(event_data))
+                 for event_time, event_type, ptm_pid, username, client_ip, event_data in rows])
+
+    def delete_before(self, time_ms):
+        with self.connection:
+            return self.connection.execute('DELETE FROM events WHERE time < ?', (time_ms,)).rowcount
+
+    def close(self):
+        self.connection.close()
+
+
+def query_events(database_path, username='', client_ip='', ptm_pid=-1, event_type='', start_time=0, end_time=0,
+                 limit=100, cursor_time=0, cursor_id=0):
+    '''
+    Returns one page of events, newest first.  Empty (or negative) arguments are not filtered on.
+    Pages are continued with keyset pagination, so later pages cost the same as the first one
+    :param start_time: Only events at or after this time (epoch ms)
+    :param end_time: Only events before this time (epoch ms)
+    :param cursor_time: cursor_time/cursor_id returned by the previous page
+    :return: (list of event dicts, next cursor_time, next cursor_id).  The cursor is (0, 0) on the last page
+    '''
+    conditions = []
+    parameters = []
+    for column, value in [('username', username), ('client_ip', client_ip), ('event_type', event_type)]:
+        if value:
+            conditions.append(f'{column} = ?')
+            parameters.append(value)
+    if ptm_pid > 0:
+        conditions.append('ptm_pid = ?')
+        parameters.append(ptm_pid)
+    if start_time > 0:
+        conditions.append('time >= ?')
+        parameters.append(start_time)
+    if end_time > 0:
+        conditions.append('time < ?')
+        parameters.append(end_time)
+    if cursor_id > 0:
+        conditions.append('(time < ? OR (time = ? AND id < ?))')
+        parameters.extend([cursor_time, cursor_time, cursor_id])
+
+    limit = max(1, min(limit, MAX_QUERY_LIMIT))
+    sql = 'SELECT id, time, event_json FROM events'
+    if len(conditions) > 0:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    # Fetch one extra row to know whether there is another page
+    sql += ' ORDER BY time DESC, id DESC LIMIT ?'
+    parameters.append(limit + 1)
+
+    connection = sqlite3.connect(f'file:{database_path}?mode=ro', uri=True)
+    try:
+        rows = connection.execute(sql, parameters).fetchall()
+    finally:
+        connection.close()
+
+    events = [json.loads(event_json) for row_id, row_time, event_json in rows[:limit]]
+    if len(rows) > limit:
+        last_id, last_time, _ = rows[limit - 1]
+        return events, last_time, last_id
+    return events, 0, 0
@@ -0,0 +1,44 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+# JSON encoding for the hot paths that write events (captures, spill files, logs, recordings, etc.)
+
+import importlib
+
+# orjson (if available) is significantly faster
+# ujson is pretty fast and more common
+# std library json is relatively slow
+if importlib.util.find_spec("orjson") is not None:
+    import orjson as _json
+elif importlib.util.find_spec("ujson") is not None:
+    import ujson as _json
+else:
+    import json as _json
+
+loads = _json.loads
+
+
+def materialize(event_data):
+    '''
+    Returns a plain dict copy of dict subclasses such as BinaryEvent, whose lazily decoded values are not in the
+    dict storage that orjson and ujson read.  Plain dicts are returned as they are
+    '''
+    if type(event_data) is not dict and isinstance(event_data, dict):
+        return dict(event_data.items())
+    return event_data
+
+
+def dumps_bytes(data):
+    '''
+    Encodes data as UTF-8 JSON bytes, whichever library is used.  A top level dict subclass (e.g., BinaryEvent
+    from the binary event format) is materialized first.  Events nested in other values must be passed through
+    materialize() by the caller
+    :param data: event dict, or any other JSON serializable value
+    :return: bytes
+    '''
+    data = materialize(data)
+    payload = _json.dumps(data)
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    return payload
@@ -0,0 +1,198 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import asyncio
+import email.utils
+import importlib
+import logging
+import random
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# aiohttp is optional.  Without it, HTTP actions run on worker threads using requests
+AIOHTTP_AVAILABLE = importlib.util.find_spec("aiohttp") is not None
+if AIOHTTP_AVAILABLE:
+    import aiohttp
+
+logger = logging.getLogger('sshlog_daemon')
+
+# Responses that are worth retrying.  Anything else (e.g., 400 or 404) will fail the same way again
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Never wait longer than this between attempts, even if the server asks for it
+MAX_RETRY_DELAY_SEC = 60.0
+
+# Waits asked for by a rate limit response (429 with Retry-After) do not count against max_retries.  The request
+# keeps waiting while it is rate limited, up to this long in total
+MAX_RATE_LIMIT_WAIT_SEC = 300.0
+# Shortest wait for a rate limit response, so that "Retry-After: 0" does not retry in a tight loop
+MIN_RATE_LIMIT_DELAY_SEC = 1.0
+
+
+def create_session(pool_size):
+    '''
+    Creates a requests session that keeps connections alive between requests
+    :param pool_size: Maximum number of connections kept open per host.  Typically the action's max_concurrency
+    :return: requests.Session
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _retry_after_seconds(response):
+    # Retry-After may be a number of seconds or an HTTP date
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is None:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_time = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_time.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate_limit_delay(response, rate_limited_sec, max_rate_limit_wait_seconds):
+    ''' Returns how long to wait before retrying a rate limited response, or None to treat it as a failed attempt '''
+    if response.status_code != 429:
+        return None
+    delay = _retry_after_seconds(response)
+    if delay is None:
+        return None
+    delay = min(max(delay, MIN_RATE_LIMIT_DELAY_SEC), MAX_RETRY_DELAY_SEC)
+    if rate_limited_sec + delay > max_rate_limit_wait_seconds:
+        return None
+    return delay
+
+
+def _wait(delay, stop_event):
+    ''' Sleeps for delay seconds.  Returns True if stop_event was set first '''
+    if stop_event is None:
+        time.sleep(delay)
+        return False
+    return stop_event.wait(delay)
+
+
+def send_with_retries(session, method, url, timeout, max_retries=3, backoff_seconds=0.5,
+                      max_rate_limit_wait_seconds=MAX_RATE_LIMIT_WAIT_SEC, stop_event=None, **kwargs):
+    '''
+    Sends an HTTP request, retrying connection errors, timeouts and retryable status codes with exponential
+    backoff and jitter.  A Retry-After header from the server takes precedence over the backoff.
+    While the server responds 429 with Retry-After, the request keeps waiting without using up max_retries
+    :param session: requests.Session from create_session()
+    :param method: 'GET', 'POST', etc.
+    :param url: Request URL
+    :param timeout: (connect_timeout, read_timeout) in seconds
+    :param max_retries: Number of attempts after the first one
+    :param backoff_seconds: Delay before the first retry.  Doubles for each retry
+    :param max_rate_limit_wait_seconds: Total time to wait for rate limits before they count as failed attempts
+    :param stop_event: Optional threading.Event.  Once set, no more attempts are made and the wait between
+                       attempts ends early (e.g., at shutdown)
+    :param kwargs: Passed to session.request (e.g., data, json, headers)
+    :return: The final requests.Response.  Raises the last exception if no response was received
+    '''
+    attempt = 0
+    rate_limited_sec = 0.0
+    while True:
+        response = None
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            rate_limit_delay = _rate_limit_delay(response, rate_limited_sec, max_rate_limit_wait_seconds)
+            if rate_limit_delay is not None:
+                rate_limited_sec += rate_limit_delay
+                logger.debug(f"{method} {url} is rate limited, retrying in {rate_limit_delay:.2f} seconds")
+                if _wait(rate_limit_delay, stop_event):
+                    return response
+                continue
+            if attempt >= max_retries:
+                return response
+        except (requests.ConnectionError, requests.Timeout) as error:
+            if attempt >= max_retries or (stop_event is not None and stop_event.is_set()):
+                raise
+            last_error = error
+
+        delay = None
+        if response is not None:
+            delay = _retry_after_seconds(response)
+        if delay is None:
+            # Full jitter, so that several workers retrying together spread out
+            delay = random.uniform(0, backoff_seconds * (2 ** attempt))
+        delay = min(delay, MAX_RETRY_DELAY_SEC)
+
+        attempt += 1
+        logger.debug(f"Retrying {method} {url} in {delay:.2f} seconds (attempt {attempt} of {max_retries})")
+        if _wait(delay, stop_event):
+            if response is None:
+                raise last_error
+            return response
+
+
+class AsyncResponse:
+    ''' The parts of an aiohttp response the actions use, with the same names as requests.Response '''
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+def create_async_session(pool_size):
+    '''
+    Creates an aiohttp session that keeps connections alive between requests.  Must be called on the event loop
+    :param pool_size: Maximum number of connections kept open per host.  Typically the action's max_concurrency
+    :return: aiohttp.ClientSession
+    '''
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=pool_size))
+
+
+async def send_with_retries_async(session, method, url, timeout, max_retries=3, backoff_seconds=0.5,
+                                  max_rate_limit_wait_seconds=MAX_RATE_LIMIT_WAIT_SEC, **kwargs):
+    '''
+    The asyncio version of send_with_retries
+    :param session: aiohttp.ClientSession from create_async_session()
+    :param timeout: (connect_timeout, read_timeout) in seconds
+    :param kwargs: Passed to session.request (e.g., data, json, headers)
+    :return: AsyncResponse for the final response.  Raises the last exception if no response was received
+    '''
+    connect_timeout, read_timeout = timeout
+    client_timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    attempt = 0
+    rate_limited_sec = 0.0
+    while True:
+        response = None
+        try:
+            async with session.request(method, url, timeout=client_timeout, **kwargs) as http_response:
+                response = AsyncResponse(http_response.status, http_response.headers, await http_response.read())
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            rate_limit_delay = _rate_limit_delay(response, rate_limited_sec, max_rate_limit_wait_seconds)
+            if rate_limit_delay is not None:
+                rate_limited_sec += rate_limit_delay
+                logger.debug(f"{method} {url} is rate limited, retrying in {rate_limit_delay:.2f} seconds")
+                await asyncio.sleep(rate_limit_delay)
+                continue
+            if attempt >= max_retries:
+                return response
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt >= max_retries:
+                raise
+
+        delay = None
+        if response is not None:
+            delay = _retry_after_seconds(response)
+        if delay is None:
+            delay = random.uniform(0, backoff_seconds * (2 ** attempt))
+        delay = min(delay, MAX_RETRY_DELAY_SEC)
+
+        attempt += 1
+        logger.debug(f"Retrying {method} {url} in {delay:.2f} seconds (attempt {attempt} of {max_retries})")
+        await asyncio.sleep(delay)
@@ -4,15 +4,11 @@
 
 import logging
 from trackers.tracker import Tracker
-from events.event_bus import eventbus_sshtrace_subscribe, eventbus_sshtrace_unsubscribe
 from comms.event_types import SSHTRACE_ALL_EVENTS
 import operator
 import re
-import concurrent.futures
-import os
-
-# Assume most action handling is IO-bound.  Default to use 16 threads per CPU core
-action_threadpool_executor = concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()*16)
+from .action_executor import OrderedActionExecutor, OVERFLOW_DROP_OLDEST, DEFAULT_SPILL_DIRECTORY
+from .async_executor import AsyncActionExecutor
 
 class EventPlugin:
     def __init__(self, name, triggers: list, filters: list, actions: list, **kwargs):
@@ -34,40 +30,52 @@ class EventPlugin:
                 raise RuntimeError(f"Filter {filter} for event {self.name} is invalid.  The filter can only execute on "
                                    f"triggers {filter.triggers()}, and the event is only configured for triggers {self.triggers}")
 
-        eventbus_sshtrace_subscribe(self._event_callback, self.triggers)
-
+        # Events are delivered by the EventDispatcher (see event_dispatcher.py) rather than a blinker
+        # subscription per event plugin, so that filters shared between plugins only run once per event
 
     def shutdown(self):
         self.logger.info(f"Shutting down event plugin {self.name}")
-        eventbus_sshtrace_unsubscribe(self._event_callback, self.triggers)
         for action in self.actions:
             action.shutdown()
 
-    def _event_callback(self, event_data):
-        for filter in self.filters:
+    def filters_for_trigger(self, trigger):
+        ''' Returns the configured filters that are able to run on the given trigger '''
+        return [filter for filter in self.filters if trigger in filter.triggers()]
 
-            try:
-                # Only pass to filters that are configured to handle this event type
-                if event_data['event_type'] not in filter.triggers():
-                    continue
+    def passes_filters(self, event_data, filters, filter_results):
+        '''
+        Runs the given filters against the event
+        :param event_data: The event
+        :param filters: Filters to run, from filters_for_trigger()
+        :param filter_results: Results for this event keyed by filter object.  Filter objects are shared
+                               between event plugins with the same configuration, so each one only runs once per event
+        :return: True if the event passes all filters
+        '''
+        for filter in filters:
+            passes_filter = filter_results.get(filter)
+            if passes_filter is None:
+                try:
+                    passes_filter = filter.filter(event_data)
+                except:
+                    self.logger.exception(f"Error handling filter for plugin {self.name} on filter {filter}")
+                    passes_filter = True
 
-                passes_filter = filter.filter(event_data)
                 if not isinstance(passes_filter, bool):
                     self.logger.warning(f"Invalid response ({passes_filter}) from plugin {self.name} detect function.  Response must be boolean")
-                    return
+                    passes_filter = False
+                filter_results[filter] = passes_filter
 
-                if passes_filter == False:
-                    self.logger.debug(f"Skipping event for {self.name} on failure due to filter {filter}")
-                    return
+            if passes_filter == False:
+                self.logger.debug(f"Skipping event for {self.name} on failure due to filter {filter}")
+                return False
 
-            except:
-                self.logger.exception(f"Error handling filter for plugin {self.name} on filter {filter}")
+        return True
 
+    def trigger_actions(self, event_data):
         # Event has passed all filters, trigger actions
         for action in self.actions:
             try:
-                #action._execute(event_data)
-                action_threadpool_executor.submit(action._execute, event_data)
+                action.submit(event_data)
             except:
                 self.logger.exception(f"Error handling event for event plugin {self.name} action {action.name}")
 
@@ -89,40 +97,85 @@ class FilterPlugin:
             #'nand': lambda x, y: not (x and y)
         }
 
+        self.init_filter()
+
     def __str__(self):
         return self.__class__.__name__
 
-    def _compare_numbers(self, comparison_str: str, value):
+    def init_filter(self):
         '''
-        Allow customers to provide a comparison operator (e.g., '>= 5', '!= 0', etc) for string comparison
-        :param comparison_str: The comparison value (e.g., '>= 5').  If it's just a number, assume it's an equality operation
-        :param value: The actual value to compare against
-        :return: True if it matches, False otherwise
+        Init filter to be overridden by child plugin.  Parse and precompile self.filter_arg here so that
+        the per-event filter() call does as little work as possible.  Raise ValueError if filter_arg is invalid
+        and the configuration will be rejected when it is loaded
+        '''
+        pass
+
+    def _compile_number_comparison(self, comparison):
         '''
-        components = comparison_str.split()
+        Parses a comparison operator (e.g., '>= 5', '!= 0', etc) once so it can be evaluated for each event
+        :param comparison: The comparison value (e.g., '>= 5').  If it's just a number, assume it's an equality operation
+        :return: function(value) that returns True if the value matches the comparison
+        '''
+        if isinstance(comparison, (int, float)) and not isinstance(comparison, bool):
+            comparison = str(comparison)
+        if not isinstance(comparison, str):
+            raise ValueError(f"Invalid comparison operation.  Cannot parse {comparison}")
+
+        components = comparison.split()
         if len(components) == 1:
             # This is an equality test
             components = ['=', components[0]]
-        elif len(components) > 2:
-            # This is an invalid comparison
-            self.logger.warning(f"Invalid comparison operation.  Cannot parse {comparison_str}")
-            return False
+        elif len(components) != 2:
+            raise ValueError(f"Invalid comparison operation.  Cannot parse {comparison}")
 
         inequality_operator = components[0] # e.g., <, >=, etc.
         if inequality_operator not in self._number_eval_dict:
-            self.logger.warning(f"Invalid comparison operation {inequality_operator} valid operations are {self._number_eval_dict.keys()}")
-            return False
+            raise ValueError(f"Invalid comparison operation {inequality_operator} valid operations are {list(self._number_eval_dict.keys())}")
 
-        if '.' in components[1]:
-            user_eval_number = float(components[1])
-        else:
-            user_eval_number = int(components[1])
+        try:
+            if '.' in components[1]:
+                user_eval_number = float(components[1])
+            else:
+                user_eval_number = int(components[1])
+        except ValueError:
+            raise ValueError(f"Invalid comparison operation.  {components[1]} is not a number")
+
+        eval_func = self._number_eval_dict[inequality_operator]
+        return lambda value: eval_func(user_eval_number, value)
+
+    def _compile_regex(self, string_match):
+        '''
+        Compiles a regex once so it can be searched for each event
+        :param string_match: regex to search
+        :return: function(value) that returns True if the regex is found in the value
+        '''
+        if not isinstance(string_match, str):
+            raise ValueError(f"Invalid regex {string_match}.  Expected a string")
+        try:
+            search = re.compile(string_match).search
+        except re.error as e:
+            raise ValueError(f"Invalid regex {string_match}: {e}")
 
-        return self._number_eval_dict[inequality_operator](user_eval_number, value)
+        return lambda value: search(value) is not None
+
+    def _compare_numbers(self, comparison_str: str, value):
+        '''
+        Allow customers to provide a comparison operator (e.g., '>= 5', '!= 0', etc) for string comparison.
+        Prefer _compile_number_comparison() in init_filter, which only parses the comparison once
+        :param comparison_str: The comparison value (e.g., '>= 5').  If it's just a number, assume it's an equality operation
+        :param value: The actual value to compare against
+        :return: True if it matches, False otherwise
+        '''
+        try:
+            return self._compile_number_comparison(comparison_str)(value)
+        except ValueError as e:
+            self.logger.warning(str(e))
+            return False
 
     def _compare_regex_strings(self, string_match: str, value):
         '''
-        Performs a regex string match against the value
+        Performs a regex string match against the value.
+        Prefer _compile_regex() in init_filter, which only compiles the regex once
         :param string_match: regex to search
         :param value: to search against using regex
         :return: True if it matches, false otherwise
@@ -138,6 +191,16 @@ class FilterPlugin:
     def triggers(self):
         return SSHTRACE_ALL_EVENTS
 
+    def dispatch_key(self):
+        '''
+        Equality filters can be indexed so that an event is only checked against the event plugins that could match it.
+        Override in child plugins that only pass when a single value from the event is in a fixed set of values
+        :return: Tuple of (key_name, key_func, values) or None if the filter cannot be indexed.
+                 key_func(event_data) returns the value from the event.  Filters returning the same key_name must use
+                 equivalent key functions.  The filter passes if the returned value is in values
+        '''
+        return None
+
     def filter(self, event_data):
         ''' Given a configured argument, check the event data to see if the event should be allowed to proceed
         returns True if the filter is passed (i.e., it matches the configured argument) and
@@ -146,11 +209,56 @@ class FilterPlugin:
         raise RuntimeError("The filter function must be implemented in the subclass for the filter plugin to function")
 
 
+# Settings that every action accepts in the YAML config, in addition to the init_action parameters.
+# They control how events are queued for the action, see OrderedActionExecutor
+ACTION_EXECUTOR_SETTINGS = ['max_concurrency', 'queue_size', 'overflow_policy', 'spill_directory',
+                            'batch_max_events', 'batch_max_ms']
+
 class ActionPlugin:
-    def __init__(self, name, session_tracker: Tracker, **kwargs):
+    # Defaults used when max_concurrency/batch_max_events/batch_max_ms are not set in the config.
+    # Batching is only used by actions that override execute_batch
+    default_max_concurrency = 4
+    default_batch_max_events = 1
+    default_batch_max_ms = 0
+    # Actions that implement execute_async run on the shared asyncio loop instead of worker threads.  Set to False
+    # when the async implementation cannot be used (e.g., an optional library is not installed)
+    async_available = True
+
+    def __init__(self, name, session_tracker: Tracker, max_concurrency=None, queue_size=1000,
+                 overflow_policy=OVERFLOW_DROP_OLDEST, spill_directory=DEFAULT_SPILL_DIRECTORY,
+                 batch_max_events=None, batch_max_ms=None, **kwargs):
         self.name = name
         self.session_tracker = session_tracker
         self.logger = logging.getLogger('sshlog_daemon')
+
+        if max_concurrency is None:
+            max_concurrency = self.default_max_concurrency
+        if batch_max_events is None:
+            batch_max_events = self.default_batch_max_events
+        if batch_max_ms is None:
+            batch_max_ms = self.default_batch_max_ms
+
+        self.is_async = self.async_available and type(self).execute_async is not ActionPlugin.execute_async
+        if self.is_async:
+            batch_handler = None
+            if type(self).execute_batch_async is not ActionPlugin.execute_batch_async:
+                batch_handler = self._execute_batch_async
+
+            # Async actions share one event loop thread.  max_concurrency limits how many events run at once
+            self.executor = AsyncActionExecutor(self._execute_async, name, max_concurrency=max_concurrency,
+                                                queue_size=queue_size, overflow_policy=overflow_policy,
+                                                batch_handler=batch_handler, batch_max_events=batch_max_events,
+                                                batch_max_ms=batch_max_ms, shutdown_handler=self._shutdown_async)
+        else:
+            batch_handler = None
+            if type(self).execute_batch is not ActionPlugin.execute_batch:
+                batch_handler = self._execute_batch
+
+            # Each action has its own bounded queue and workers, so a slow action cannot hold up the others
+            self.executor = OrderedActionExecutor(self._execute, name, max_concurrency=max_concurrency,
+                                                  queue_size=queue_size, overflow_policy=overflow_policy,
+                                                  spill_directory=spill_directory, batch_handler=batch_handler,
+                                                  batch_max_events=batch_max_events, batch_max_ms=batch_max_ms)
         self.init_action(**kwargs)
 
     def _insert_event_data(self, event_data, template):
@@ -164,8 +272,18 @@ class ActionPlugin:
 
     def shutdown(self):
         self.logger.info(f"Shutting down action plugin {self.name}")
+        # Finish the queued events before the action releases its resources
+        self.executor.shutdown()
         self.shutdown_action()
 
+    def submit(self, event_data):
+        ''' Queues the event to be executed by the action '''
+        self.executor.submit(self.ordering_key(event_data), event_data)
+
+    def stats(self):
+        ''' Returns the queue depth, drop and wait time counters for this action '''
+        return self.executor.stats()
+
     def init_action(self):
         ''' Init action to be overridden by child plugin '''
         pass
@@ -174,6 +292,14 @@ class ActionPlugin:
         ''' Shutdown action to be overridden by child plugin '''
         pass
 
+    def ordering_key(self, event_data):
+        '''
+        Actions for events with the same key are executed in the order the events arrived.  By default events
+        are ordered per session.  Override in child plugin to use a different key, or return None if ordering
+        does not matter for the action
+        '''
+        return event_data.get('ptm_pid')
+
     def _execute(self, event_data):
         # Wrapper to log exceptions
         try:
@@ -182,4 +308,61 @@ class ActionPlugin:
             self.logger.exception(f"Error triggering action plugin {self.name}")
     def execute(self, event_data):
         ''' Execute action to be overridden by child plugin '''
-        raise RuntimeError("The detect function must be implemented for the event to function")
\ No newline at end of file
+        raise RuntimeError("The detect function must be implemented for the event to function")
+
+    def _execute_batch(self, events):
+        # Wrapper to log exceptions
+        try:
+            self.execute_batch(events)
+        except:
+            self.logger.exception(f"Error triggering action plugin {self.name} for a batch of {len(events)} events")
+
+    def execute_batch(self, events):
+        '''
+        Optional batch execute to be overridden by child plugin.  When overridden, queued events are passed
+        in groups of up to batch_max_events, waiting at most batch_max_ms for a group to fill.  Events are in the
+        order they arrived for each session.  Any events still queued at shutdown are passed before shutdown_action
+        '''
+        for event_data in events:
+            self.execute(event_data)
+
+    async def _execute_async(self, event_data):
+        # Wrapper to log exceptions
+        try:
+            await self.execute_async(event_data)
+        except:
+            self.logger.exception(f"Error triggering action plugin {self.name}")
+
+    async def execute_async(self, event_data):
+        '''
+        Optional coroutine to be overridden by child plugin.  When overridden, the action runs on the shared asyncio
+        loop thread instead of its own worker threads, so it must never block (e.g., use asyncio sockets rather than
+        requests).  Up to max_concurrency events of the action are handled at the same time
+        '''
+        raise RuntimeError("The execute_async function must be implemented for the action to run asynchronously")
+
+    async def _execute_batch_async(self, events):
+        # Wrapper to log exceptions
+        try:
+            await self.execute_batch_async(events)
+        except:
+            self.logger.exception(f"Error triggering action plugin {self.name} for a batch of {len(events)} events")
+
+    async def execute_batch_async(self, events):
+        ''' Optional batch version of execute_async to be overridden by child plugin.  See execute_batch '''
+        for event_data in events:
+            await self.execute_async(event_data)
+
+    async def _shutdown_async(self):
+        # Wrapper to log exceptions
+        try:
+            await self.shutdown_async()
+        except:
+            self.logger.exception(f"Error shutting down action plugin {self.name}")
+
+    async def shutdown_async(self):
+        '''
+        Optional coroutine to be overridden by child plugin, to release resources that belong to the asyncio loop
+        (e.g., HTTP sessions).  Runs on the loop after the queued events have been handled, before shutdown_action
+        '''
+        pass
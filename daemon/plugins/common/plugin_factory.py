@@ -6,7 +6,7 @@ import importlib
 import inspect
 import os
 import logging
-from .plugin import EventPlugin, FilterPlugin, ActionPlugin
+from .plugin import EventPlugin, FilterPlugin, ActionPlugin, ACTION_EXECUTOR_SETTINGS
 
 logger = logging.getLogger('sshlog_daemon')
 
@@ -57,6 +57,13 @@ def search_plugins(directories):
                                     'required': not has_default
                                 })
 
+                            # Queue settings accepted by every action
+                            for setting in ACTION_EXECUTOR_SETTINGS:
+                                param_list.append({
+                                    'name': setting,
+                                    'required': False
+                                })
+
                         else:
                             continue
 
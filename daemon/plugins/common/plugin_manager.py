@@ -7,6 +7,8 @@ import os
 import logging
 from .plugin_factory import search_plugins
 from .plugin import EventPlugin
+from .action_executor import OVERFLOW_POLICIES
+from .event_dispatcher import EventDispatcher
 from comms.event_types import SSHTRACE_ALL_EVENTS
 
 logger = logging.getLogger('sshlog_daemon')
@@ -27,6 +29,10 @@ class PluginManager:
 
         self.validation_errors = []
         self.events = []
+        # Filter objects keyed by (filter class, argument) so identical filters are shared between events
+        self._filter_objects = {}
+        self._event_objects = []
+        self._dispatcher = None
         self.actions = []
         self.session_tracker = session_tracker
 
@@ -76,11 +82,30 @@ class PluginManager:
                     self.validation_errors.append(f"Missing filter plugin {filter_class_name} referenced by action {event['event']}")
                     continue
 
+                class_obj = self._plugins[filter_class_name]['class_obj']
+
+                # Filters parse and compile their argument when created, so invalid values (e.g., a bad regex)
+                # are reported here rather than failing on every event
+                try:
+                    filter_key = (filter_class_name, repr(filter_arg))
+                    filter_object = self._filter_objects.get(filter_key)
+                    if filter_object is None:
+                        filter_object = class_obj(filter_arg, self.session_tracker)
+                        self._filter_objects[filter_key] = filter_object
+                except ValueError as e:
+                    self.validation_errors.append(f"Invalid value for filter {filter_name} in event {event['event']}: {e}")
+                    continue
+                except Exception as e:
+                    self.validation_errors.append(f"Unable to initialize filter {filter_name} in event {event['event']}: {e}")
+                    logger.exception(f"Unexpected error initializing filter {filter_name}")
+                    continue
+
                 event['filters'][filter_name] = {
                     'filter_name': filter_name,
                     'filter_arg': filter_arg,
                     'filter_class_name': filter_class_name,
-                    'class_obj': self._plugins[filter_class_name]['class_obj']
+                    'class_obj': class_obj,
+                    'filter_obj': filter_object
                 }
 
 
@@ -136,6 +161,21 @@ class PluginManager:
                     self.validation_errors.append(f"Missing action definition for {action_name} from event {event['event']}")
 
 
+        # Check the queue settings that every action accepts
+        for action in self.actions:
+            action_name = action['action']
+            if 'overflow_policy' in action and action['overflow_policy'] not in OVERFLOW_POLICIES:
+                self.validation_errors.append(f"Invalid overflow_policy {action['overflow_policy']} for action {action_name}.  "
+                                              f"Valid policies are {OVERFLOW_POLICIES}")
+            # YAML true/false load as bool, which is a subclass of int
+            for setting in ['max_concurrency', 'queue_size', 'batch_max_events']:
+                if setting in action and (not isinstance(action[setting], int) or isinstance(action[setting], bool)
+                                          or action[setting] < 1):
+                    self.validation_errors.append(f"Invalid {setting} {action[setting]} for action {action_name}.  Must be a number greater than 0")
+            if 'batch_max_ms' in action and (not isinstance(action['batch_max_ms'], (int, float))
+                                             or isinstance(action['batch_max_ms'], bool) or action['batch_max_ms'] < 0):
+                self.validation_errors.append(f"Invalid batch_max_ms {action['batch_max_ms']} for action {action_name}.  Must be a number 0 or greater")
+
         # TODO: Check the arguments for each event/action to make sure that they match the plugin functions
         #       Check that all non-default values are specified.  Warn if any unexpected values are included
 
@@ -165,9 +205,7 @@ class PluginManager:
             filters_obj_list = []
             for filter_name, filter in event.get('filters', {}).items():
                 logger.info(f"Initializing filter plugin {filter['filter_name']}")
-
-                filter_object = filter['class_obj'](filter['filter_arg'], self.session_tracker)
-                filters_obj_list.append(filter_object)
+                filters_obj_list.append(filter['filter_obj'])
 
             # First initialize the actions, since they need to be passed to the new event plugin
             action_obj_list = []
@@ -193,10 +231,41 @@ class PluginManager:
             event_object = EventPlugin(event['event'], event['triggers'], filters_obj_list, action_obj_list)
             self._event_objects.append(event_object)
 
+        self._dispatcher = EventDispatcher(self._event_objects)
+        logger.info(f"Initialized {len(self._event_objects)} event plugins using {len(self._filter_objects)} unique filters")
+
         # for event_plugin_name, event_plugin in self.events.items():
         #     object = event_plugin['class_obj']()
         #     object.detect('eventdata', **{'user': 'mhill2', 'require_tty': False})
 
+    def action_plugins(self):
+        '''
+        Returns the initialized action plugin objects.  Each event has its own instance of the actions it uses
+        :return: list of ActionPlugin
+        '''
+        return [action for ev_object in self._event_objects for action in ev_object.actions]
+
+    def action_stats(self):
+        '''
+        Returns the queue statistics (depth, drops, wait time, etc) for each configured action
+        :return: list of dictionaries, one per action within each event
+        '''
+        stats = []
+        for ev_object in self._event_objects:
+            for action in ev_object.actions:
+                action_stats = {'event': ev_object.name, 'action': action.name}
+                action_stats.update(action.stats())
+                stats.append(action_stats)
+        return stats
+
+    def log_action_stats(self):
+        ''' Logs the queue statistics for any action that has a backlog or has dropped events '''
+        for action_stats in self.action_stats():
+            if action_stats['queue_depth'] > 0 or action_stats['dropped'] > 0 or action_stats['spilled'] > 0:
+                logger.info(f"Action queue stats: {action_stats}")
+
     def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.shutdown()
         for ev_object in self._event_objects:
             ev_object.shutdown()
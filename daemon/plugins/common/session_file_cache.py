@@ -0,0 +1,76 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import collections
+import logging
+import threading
+
+logger = logging.getLogger('sshlog_daemon')
+
+
+class SessionFileCache:
+    '''
+    A bounded LRU of open files keyed by session (ptm_pid).  Files stay open between events so that writing
+    a terminal update does not cost an open/close.  When more than max_open_files sessions are active, the least
+    recently used file is closed and reopened by the opener the next time it is needed.
+    Files are not thread safe, so every use of a file must be inside "with cache.lock:"
+    '''
+    def __init__(self, opener, max_open_files=256, on_evict=None):
+        '''
+        :param opener: function(key) that opens and returns the file for the key (in append mode)
+        :param max_open_files: Maximum number of files to keep open
+        :param on_evict: Optional function(key, file) called with the lock held before a least recently used file
+                         is closed, so the owner can release (or write out) its own state for the key
+        '''
+        if max_open_files < 1:
+            raise ValueError("max_open_files must be at least 1")
+        self.opener = opener
+        self.max_open_files = max_open_files
+        self.on_evict = on_evict
+        self.lock = threading.RLock()
+        self._files = collections.OrderedDict()
+
+    def get(self, key):
+        ''' Returns the open file for the key, opening it if needed.  Must be called while holding the lock '''
+        file = self._files.get(key)
+        if file is not None:
+            self._files.move_to_end(key)
+            return file
+
+        while len(self._files) >= self.max_open_files:
+            lru_key, lru_file = self._files.popitem(last=False)
+            if self.on_evict is not None:
+                self.on_evict(lru_key, lru_file)
+            self._close_file(lru_key, lru_file)
+
+        file = self.opener(key)
+        self._files[key] = file
+        return file
+
+    def _close_file(self, key, file):
+        try:
+            file.close()
+        except OSError:
+            logger.exception(f"Error closing session file for {key}")
+
+    def close(self, key):
+        ''' Flushes and closes the file for the key, if it is open '''
+        with self.lock:
+            file = self._files.pop(key, None)
+            if file is not None:
+                self._close_file(key, file)
+
+    def flush_all(self):
+        with self.lock:
+            for key, file in self._files.items():
+                try:
+                    file.flush()
+                except OSError:
+                    logger.exception(f"Error flushing session file for {key}")
+
+    def close_all(self):
+        with self.lock:
+            while len(self._files) > 0:
+                key, file = self._files.popitem(last=False)
+                self._close_file(key, file)
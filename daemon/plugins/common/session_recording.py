@@ -0,0 +1,183 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import json
+import mmap
+import os
+import struct
+import time
+from .fast_json import dumps_bytes
+
+# Session recordings use the asciicast v2 format (https://docs.asciinema.org/manual/asciicast/v2/):
+# a JSON header line, followed by one [seconds since start, "o", terminal data] JSON line per terminal_update.
+# The sidecar index (<recording>.idx) is a list of records of:
+#   float64 seconds since start, uint64 byte offset of the first line at or after that time
+RECORDING_FILE_EXTENSION = '.cast'
+INDEX_FILE_EXTENSION = '.idx'
+_INDEX_RECORD = struct.Struct('<dQ')
+
+# Terminal size is not captured, so recordings use a common default
+DEFAULT_WIDTH = 80
+DEFAULT_HEIGHT = 24
+
+
+class SessionRecordingWriter:
+    '''
+    Appends terminal output of one session to a recording.  An existing recording is continued (e.g., if it was
+    closed to limit the number of open files) using the start time from its header.
+    An index record is added every index_interval_seconds so players can start at any time offset
+    without reading the recording from the beginning
+    '''
+    def __init__(self, path, header_info=None, index_interval_seconds=1.0, buffer_size=65536):
+        '''
+        :param path: Path of the recording file
+        :param header_info: dict of session details stored in the header of a new recording
+        :param index_interval_seconds: Minimum recording time between index records
+        '''
+        self.path = path
+        self.header_info = header_info or {}
+        self.index_interval_seconds = index_interval_seconds
+
+        self.file = open(path, 'ab', buffering=buffer_size)
+        self.index_file = open(path + INDEX_FILE_EXTENSION, 'ab')
+        self.offset = self.file.tell()
+        # The first line written (including after reopening) is always indexed
+        self.last_index_time = None
+
+        if self.offset == 0:
+            self.start_time = time.time()
+            header = {
+                'version': 2,
+                'width': DEFAULT_WIDTH,
+                'height': DEFAULT_HEIGHT,
+                'timestamp': int(self.start_time),
+                'sshlog': dict(self.header_info, start_time=self.start_time),
+            }
+            self._write_line(header)
+        else:
+            self.start_time = read_header(path)['sshlog']['start_time']
+
+    def _write_line(self, data):
+        line = dumps_bytes(data) + b'\n'
+        self.file.write(line)
+        self.offset += len(line)
+
+    def write_output(self, terminal_data, event_time=None):
+        '''
+        Records terminal output
+        :param terminal_data: Output text
+        :param event_time: Unix time of the output (defaults to now)
+        '''
+        if event_time is None:
+            event_time = time.time()
+        relative_time = round(max(event_time - self.start_time, 0.0), 6)
+
+        if self.last_index_time is None or relative_time - self.last_index_time >= self.index_interval_seconds:
+            self.index_file.write(_INDEX_RECORD.pack(relative_time, self.offset))
+            self.last_index_time = relative_time
+
+        self._write_line([relative_time, 'o', terminal_data])
+
+    def flush(self):
+        # The recording is flushed first, so index records never point past the end of the written data
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.file.close()
+            self.index_file.close()
+
+
+def read_header(path):
+    with open(path, 'rb') as recording_file:
+        return json.loads(recording_file.readline())
+
+
+class SessionRecordingReader:
+    '''
+    Reads a session recording through mmap, so starting playback at any point only touches the pages needed.
+    The index is binary searched to find where to start.  Recordings without an index are scanned from the start
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._index_file = None
+        self._index = None
+        self._mmap = None
+        if os.fstat(self._file.fileno()).st_size == 0:
+            # mmap cannot map an empty file.  The header is written when the recording is flushed
+            self.close()
+            raise ValueError(f"{path} is empty.  The session may not have been flushed to disk yet")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header_end = self._mmap.find(b'\n')
+        if header_end < 0:
+            self.close()
+            raise ValueError(f"{path} is not a session recording")
+        self.header = json.loads(self._mmap[:header_end])
+        if self.header.get('version') != 2:
+            self.close()
+            raise ValueError(f"{path} is not an asciicast v2 recording")
+        self.data_start = header_end + 1
+
+        index_path = path + INDEX_FILE_EXTENSION
+        if os.path.exists(index_path) and os.path.getsize(index_path) >= _INDEX_RECORD.size:
+            self._index_file = open(index_path, 'rb')
+            self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for resource in [self._index, self._index_file, self._mmap, self._file]:
+            if resource is not None:
+                resource.close()
+        self._index = self._index_file = self._mmap = self._file = None
+
+    def offset_for_time(self, start_seconds):
+        ''' Returns the byte offset of the last indexed line at or before start_seconds '''
+        if self._index is None:
+            return self.data_start
+
+        # Binary search for the last index record with time <= start_seconds
+        low, high = 0, len(self._index) // _INDEX_RECORD.size
+        while low < high:
+            middle = (low + high) // 2
+            record_time, _ = _INDEX_RECORD.unpack_from(self._index, middle * _INDEX_RECORD.size)
+            if record_time <= start_seconds:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return self.data_start
+
+        _, offset = _INDEX_RECORD.unpack_from(self._index, (low - 1) * _INDEX_RECORD.size)
+        # An index record can be written before the line it points to (e.g., the daemon is still recording)
+        return min(max(offset, self.data_start), len(self._mmap))
+
+    def events(self, start_seconds=0.0):
+        '''
+        Reads the recording starting at start_seconds
+        :return: Generator of (seconds since start, event code, data)
+        '''
+        position = self.offset_for_time(start_seconds)
+        size = len(self._mmap)
+        while position < size:
+            line_end = self._mmap.find(b'\n', position)
+            if line_end < 0:
+                # The last line is incomplete while the session is still being recorded
+                break
+            line = self._mmap[position:line_end]
+            position = line_end + 1
+
+            event_time, event_code, data = json.loads(line)
+            if event_time < start_seconds:
+                continue
+            yield event_time, event_code, data
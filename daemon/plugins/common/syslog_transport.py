@@ -0,0 +1,173 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import collections
+import logging
+import random
+import select
+import socket
+import threading
+import time
+
+logger = logging.getLogger('sshlog_daemon')
+
+# Maximum number of messages written with one sendall
+MAX_MESSAGES_PER_SEND = 500
+# Only warn about dropped messages this often
+DROP_WARNING_INTERVAL_SEC = 60
+
+
+def frame_octet_counting(messages):
+    ''' Frames syslog messages (bytes) for TCP using RFC 6587 octet counting: "<length> <message>" '''
+    return b''.join(str(len(message)).encode('ascii') + b' ' + message for message in messages)
+
+
+class TcpSyslogTransport:
+    '''
+    Sends syslog messages over one persistent TCP connection from a dedicated sender thread.
+    Messages are buffered in a bounded queue and written in batches with a single sendall.  If the server is
+    unreachable (e.g., the collector restarts), the sender reconnects with exponential backoff while messages
+    keep buffering.  When the buffer is full, the oldest messages are dropped.
+    A batch that fails part way through is sent again after reconnecting, so messages can be duplicated but
+    are not lost while they fit in the buffer
+    '''
+    def __init__(self, server_address, port, max_buffered_messages=10000, connect_timeout=5, send_timeout=10,
+                 backoff_initial_seconds=0.5, backoff_max_seconds=30, name='syslog'):
+        if max_buffered_messages < 1:
+            raise ValueError("max_buffered_messages must be at least 1")
+        self.server_address = server_address
+        self.port = port
+        self.max_buffered_messages = max_buffered_messages
+        self.connect_timeout = connect_timeout
+        self.send_timeout = send_timeout
+        self.backoff_initial_seconds = backoff_initial_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.name = name
+
+        self._buffer = collections.deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._socket = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.connects = 0
+        self._last_drop_warning = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"syslog-tcp-{name}", daemon=True)
+        self._thread.start()
+
+    def send(self, messages):
+        ''' Queues messages (bytes, without framing) to be sent.  Never blocks on the network '''
+        dropped = 0
+        with self._condition:
+            self._buffer.extend(messages)
+            while len(self._buffer) > self.max_buffered_messages:
+                self._buffer.popleft()
+                dropped += 1
+            self.dropped += dropped
+            self._condition.notify()
+
+        if dropped > 0 and time.monotonic() - self._last_drop_warning > DROP_WARNING_INTERVAL_SEC:
+            self._last_drop_warning = time.monotonic()
+            logger.warning(f"Syslog buffer for {self.name} is full, {self.dropped} messages dropped so far "
+                           f"(buffer size {self.max_buffered_messages})")
+
+    def stats(self):
+        with self._condition:
+            return {
+                'buffered': len(self._buffer),
+                'sent': self.sent,
+                'dropped': self.dropped,
+                'connects': self.connects,
+                'connected': self._socket is not None,
+            }
+
+    def close(self, timeout=5.0):
+        ''' Stops the sender thread, waiting up to timeout seconds for buffered messages to be sent '''
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Syslog transport {self.name} closed with {len(self._buffer)} unsent messages")
+        self._disconnect()
+
+    def _connect(self):
+        sock = socket.create_connection((self.server_address, self.port), timeout=self.connect_timeout)
+        sock.settimeout(self.send_timeout)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._socket = sock
+        logger.info(f"Syslog transport {self.name} connected to {self.server_address}:{self.port}")
+
+    def _disconnect(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
+    def _peer_closed(self):
+        '''
+        A server that closed the connection (e.g., it restarted) is only noticed on the second write after the
+        close, so the first batch would be lost.  Checking for EOF before writing avoids that
+        '''
+        readable, _, _ = select.select([self._socket], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return self._socket.recv(4096, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def _next_batch(self):
+        ''' Waits for buffered messages.  Returns None when stopping with nothing left to send '''
+        with self._condition:
+            while len(self._buffer) == 0:
+                if self._stopping:
+                    return None
+                self._condition.wait()
+            count = min(MAX_MESSAGES_PER_SEND, len(self._buffer))
+            popleft = self._buffer.popleft
+            return [popleft() for _ in range(count)]
+
+    def _requeue(self, batch):
+        ''' Puts an unsent batch back at the front of the buffer, unless newer messages have filled it '''
+        with self._condition:
+            space = self.max_buffered_messages - len(self._buffer)
+            if space < len(batch):
+                self.dropped += len(batch) - max(space, 0)
+                batch = batch[len(batch) - max(space, 0):]
+            self._buffer.extendleft(reversed(batch))
+
+    def _run(self):
+        backoff = self.backoff_initial_seconds
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            try:
+                if self._socket is not None and self._peer_closed():
+                    logger.info(f"Syslog server closed the connection for {self.name}, reconnecting")
+                    self._disconnect()
+                if self._socket is None:
+                    self._connect()
+                    self.connects += 1
+                self._socket.sendall(frame_octet_counting(batch))
+                self.sent += len(batch)
+                backoff = self.backoff_initial_seconds
+            except OSError as e:
+                self._disconnect()
+                self._requeue(batch)
+                if self._stopping:
+                    return
+                # Full jitter, so several daemons do not reconnect to a restarted collector at the same moment
+                delay = random.uniform(0, backoff)
+                logger.warning(f"Unable to send to syslog server {self.server_address}:{self.port} for {self.name} "
+                               f"({e}).  Retrying in {delay:.1f} seconds")
+                with self._condition:
+                    self._condition.wait_for(lambda: self._stopping, timeout=delay)
+                backoff = min(backoff * 2, self.backoff_max_seconds)
@@ -0,0 +1,87 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import re
+
+# ANSI control sequences (colors, cursor movement, etc.)
+ANSI_ESCAPE_REGEX = re.compile(r'(\x9B|\x1B\[)[0-?]*[ -/]*[@-~]')
+# The start of a control sequence that has not been terminated yet
+PARTIAL_ANSI_ESCAPE_REGEX = re.compile(r'(\x9B|\x1B\[?)[0-?]*[ -/]*')
+
+# An unterminated sequence longer than this is not held back waiting for the rest of it
+MAX_PENDING_CHARS = 256
+
+
+class TerminalSanitizer:
+    '''
+    Incrementally cleans the terminal output of one session for log files.  ANSI control sequences are removed
+    and special characters are replaced with readable text (e.g., "[Ctrl+C]").
+    Terminal data arrives in chunks that can split a control sequence in two, so an incomplete sequence at the
+    end of a chunk is held back and cleaned together with the next chunk.
+    '''
+    def __init__(self, key_to_text_mapping):
+        '''
+        :param key_to_text_mapping: dict of special characters (or character sequences) to the replacement text
+        '''
+        # Multi character keys are replaced first, since the replacement text can contain the same characters.
+        # The replacement text never contains special characters, so it is not replaced again
+        self.key_to_text_mapping = key_to_text_mapping
+        self.replacements = sorted(key_to_text_mapping.items(), key=lambda item: len(item[0]), reverse=True)
+        # Partial multi character keys that can appear at the end of a chunk, longest first
+        self.multi_char_prefixes = tuple(sorted({key[:i] for key in key_to_text_mapping for i in range(1, len(key))},
+                                                key=len, reverse=True))
+        self.pending = ''
+
+    def sanitize(self, term_data):
+        '''
+        Cleans the next chunk of terminal data
+        :return: Cleaned text.  Text held back from the end of the chunk is returned by a later call
+        '''
+        if self.pending:
+            term_data = self.pending + term_data
+            self.pending = ''
+
+        split_index = self._pending_index(term_data)
+        if split_index < len(term_data):
+            self.pending = term_data[split_index:]
+            term_data = term_data[:split_index]
+
+        return self._clean(term_data)
+
+    def flush(self):
+        '''
+        Cleans any text being held back, e.g., when the session is closed
+        :return: Cleaned text
+        '''
+        term_data = self.pending
+        self.pending = ''
+        return self._clean(term_data)
+
+    def _pending_index(self, term_data):
+        ''' Returns the index where an incomplete sequence at the end of term_data starts (or len(term_data)) '''
+        search_start = max(len(term_data) - MAX_PENDING_CHARS, 0)
+        escape_index = max(term_data.rfind('\x1b', search_start), term_data.rfind('\x9b', search_start))
+        if escape_index >= 0 and PARTIAL_ANSI_ESCAPE_REGEX.fullmatch(term_data, escape_index):
+            return escape_index
+
+        if term_data.endswith(self.multi_char_prefixes):
+            for prefix in self.multi_char_prefixes:
+                if term_data.endswith(prefix):
+                    return len(term_data) - len(prefix)
+
+        return len(term_data)
+
+    def _clean(self, term_data):
+        if len(term_data) == 1:
+            # Typed characters are usually echoed one at a time
+            return self.key_to_text_mapping.get(term_data, term_data)
+
+        if '\x1b' in term_data or '\x9b' in term_data:
+            term_data = ANSI_ESCAPE_REGEX.sub('', term_data)
+        # Most chunks contain only a few of the special characters.  Checking for each one and replacing only
+        # those present is much faster than a regex substitution with a callback per match
+        for key, text in self.replacements:
+            if key in term_data:
+                term_data = term_data.replace(key, text)
+        return term_data
@@ -6,59 +6,74 @@ from plugins.common.plugin import FilterPlugin
 from comms.event_types import SSHTRACE_EVENT_COMMAND_START, SSHTRACE_EVENT_COMMAND_END
 
 
+def _event_filename(event_data):
+    return event_data['filename']
+
+
 class command_name_filter(FilterPlugin):
 
+    def init_filter(self):
+        if isinstance(self.filter_arg, list):
+            self._commands = frozenset(self.filter_arg)
+        else:
+            self._commands = frozenset([self.filter_arg])
+
     def triggers(self):
         return [SSHTRACE_EVENT_COMMAND_START, SSHTRACE_EVENT_COMMAND_END]
 
-    def filter(self, event_data):
-        command_to_match = self.filter_arg
+    def dispatch_key(self):
+        return 'filename', _event_filename, self._commands
 
-        if isinstance(command_to_match, list):
-            return event_data['filename'] in command_to_match
+    def filter(self, event_data):
+        return event_data['filename'] in self._commands
 
-        if event_data['filename'] != command_to_match:
-            return False
 
-        return True
+class command_name_regex_filter(command_name_filter):
 
+    def init_filter(self):
+        self._matches = self._compile_regex(self.filter_arg)
 
-class command_name_regex_filter(command_name_filter):
+    def dispatch_key(self):
+        return None
 
     def filter(self, event_data):
-        command_to_match_regex = self.filter_arg
-        return self._compare_regex_strings(command_to_match_regex, event_data['filename'])
+        return self._matches(event_data['filename'])
 
 
 class command_exit_code_filter(FilterPlugin):
 
+    def init_filter(self):
+        if isinstance(self.filter_arg, list):
+            exit_codes = frozenset(self.filter_arg)
+            self._matches = lambda exit_code: exit_code in exit_codes
+        else:
+            # Handle strings such as != 0, > 1, etc.
+            self._matches = self._compile_number_comparison(self.filter_arg)
+
     def triggers(self):
         return [SSHTRACE_EVENT_COMMAND_END]
 
     def filter(self, event_data):
-        exit_code_eval_string = self.filter_arg
-
-        if isinstance(exit_code_eval_string, list):
-            return event_data['exit_code'] in exit_code_eval_string
-        # Handle strings such as != 0, > 1, etc.
-        return self._compare_numbers(exit_code_eval_string, event_data['exit_code'])
+        return self._matches(event_data['exit_code'])
 
 
 class command_output_contains_filter(FilterPlugin):
 
+    def init_filter(self):
+        if not isinstance(self.filter_arg, str):
+            raise ValueError(f"Expected a string to search for, not {self.filter_arg}")
+
     def triggers(self):
         return [SSHTRACE_EVENT_COMMAND_END]
 
     def filter(self, event_data):
-        output_to_find = self.filter_arg
-        if output_to_find not in event_data['stdout']:
-            return False
-
-        return True
+        return self.filter_arg in event_data['stdout']
 
 
 class command_output_contains_regex_filter(command_output_contains_filter):
 
+    def init_filter(self):
+        self._matches = self._compile_regex(self.filter_arg)
+
     def filter(self, event_data):
-        output_to_find_regex = self.filter_arg
-        return self._compare_regex_strings(output_to_find_regex, event_data['stdout'])
\ No newline at end of file
+        return self._matches(event_data['stdout'])
\ No newline at end of file
@@ -46,22 +46,47 @@ class require_tty_filter(FilterPlugin):
 
 class username_filter(FilterPlugin):
 
+    def init_filter(self):
+        user = self.filter_arg
+
+        if isinstance(user, list):
+            self._usernames = frozenset(user)
+        elif user != '*' and user != '' and user is not None:
+            self._usernames = frozenset([user])
+        else:
+            # Match any user
+            self._usernames = None
+
     def triggers(self):
         return [SSHTRACE_EVENT_ESTABLISHED_CONNECTION, SSHTRACE_EVENT_CLOSE_CONNECTION, SSHTRACE_EVENT_COMMAND_START,
                 SSHTRACE_EVENT_COMMAND_END, SSHTRACE_EVENT_TERMINAL_UPDATE, SSHTRACE_EVENT_FILE_UPLOAD]
 
-    def filter(self, event_data):
-        user = self.filter_arg
+    def _event_username(self, event_data):
+        if 'username' in event_data:
+            return event_data['username']
 
-        if isinstance(user, list):
-            return event_data['username'] in user
-        elif user != '*' and user != '' and user is not None:
-            if user != event_data['username']:
-                return False
+        # Terminal updates do not carry the username, look it up from the session
+        session = self.session_tracker.get_session(event_data['ptm_pid'])
+        if session is None:
+            return ''
+        return session.username
 
-        return True
+    def dispatch_key(self):
+        if self._usernames is None:
+            return None
+        return 'username', self._event_username, self._usernames
+
+    def filter(self, event_data):
+        if self._usernames is None:
+            return True
+        return self._event_username(event_data) in self._usernames
 
 class username_regex_filter(username_filter):
+    def init_filter(self):
+        self._matches = self._compile_regex(self.filter_arg)
+
+    def dispatch_key(self):
+        return None
+
     def filter(self, event_data):
-        user_regex = self.filter_arg
-        return self._compare_regex_strings(user_regex, event_data['username'])
\ No newline at end of file
+        return self._matches(self._event_username(event_data))
\ No newline at end of file
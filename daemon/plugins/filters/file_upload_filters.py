@@ -8,25 +8,52 @@ from plugins.common.plugin import FilterPlugin
 from comms.event_types import SSHTRACE_EVENT_FILE_UPLOAD
 
 
+def _event_target_path(event_data):
+    return event_data['target_path']
+
+
+def _event_target_realpath(event_data):
+    return os.path.realpath(event_data['target_path'])
+
+
 class upload_file_path_filter(FilterPlugin):
 
     def triggers(self):
         return [SSHTRACE_EVENT_FILE_UPLOAD]
 
-    def filter(self, event_data):
+    def init_filter(self):
         expected_path = self.filter_arg
-        target_path = event_data['target_path']
 
         if isinstance(expected_path, list):
-            return target_path in expected_path
+            self._expected_paths = frozenset(expected_path)
+            self._expected_realpath = None
+        elif isinstance(expected_path, str):
+            self._expected_paths = None
+            # Resolve the configured path once, only the uploaded path needs resolving per event
+            self._expected_realpath = os.path.realpath(expected_path)
+        else:
+            raise ValueError(f"Expected a file path or list of file paths, not {expected_path}")
+
+    def dispatch_key(self):
+        if self._expected_paths is not None:
+            return 'target_path', _event_target_path, self._expected_paths
+        return 'target_realpath', _event_target_realpath, frozenset([self._expected_realpath])
 
-        if os.path.realpath(expected_path) != os.path.realpath(target_path):
-            return False
+    def filter(self, event_data):
+        target_path = event_data['target_path']
+
+        if self._expected_paths is not None:
+            return target_path in self._expected_paths
 
-        return True
+        return self._expected_realpath == os.path.realpath(target_path)
 
 
 class upload_file_path_regex_filter(upload_file_path_filter):
+    def init_filter(self):
+        self._matches = self._compile_regex(self.filter_arg)
+
+    def dispatch_key(self):
+        return None
+
     def filter(self, event_data):
-        expected_path_regex = self.filter_arg
-        return self._compare_regex_strings(expected_path_regex, event_data['target_path'])
\ No newline at end of file
+        return self._matches(event_data['target_path'])
\ No newline at end of file
@@ -0,0 +1,67 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+import sys
+
+
+class SessionRecord:
+    '''
+    An active SSH session, as stored by the Tracker.  The fields are copied from the connection_established event,
+    so the record does not share the event dict with the actions handling the event.  Usernames and IP addresses
+    are interned, since many sessions usually come from a few users and addresses
+    '''
+    __slots__ = ('ptm_pid', 'pts_pid', 'shell_pid', 'tty_id', 'user_id', 'username', 'client_ip', 'client_port',
+                 'server_ip', 'server_port', 'start_time', 'end_time', 'last_activity_time', 'last_command')
+
+    def __init__(self, ptm_pid, pts_pid, shell_pid, tty_id, user_id, username, client_ip, client_port, server_ip,
+                 server_port, start_time, end_time, last_activity_time=0, last_command=''):
+        self.ptm_pid = ptm_pid
+        self.pts_pid = pts_pid
+        self.shell_pid = shell_pid
+        self.tty_id = tty_id
+        self.user_id = user_id
+        self.username = sys.intern(username)
+        self.client_ip = sys.intern(client_ip)
+        self.client_port = client_port
+        self.server_ip = sys.intern(server_ip)
+        self.server_port = server_port
+        self.start_time = start_time
+        self.end_time = end_time
+        self.last_activity_time = last_activity_time
+        self.last_command = last_command
+
+    @classmethod
+    def from_event(cls, event_data, last_activity_time=0):
+        ''' Builds the record from a connection_established event '''
+        tcp_info = event_data['tcp_info']
+        return cls(event_data['ptm_pid'], event_data['pts_pid'], event_data['shell_pid'], event_data['tty_id'],
+                   event_data['user_id'], event_data['username'], tcp_info['client_ip'], tcp_info['client_port'],
+                   tcp_info['server_ip'], tcp_info['server_port'], event_data['start_time'], event_data['end_time'],
+                   last_activity_time=last_activity_time)
+
+    @property
+    def tcp_info(self):
+        ''' A new dict in the same format as the tcp_info of connection events '''
+        return {'server_ip': self.server_ip, 'client_ip': self.client_ip,
+                'server_port': self.server_port, 'client_port': self.client_port}
+
+    # Sessions used to be the event dicts, so plugins may still read them with session['username'] or session.get()
+    def __getitem__(self, key):
+        if key in self.__slots__ or key == 'tcp_info':
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        # Without this, "in" would fall back to __getitem__ with integer indexes
+        return key in self.__slots__ or key == 'tcp_info'
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"SessionRecord(ptm_pid={self.ptm_pid}, username={self.username}, tty_id={self.tty_id}, " \
+               f"client_ip={self.client_ip})"
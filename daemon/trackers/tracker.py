@@ -4,12 +4,35 @@
 
 from events.event_bus import eventbus_sshtrace_subscribe
 from comms.event_types import *
+from .session_record import SessionRecord
+import threading
 import time
 
-class Tracker:
+# Session fields with a secondary index.  Each index maps a value to the ptm_pid of the session with it, or to a
+# set of ptm_pids when several sessions share the value.  Most tty_id and shell_pid values belong to one session,
+# and a set for each would use more memory than the session itself
+INDEXED_FIELDS = ['tty_id', 'username', 'client_ip', 'shell_pid']
+
+
+def _index_values(session):
+    return {
+        'tty_id': session.tty_id,
+        'username': session.username,
+        'client_ip': session.client_ip,
+        'shell_pid': session.shell_pid,
+    }
 
+
+class Tracker:
+    '''
+    Tracks the active SSH sessions (SessionRecord), keyed by ptm_pid.  Sessions are updated from the event thread
+    and read from the MQ request handlers, the web server and the action threads, so all access goes through a lock
+    and the methods that return several sessions return a snapshot list
+    '''
     def __init__(self):
-        self.connections = {}
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
 
         eventbus_sshtrace_subscribe(self.connection_established, SSHTRACE_EVENT_ESTABLISHED_CONNECTION)
         eventbus_sshtrace_subscribe(self.connection_closed, SSHTRACE_EVENT_CLOSE_CONNECTION)
@@ -17,37 +40,107 @@ class Tracker:
         eventbus_sshtrace_subscribe(self.command_activity, SSHTRACE_EVENT_COMMAND_START)
         eventbus_sshtrace_subscribe(self.connection_activity, SSHTRACE_EVENT_TERMINAL_UPDATE)
 
+    def _add_to_indexes(self, pid_key, session):
+        for field, value in _index_values(session).items():
+            index = self._indexes[field]
+            pids = index.get(value)
+            if pids is None:
+                index[value] = pid_key
+            elif isinstance(pids, set):
+                pids.add(pid_key)
+            elif pids != pid_key:
+                index[value] = {pids, pid_key}
+
+    def _remove_from_indexes(self, pid_key, session):
+        for field, value in _index_values(session).items():
+            index = self._indexes[field]
+            pids = index.get(value)
+            if isinstance(pids, set):
+                pids.discard(pid_key)
+                if len(pids) == 1:
+                    index[value] = next(iter(pids))
+            elif pids == pid_key:
+                del index[value]
+
+    def _indexed_pids(self, field, value):
+        pids = self._indexes[field].get(value)
+        if pids is None:
+            return ()
+        if isinstance(pids, set):
+            return pids
+        return (pids,)
 
     def connection_established(self, event_data):
         pid_key = event_data['ptm_pid']
-        self.connections[pid_key] = event_data
-        self.connections[pid_key]['last_activity_time'] = round(time.time() * 1000.0)
-        self.connections[pid_key]['last_command'] = ''
+        session = SessionRecord.from_event(event_data, last_activity_time=round(time.time() * 1000.0))
+        with self._lock:
+            # The daemon reports existing sessions again when it restarts
+            previous = self._sessions.get(pid_key)
+            if previous is not None:
+                self._remove_from_indexes(pid_key, previous)
+            self._sessions[pid_key] = session
+            self._add_to_indexes(pid_key, session)
 
     def connection_closed(self, event_data):
         pid_key = event_data['ptm_pid']
-        if pid_key in self.connections:
-            del self.connections[pid_key]
+        with self._lock:
+            session = self._sessions.pop(pid_key, None)
+            if session is not None:
+                self._remove_from_indexes(pid_key, session)
 
     def connection_activity(self, event_data):
         pid_key = event_data['ptm_pid']
-        if pid_key in self.connections:
-            self.connections[pid_key]['last_activity_time'] = round(time.time() * 1000.0)
+        with self._lock:
+            session = self._sessions.get(pid_key)
+            if session is not None:
+                session.last_activity_time = round(time.time() * 1000.0)
 
     def command_activity(self, event_data):
         pid_key = event_data['ptm_pid']
-        if pid_key in self.connections:
-            self.connections[pid_key]['last_command'] = event_data['args']
-
-
+        with self._lock:
+            session = self._sessions.get(pid_key)
+            if session is not None:
+                session.last_command = event_data['args']
 
     def get_sessions(self):
-        return self.connections.values()
+        ''' Returns a list of all active sessions, which is safe to iterate while sessions open and close '''
+        with self._lock:
+            return list(self._sessions.values())
 
     def get_session(self, session_pid):
-        if session_pid in self.connections:
-            return self.connections[session_pid]
-        return None
-
-
-
+        ''' Returns the session for the ptm_pid, or None '''
+        with self._lock:
+            return self._sessions.get(session_pid)
+
+    def session_count(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def find_sessions(self, tty_id=None, username=None, client_ip=None, shell_pid=None):
+        '''
+        Returns the sessions matching all of the given values, using the secondary indexes.  Arguments that are
+        None are not filtered on
+        :return: list of sessions, ordered by ptm_pid
+        '''
+        criteria = [(field, value) for field, value in
+                    [('tty_id', tty_id), ('username', username), ('client_ip', client_ip), ('shell_pid', shell_pid)]
+                    if value is not None]
+        with self._lock:
+            if len(criteria) == 0:
+                pids = self._sessions.keys()
+            else:
+                # Start from the smallest index entry
+                pid_sets = [self._indexed_pids(field, value) for field, value in criteria]
+                pid_sets.sort(key=len)
+                pids = set(pid_sets[0]).intersection(*pid_sets[1:])
+            return [self._sessions[pid] for pid in sorted(pids)]
+
+    def get_session_by_tty(self, tty_id):
+        ''' Returns the session using the TTY, or None '''
+        sessions = self.find_sessions(tty_id=tty_id)
+        return sessions[0] if len(sessions) > 0 else None
+
+    def get_session_by_shell_pid(self, shell_pid):
+        ''' Returns the session with the shell process, or None '''
+        sessions = self.find_sessions(shell_pid=shell_pid)
+        return sessions[0] if len(sessions) > 0 else None
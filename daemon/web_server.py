@@ -228,11 +228,11 @@ class SSHLogWebServer:
             # Iterate over the tracker's sessions
             for s in self.session_tracker.get_sessions():
                 sessions.append({
-                    'user': s['username'],
-                    'ptm_pid': s['ptm_pid'],
-                    'tty_id': s['tty_id'],
-                    'client_ip': s['tcp_info']['client_ip'],
-                    'start_time': s.get('start_time')
+                    'user': s.username,
+                    'ptm_pid': s.ptm_pid,
+                    'tty_id': s.tty_id,
+                    'client_ip': s.client_ip,
+                    'start_time': s.start_time
                 })
         except Exception as e:
             logger.error(f"Error listing sessions: {e}")
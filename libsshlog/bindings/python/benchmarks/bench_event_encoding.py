@@ -0,0 +1,98 @@
+# Copyright 2026- by CHMOD 700 LLC. All rights reserved.
+# This file is part of the SSHLog Software (SSHLog)
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE Version 3 (AGPLv3)
+
+# Compares decoding cost of the JSON and binary event encodings at high terminal update rates.
+# Runs without libsshlog or BPF.  Records are produced with the Python mirror of the C encoders.
+#
+# usage: python3 bench_event_encoding.py [--events N] [--json-output results.json]
+
+import argparse
+import importlib
+import os
+import random
+import string
+import sys
+import time
+
+# Import the codec directly so that the benchmark does not need libsshlog.so loaded
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'sshlog'))
+from event_codec import encode_binary_event, decode_binary_event
+
+if importlib.util.find_spec("orjson") is not None:
+    import orjson as json
+    json_name = 'orjson'
+elif importlib.util.find_spec("ujson") is not None:
+    import ujson as json
+    json_name = 'ujson'
+else:
+    import json
+    json_name = 'json'
+
+import json as std_json
+
+TERMINAL_CHUNK_SIZES = [16, 256, 4096, 16384]
+
+
+def _terminal_events(count, chunk_size):
+    # Mix of printable text and ANSI color codes, similar to `cat` of a large colored log
+    alphabet = string.ascii_letters + string.digits + ' \n'
+    events = []
+    for i in range(count):
+        text = ''.join(random.choice(alphabet) for _ in range(max(1, chunk_size - 8)))
+        text = '\x1b[32m' + text[:chunk_size // 2] + '\x1b[0m' + text[chunk_size // 2:]
+        events.append({'event_type': 'terminal_update', 'ptm_pid': 1000 + (i % 50),
+                       'terminal_data': text, 'data_len': len(text)})
+    return events
+
+
+def _time_decode(records, decode, read_terminal_data):
+    start = time.perf_counter()
+    if read_terminal_data:
+        for record in records:
+            decode(record)['terminal_data']
+    else:
+        for record in records:
+            decode(record)['data_len']
+    return time.perf_counter() - start
+
+
+def run(num_events):
+    results = []
+    for chunk_size in TERMINAL_CHUNK_SIZES:
+        events = _terminal_events(num_events, chunk_size)
+        # The library hands over bytes in both cases, so encode both up front
+        json_records = [std_json.dumps(ev, separators=(',', ':')).encode('utf-8') for ev in events]
+        binary_records = [encode_binary_event(ev) for ev in events]
+
+        for read_terminal_data in (False, True):
+            json_sec = _time_decode(json_records, json.loads, read_terminal_data)
+            binary_sec = _time_decode(binary_records, decode_binary_event, read_terminal_data)
+            results.append({
+                'chunk_bytes': chunk_size,
+                'reads_terminal_data': read_terminal_data,
+                'json_events_per_sec': round(num_events / json_sec),
+                'binary_events_per_sec': round(num_events / binary_sec),
+                'json_bytes_per_event': sum(len(r) for r in json_records) // num_events,
+                'binary_bytes_per_event': sum(len(r) for r in binary_records) // num_events,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SSHLog event encoding benchmark")
+    parser.add_argument('--events', type=int, default=20000, help='Number of terminal updates per test')
+    parser.add_argument('--json-output', default=None, help='Write machine-readable results to this file')
+    args = parser.parse_args()
+
+    results = run(args.events)
+
+    print(f"JSON decoder: {json_name}")
+    print(f"{'chunk':>7} {'reads data':>10} {'json ev/s':>12} {'binary ev/s':>12} {'json B':>8} {'binary B':>9}")
+    for r in results:
+        print(f"{r['chunk_bytes']:>7} {str(r['reads_terminal_data']):>10} {r['json_events_per_sec']:>12} "
+              f"{r['binary_events_per_sec']:>12} {r['json_bytes_per_event']:>8} {r['binary_bytes_per_event']:>9}")
+
+    if args.json_output:
+        with open(args.json_output, 'w') as out_file:
+            std_json.dump({'json_decoder': json_name, 'results': results}, out_file, indent=2)
@@ -1 +1,2 @@
-from .sshlog import SSHLog
\ No newline at end of file
+from .sshlog import SSHLog
+from .event_codec import EVENT_FORMAT_JSON, EVENT_FORMAT_BINARY
\ No newline at end of file
@@ -0,0 +1,261 @@
+import socket
+import struct
+
+# Decoder (and matching encoder) for the compact binary event records produced by libsshlog when
+# sshlog_options.event_format is EVENT_FORMAT_BINARY.  The record layout is documented in
+# libsshlog/event_serializer.h.  The module only uses the standard library, so it can be loaded by
+# path without libsshlog (as the benchmarks do).  Importing it through the sshlog package
+# (import sshlog.event_codec) runs the package __init__, which does load libsshlog
+
+EVENT_FORMAT_JSON = 0
+EVENT_FORMAT_BINARY = 1
+
+BINARY_EVENT_VERSION = 1
+
+# Numeric event identifiers from libsshlog/bpf/sshtrace_events.h
+_EVENT_TYPE_NAMES = {
+    101: 'connection_new',
+    102: 'connection_established',
+    103: 'connection_close',
+    104: 'connection_auth_failed',
+    201: 'command_start',
+    202: 'command_finish',
+    301: 'terminal_update',
+    401: 'file_upload',
+}
+_EVENT_TYPE_IDS = {name: event_id for event_id, name in _EVENT_TYPE_NAMES.items()}
+
+_CONNECTION_EVENTS = (101, 102, 103, 104)
+_COMMAND_EVENTS = (201, 202)
+_TERMINAL_UPDATE_EVENT = 301
+_FILE_UPLOAD_EVENT = 401
+
+# "=" is host byte order with no padding, matching the memcpy'd values on the C side
+_HEADER = struct.Struct('=IHHI')
+_CONNECTION = struct.Struct('=iiiiqq4s4sHH')
+_COMMAND = struct.Struct('=qqiIII')
+# data_len followed by the terminal_data string length
+_TERMINAL_UPDATE = struct.Struct('=iI')
+_FILE_UPLOAD = struct.Struct('=I')
+_STR_LEN = struct.Struct('=I')
+
+_ZERO_IP = b'\x00\x00\x00\x00'
+
+
+def record_length(buf):
+    ''' Returns the total length of the binary record that starts at the beginning of buf '''
+    return _STR_LEN.unpack_from(buf, 0)[0]
+
+
+def _ip_to_str(raw_ip):
+    # The JSON encoder reports unknown addresses as '0' rather than 0.0.0.0
+    if raw_ip == _ZERO_IP:
+        return '0'
+    return socket.inet_ntoa(raw_ip)
+
+
+def _str_to_ip(ip_str):
+    if ip_str in ('0', '', None):
+        return _ZERO_IP
+    return socket.inet_aton(ip_str)
+
+
+class BinaryEvent(dict):
+    '''
+    Event dictionary decoded from a binary record.  terminal_data is held as a memoryview over the
+    record and is only decoded to text the first time it is read, so consumers that never look at
+    the terminal content (stats, event logs, etc.) never pay for the decode.
+    Until then terminal_data is not in the underlying dict storage, which encoders that read it
+    directly (orjson, ujson) would miss.  Serialize a copy made with dict(event.items()) instead
+    '''
+    # Class level defaults rather than __init__ so that construction stays in C for non-terminal events
+    _raw_terminal_data = None
+    _terminal_data_pending = False
+
+    def _set_raw_terminal_data(self, raw):
+        self._raw_terminal_data = raw
+        self._terminal_data_pending = True
+
+    @property
+    def terminal_data_raw(self):
+        ''' The undecoded terminal data as a memoryview, or None if this is not a terminal update '''
+        if self._terminal_data_pending:
+            return self._raw_terminal_data
+        # Once decoded, terminal_data may have been replaced, so the record bytes are not used
+        if dict.__contains__(self, 'terminal_data'):
+            return memoryview(dict.__getitem__(self, 'terminal_data').encode('utf-8'))
+        return None
+
+    def _materialize(self):
+        if self._terminal_data_pending:
+            self._terminal_data_pending = False
+            dict.__setitem__(self, 'terminal_data', str(self._raw_terminal_data, 'utf-8', 'replace'))
+
+    def __missing__(self, key):
+        if key == 'terminal_data' and self._terminal_data_pending:
+            self._materialize()
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key == 'terminal_data':
+            self._materialize()
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        if key == 'terminal_data' and self._terminal_data_pending:
+            return True
+        return dict.__contains__(self, key)
+
+    def __setitem__(self, key, value):
+        if key == 'terminal_data':
+            self._terminal_data_pending = False
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if key == 'terminal_data' and self._terminal_data_pending:
+            self._terminal_data_pending = False
+            return
+        dict.__delitem__(self, key)
+
+    def __len__(self):
+        return dict.__len__(self) + (1 if self._terminal_data_pending else 0)
+
+    def copy(self):
+        event_copy = BinaryEvent(dict.items(self))
+        event_copy._raw_terminal_data = self._raw_terminal_data
+        event_copy._terminal_data_pending = self._terminal_data_pending
+        return event_copy
+
+    def __reduce__(self):
+        self._materialize()
+        return (dict, (dict(dict.items(self)),))
+
+
+def _materializing(name):
+    # Whole-dictionary operations (iteration, json.dumps, repr, etc.) need every value present
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+# Every method that reads or replaces values in bulk, so that terminal_data can never be replaced in the
+# dict storage while the undecoded bytes are still treated as its value
+for _method_name in ('__iter__', '__repr__', '__eq__', '__ne__', '__or__', '__ror__', '__ior__', 'keys', 'values',
+                     'items', 'pop', 'popitem', 'setdefault', 'update'):
+    setattr(BinaryEvent, _method_name, _materializing(_method_name))
+
+
+def _read_str(buf, offset):
+    str_len = _STR_LEN.unpack_from(buf, offset)[0]
+    offset += _STR_LEN.size
+    return str(buf[offset:offset + str_len], 'utf-8', 'replace'), offset + str_len
+
+
+def decode_binary_event(buf):
+    '''
+    Decodes a single binary event record
+    :param buf: bytes containing exactly one record (see record_length())
+    :return: BinaryEvent dictionary with the same keys as the JSON encoded event
+    '''
+    record_len, version, event_type_id, ptm_pid = _HEADER.unpack_from(buf, 0)
+    if version != BINARY_EVENT_VERSION:
+        raise ValueError(f"Unsupported binary event version {version}")
+
+    event_type = _EVENT_TYPE_NAMES.get(event_type_id, 'unknown')
+    offset = _HEADER.size
+
+    if event_type_id == _TERMINAL_UPDATE_EVENT:
+        data_len, str_len = _TERMINAL_UPDATE.unpack_from(buf, offset)
+        offset += _TERMINAL_UPDATE.size
+        event = BinaryEvent(event_type=event_type, ptm_pid=ptm_pid, data_len=data_len)
+        event._set_raw_terminal_data(memoryview(buf)[offset:offset + str_len])
+
+    elif event_type_id in _COMMAND_EVENTS:
+        start_time, end_time, exit_code, stdout_size, parent_pid, pid = _COMMAND.unpack_from(buf, offset)
+        offset += _COMMAND.size
+        filename, offset = _read_str(buf, offset)
+        stdout, offset = _read_str(buf, offset)
+        args, offset = _read_str(buf, offset)
+        event = BinaryEvent(event_type=event_type, ptm_pid=ptm_pid, filename=filename, start_time=start_time,
+                            end_time=end_time, exit_code=exit_code, stdout_size=stdout_size, stdout=stdout,
+                            args=args, parent_pid=parent_pid, pid=pid)
+
+    elif event_type_id in _CONNECTION_EVENTS:
+        (user_id, pts_pid, shell_pid, tty_id, start_time, end_time,
+         server_ip, client_ip, server_port, client_port) = _CONNECTION.unpack_from(buf, offset)
+        offset += _CONNECTION.size
+        username, offset = _read_str(buf, offset)
+        tcp_info = {
+            'server_ip': _ip_to_str(server_ip),
+            'client_ip': _ip_to_str(client_ip),
+            'server_port': server_port,
+            'client_port': client_port
+        }
+        event = BinaryEvent(event_type=event_type, ptm_pid=ptm_pid, user_id=user_id, username=username,
+                            pts_pid=pts_pid, shell_pid=shell_pid, tty_id=tty_id, start_time=start_time,
+                            end_time=end_time, tcp_info=tcp_info)
+
+    elif event_type_id == _FILE_UPLOAD_EVENT:
+        file_mode = _FILE_UPLOAD.unpack_from(buf, offset)[0]
+        offset += _FILE_UPLOAD.size
+        target_path, offset = _read_str(buf, offset)
+        event = BinaryEvent(event_type=event_type, ptm_pid=ptm_pid, target_path=target_path,
+                            file_mode='%3o' % (file_mode & 0o777))
+
+    else:
+        event = BinaryEvent(event_type=event_type, ptm_pid=ptm_pid)
+
+    return event
+
+
+def _pack_str(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    else:
+        value = bytes(value)
+    return _STR_LEN.pack(len(value)) + value
+
+
+def encode_binary_event(event_data):
+    '''
+    Encodes an event dictionary into the binary record format.  This mirrors serialize_event_binary()
+    in libsshlog and is used for captures, replays and benchmarks
+    :param event_data: Event dictionary as returned by SSHLog.poll()
+    :return: bytes for a single record
+    '''
+    event_type_id = _EVENT_TYPE_IDS[event_data['event_type']]
+
+    if event_type_id == _TERMINAL_UPDATE_EVENT:
+        if isinstance(event_data, BinaryEvent) and event_data._terminal_data_pending:
+            # Never decoded, so the record bytes are still the value
+            terminal_data = event_data.terminal_data_raw
+        else:
+            terminal_data = event_data['terminal_data']
+        terminal_data = terminal_data.encode('utf-8') if isinstance(terminal_data, str) else bytes(terminal_data)
+        body = _TERMINAL_UPDATE.pack(event_data['data_len'], len(terminal_data)) + terminal_data
+
+    elif event_type_id in _COMMAND_EVENTS:
+        body = _COMMAND.pack(event_data['start_time'], event_data['end_time'], event_data['exit_code'],
+                             event_data['stdout_size'], event_data['parent_pid'], event_data['pid']) + \
+            _pack_str(event_data['filename']) + _pack_str(event_data['stdout']) + _pack_str(event_data['args'])
+
+    elif event_type_id in _CONNECTION_EVENTS:
+        tcp_info = event_data['tcp_info']
+        body = _CONNECTION.pack(event_data['user_id'], event_data['pts_pid'], event_data['shell_pid'],
+                                event_data['tty_id'], event_data['start_time'], event_data['end_time'],
+                                _str_to_ip(tcp_info['server_ip']), _str_to_ip(tcp_info['client_ip']),
+                                tcp_info['server_port'], tcp_info['client_port']) + \
+            _pack_str(event_data['username'])
+
+    else:
+        body = _FILE_UPLOAD.pack(int(event_data['file_mode'], 8)) + _pack_str(event_data['target_path'])
+
+    header = _HEADER.pack(_HEADER.size + len(body), BINARY_EVENT_VERSION, event_type_id, event_data['ptm_pid'])
+    return header + body
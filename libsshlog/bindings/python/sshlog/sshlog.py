@@ -1,5 +1,6 @@
 import ctypes
 import importlib
+from .event_codec import EVENT_FORMAT_JSON, EVENT_FORMAT_BINARY, decode_binary_event
 # orjson (if available) is significantly faster
 # ujson is pretty fast and more common
 # std library json is relatively slow
@@ -18,7 +19,8 @@ class SSHLOG(ctypes.Structure):
 
 # Define the sshlog_options and SSHLOG structs
 class sshlog_options(ctypes.Structure):
-    _fields_ = [("log_level", ctypes.c_int)]
+    _fields_ = [("log_level", ctypes.c_int),
+                ("event_format", ctypes.c_int)]
 
 # Define the argument and return types for the sshlog_init function
 lib.sshlog_init.argtypes = [ctypes.POINTER(sshlog_options)]
@@ -35,23 +37,39 @@ lib.sshlog_is_ok.argtypes = [ctypes.POINTER(SSHLOG)]
 lib.sshlog_event_poll.argtypes = [ctypes.POINTER(SSHLOG), ctypes.c_int]
 lib.sshlog_event_poll.restype = ctypes.c_void_p
 
+# Define the argument and return types for the sshlog_event_poll_many function
+lib.sshlog_event_poll_many.argtypes = [ctypes.POINTER(SSHLOG), ctypes.POINTER(ctypes.c_void_p), ctypes.c_int, ctypes.c_int]
+lib.sshlog_event_poll_many.restype = ctypes.c_int
+
 # Define the argument types for the sshlog_event_release function
 lib.sshlog_event_release.argtypes = [ctypes.c_void_p]
 
+# Define the argument types for the sshlog_event_release_many function
+lib.sshlog_event_release_many.argtypes = [ctypes.POINTER(ctypes.c_void_p), ctypes.c_int]
+
 # Define the argument types for the sshlog_release function
 lib.sshlog_release.argtypes = [ctypes.POINTER(SSHLOG)]
 
 
 
 class SSHLog(object):
-    def __init__(self, loglevel=0):
+    def __init__(self, loglevel=0, event_format=EVENT_FORMAT_JSON):
         self.loglevel = loglevel
+        # EVENT_FORMAT_BINARY skips JSON entirely.  Events are returned as BinaryEvent dictionaries
+        self.event_format = event_format
+        if event_format == EVENT_FORMAT_BINARY:
+            self._decode = self._decode_binary
+        else:
+            self._decode = self._decode_json
+        # Re-used between poll_many() calls so that the pointer array is not re-allocated on every poll
+        self._event_buffer = None
 
     def __enter__(self):
         # Call the sshlog_init function
         #print("INITIALIZING SSHB")
         options = lib.sshlog_get_default_options()
         options.log_level = self.loglevel
+        options.event_format = self.event_format
         self._instance = lib.sshlog_init(options)
         return self
 
@@ -68,11 +86,43 @@ class SSHLog(object):
             return None
 
         ptr = lib.sshlog_event_poll(self._instance, timeout_ms)
-        event_data = ctypes.cast(ptr, ctypes.c_char_p).value
-        if event_data is not None:
-            resp = json.loads(event_data.decode('utf-8'))
+        if ptr:
+            resp = self._decode(ptr)
             #print(json.dumps(resp))
             lib.sshlog_event_release(ctypes.c_void_p(ptr))
             return resp
         
         return None
+
+    @staticmethod
+    def _decode_json(ptr):
+        return json.loads(ctypes.string_at(ptr))
+
+    @staticmethod
+    def _decode_binary(ptr):
+        # The first field of every binary record is its total length
+        record_len = ctypes.c_uint32.from_address(ptr).value
+        return decode_binary_event(ctypes.string_at(ptr, record_len))
+
+    def poll_many(self, max_events=256, timeout_ms=100):
+        '''
+        Drains up to max_events from the library in a single call.  This is significantly cheaper than
+        calling poll() in a loop when events are arriving at a high rate (e.g., terminal updates)
+        :param max_events: Maximum number of events to return
+        :param timeout_ms: How long to wait for events if none are ready
+        :return: List of event dictionaries.  Empty if no events are ready
+        '''
+        if not self.is_ok():
+            return []
+
+        if self._event_buffer is None or len(self._event_buffer) < max_events:
+            self._event_buffer = (ctypes.c_void_p * max_events)()
+
+        count = lib.sshlog_event_poll_many(self._instance, self._event_buffer, max_events, timeout_ms)
+        if count <= 0:
+            return []
+
+        try:
+            return [self._decode(ptr) for ptr in self._event_buffer[:count]]
+        finally:
+            lib.sshlog_event_release_many(self._event_buffer, count)
@@ -7,6 +7,8 @@
 #include "event_serializer.h"
 #include <arpa/inet.h>
 #include <plog/Log.h>
+#include <stdlib.h>
+#include <string.h>
 #include <string>
 #include <time.h>
 #include <yyjson.h>
@@ -188,4 +190,107 @@ char* serialize_event(void* event_struct) {
   }
 
   return json;
-}
\ No newline at end of file
+}
+
+// Appends fixed width values and length-prefixed strings to the binary record
+class BinaryWriter {
+ public:
+  template <typename T> void put(T value) { buffer.append((const char*) &value, sizeof(T)); }
+
+  void put_str(const char* value, size_t max_len) {
+    uint32_t len = (uint32_t) strnlen(value, max_len);
+    put<uint32_t>(len);
+    buffer.append(value, len);
+  }
+
+  void put_str(const std::string& value) {
+    put<uint32_t>((uint32_t) value.length());
+    buffer.append(value);
+  }
+
+  void put_ip(uint32_t s_addr) { buffer.append((const char*) &s_addr, sizeof(s_addr)); }
+
+  std::string buffer;
+};
+
+char* serialize_event_binary(void* event_struct) {
+
+  const struct event* e_generic = (const struct event*) event_struct;
+  int32_t event_type = e_generic->event_type;
+
+  BinaryWriter writer;
+  // record_len is back-filled once the body has been written
+  writer.put<uint32_t>(0);
+  writer.put<uint16_t>(SSHLOG_BINARY_EVENT_VERSION);
+  writer.put<uint16_t>((uint16_t) event_type);
+
+  if (event_type == SSHTRACE_EVENT_NEW_CONNECTION || event_type == SSHTRACE_EVENT_ESTABLISHED_CONNECTION ||
+      event_type == SSHTRACE_EVENT_AUTH_FAILED_CONNECTION || event_type == SSHTRACE_EVENT_CLOSE_CONNECTION) {
+
+    const struct connection_event* e = (const struct connection_event*) event_struct;
+    const struct connection* conn = &e->conn;
+    writer.put<uint32_t>(e->ptm_pid);
+    writer.put<int32_t>(conn->user_id);
+    writer.put<int32_t>(conn->pts_tgid);
+    writer.put<int32_t>(conn->shell_tgid);
+    writer.put<int32_t>(conn->tty_id);
+    if (event_type == SSHTRACE_EVENT_AUTH_FAILED_CONNECTION) {
+      // Auth failures are not created via ebpf, so the timestamps are already in milliseconds.
+      writer.put<int64_t>(conn->start_time);
+      writer.put<int64_t>(conn->end_time);
+    } else {
+      writer.put<int64_t>(compute_boottime_diff_from_realtime(conn->start_time));
+      writer.put<int64_t>(compute_boottime_diff_from_realtime(conn->end_time));
+    }
+    writer.put_ip(conn->tcp_info.server_ip);
+    writer.put_ip(conn->tcp_info.client_ip);
+    writer.put<uint16_t>(conn->tcp_info.server_port);
+    writer.put<uint16_t>(conn->tcp_info.client_port);
+    writer.put_str(conn->username, sizeof(conn->username));
+
+  } else if (event_type == SSHTRACE_EVENT_COMMAND_START || event_type == SSHTRACE_EVENT_COMMAND_END) {
+
+    const struct command_event* e = (const struct command_event*) event_struct;
+    const struct command* cmd = &e->cmd;
+    writer.put<uint32_t>(e->ptm_pid);
+    writer.put<int64_t>(compute_boottime_diff_from_realtime(cmd->start_time));
+    writer.put<int64_t>(compute_boottime_diff_from_realtime(cmd->end_time));
+    writer.put<int32_t>(cmd->exit_code);
+    writer.put<uint32_t>(cmd->stdout_offset);
+    writer.put<uint32_t>(cmd->parent_tgid);
+    writer.put<uint32_t>(cmd->current_tgid);
+    writer.put_str(cmd->filename, sizeof(cmd->filename));
+    writer.put_str(cmd->stdout, sizeof(cmd->stdout));
+    writer.put_str(cmd->args, sizeof(cmd->args));
+
+  } else if (event_type == SSHTRACE_EVENT_TERMINAL_UPDATE) {
+
+    const struct terminal_update_event* e = (const struct terminal_update_event*) event_struct;
+    writer.put<uint32_t>(e->ptm_pid);
+    writer.put<int32_t>(e->data_len);
+    writer.put_str(e->aggregated_data);
+
+  } else if (event_type == SSHTRACE_EVENT_FILE_UPLOAD) {
+
+    const struct file_upload_event* e = (const struct file_upload_event*) event_struct;
+    writer.put<uint32_t>(e->ptm_pid);
+    writer.put<uint32_t>(e->file_mode);
+    writer.put_str(e->target_path, sizeof(e->target_path));
+
+  } else {
+    PLOG_WARNING << "Unknown event type sent for binary serialization: " << event_type;
+    return nullptr;
+  }
+
+  uint32_t record_len = (uint32_t) writer.buffer.length();
+  memcpy(&writer.buffer[0], &record_len, sizeof(record_len));
+
+  // Released with free() via sshlog_event_release, same as the JSON strings
+  char* record = (char*) malloc(record_len);
+  if (record == nullptr) {
+    PLOG_WARNING << "binary: Unable to allocate " << record_len << " bytes for event";
+    return nullptr;
+  }
+  memcpy(record, writer.buffer.data(), record_len);
+  return record;
+}
@@ -7,7 +7,30 @@
 #ifndef SSHLOG_EVENT_SERIALIZER_H
 #define SSHLOG_EVENT_SERIALIZER_H
 
+#include <stdint.h>
+
 // Processes the event and returns JSON data
 char* serialize_event(void* event_struct);
 
+// Binary event layout (EVENT_FORMAT_BINARY).  All integers are in host byte order with no padding.
+//
+// Header (every event):
+//   uint32 record_len    total length of the record in bytes, including this header
+//   uint16 version       SSHLOG_BINARY_EVENT_VERSION
+//   uint16 event_type    SSHTRACE_EVENT_* identifier
+//   uint32 ptm_pid
+//
+// Body, by event type.  "str" fields are a uint32 byte length followed by the (non-terminated) bytes:
+//   connection events:   int32 user_id, int32 pts_pid, int32 shell_pid, int32 tty_id, int64 start_time,
+//                        int64 end_time, byte[4] server_ip, byte[4] client_ip (network order),
+//                        uint16 server_port, uint16 client_port, str username
+//   command events:      int64 start_time, int64 end_time, int32 exit_code, uint32 stdout_size,
+//                        uint32 parent_pid, uint32 pid, str filename, str stdout, str args
+//   terminal_update:     int32 data_len, str terminal_data
+//   file_upload:         uint32 file_mode, str target_path
+#define SSHLOG_BINARY_EVENT_VERSION 1
+
+// Processes the event and returns a malloc'd record in the binary layout described above
+char* serialize_event_binary(void* event_struct);
+
 #endif // SSHLOG_EVENT_SERIALIZER_H
\ No newline at end of file
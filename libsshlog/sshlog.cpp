@@ -23,7 +23,7 @@ SSHLOG* sshlog_init(sshlog_options* options) {
   plog::init((plog::Severity) options->log_level, &consoleAppender); // Initialize the logger with the both appenders
 
   PLOG_DEBUG << "Initialized logging";
-  SSHTraceWrapper* wrapper = new SSHTraceWrapper();
+  SSHTraceWrapper* wrapper = new SSHTraceWrapper(options->event_format);
 
   return wrapper;
 }
@@ -31,16 +31,17 @@ SSHLOG* sshlog_init(sshlog_options* options) {
 sshlog_options sshlog_get_default_options() {
   sshlog_options opt;
   opt.log_level = SSHLOG_LOG_LEVEL::LOG_OFF;
+  opt.event_format = SSHLOG_EVENT_FORMAT::EVENT_FORMAT_JSON;
   return opt;
 }
 
-// Returns JSON encoded event data
+// Returns encoded event data
 char* sshlog_event_poll(SSHLOG* instance, int timeout_ms) {
   SSHTraceWrapper* wrapper = (SSHTraceWrapper*) instance;
   if (wrapper->is_ok()) {
-    char* json_data = wrapper->poll(timeout_ms);
+    char* event_data = wrapper->poll(timeout_ms);
 
-    return json_data;
+    return event_data;
   } else {
     printf("WRAPPER IS NOT OK!\n");
   }
@@ -48,6 +49,20 @@ char* sshlog_event_poll(SSHLOG* instance, int timeout_ms) {
   return nullptr;
 }
 
+int sshlog_event_poll_many(SSHLOG* instance, char** events, int max_events, int timeout_ms) {
+  SSHTraceWrapper* wrapper = (SSHTraceWrapper*) instance;
+  if (events == nullptr || max_events <= 0)
+    return 0;
+
+  if (wrapper->is_ok()) {
+    return (int) wrapper->poll_many(events, (size_t) max_events, timeout_ms);
+  } else {
+    printf("WRAPPER IS NOT OK!\n");
+  }
+
+  return 0;
+}
+
 int sshlog_is_ok(SSHLOG* instance) {
   SSHTraceWrapper* wrapper = (SSHTraceWrapper*) instance;
   return !wrapper->is_ok();
@@ -56,4 +71,11 @@ int sshlog_is_ok(SSHLOG* instance) {
 // Releases the memory for the event data string
 void sshlog_event_release(char* json_event_data) { free(json_event_data); }
 
+void sshlog_event_release_many(char** json_event_data, int count) {
+  for (int i = 0; i < count; i++) {
+    free(json_event_data[i]);
+    json_event_data[i] = nullptr;
+  }
+}
+
 void sshlog_release(SSHLOG* instance) { delete (SSHTraceWrapper*) instance; }
\ No newline at end of file
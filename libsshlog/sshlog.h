@@ -23,9 +23,18 @@ enum SSHLOG_LOG_LEVEL {
   LOG_DEBUG = 5,
   LOG_VERBOSE = 6
 };
+
+enum SSHLOG_EVENT_FORMAT {
+  EVENT_FORMAT_JSON = 0, // default
+  // Compact fixed-layout records, see event_serializer.h for the layout
+  EVENT_FORMAT_BINARY = 1
+};
+
 struct sshlog_options {
   // Log messages (if enabled) will be emitted as events on the event poll
   SSHLOG_LOG_LEVEL log_level;
+  // Encoding used for the event data returned by the poll functions
+  SSHLOG_EVENT_FORMAT event_format;
 };
 
 /**
@@ -40,15 +49,29 @@ SSHLOG* sshlog_init(sshlog_options* options);
 
 sshlog_options sshlog_get_default_options();
 
-// Returns JSON encoded event data
+// Returns event data encoded according to sshlog_options.event_format (JSON by default)
 char* sshlog_event_poll(SSHLOG* instance, int timeout_ms);
 
+/**
+ * Drains up to max_events encoded events from the internal queue in a single call
+ *
+ * The event pointers are written to the caller supplied "events" array.  If no events are ready,
+ * this blocks for up to timeout_ms waiting for new events to arrive.  Each returned event must
+ * be freed, either individually with sshlog_event_release() or all at once with sshlog_event_release_many()
+ *
+ * @return The number of events written to the "events" array
+ */
+int sshlog_event_poll_many(SSHLOG* instance, char** events, int max_events, int timeout_ms);
+
 // Returns 0 if ok, 1 otherwise
 int sshlog_is_ok(SSHLOG* instance);
 
 // Releases the memory for the event data string
 void sshlog_event_release(char* json_event_data);
 
+// Releases the memory for "count" event data strings returned by sshlog_event_poll_many
+void sshlog_event_release_many(char** json_event_data, int count);
+
 void sshlog_release(SSHLOG* instance);
 
 #ifdef __cplusplus
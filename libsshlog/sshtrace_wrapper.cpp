@@ -9,6 +9,7 @@
 #include "proc_parsers/existing_connections.h"
 #include "proc_parsers/pts_parser.h"
 #include "terminal_aggregator.h"
+#include <algorithm>
 #include <argp.h>
 #include <arpa/inet.h>
 #include <iostream>
@@ -62,8 +63,9 @@ static void handle_failed_auth(struct connection_event ev, void* context) {
   handle_event(context, -1, &ev, sizeof(ev));
 }
 
-SSHTraceWrapper::SSHTraceWrapper()
-    : terminal_aggregator(AGGREGATE_TERMINAL_MILLISECONDS_DELAY), failed_login_watcher(handle_failed_auth, this) {
+SSHTraceWrapper::SSHTraceWrapper(SSHLOG_EVENT_FORMAT event_format)
+    : event_format(event_format), terminal_aggregator(AGGREGATE_TERMINAL_MILLISECONDS_DELAY),
+      failed_login_watcher(handle_failed_auth, this) {
 
   // First, identify all existing SSH connections and insert them.
   // The BPF hooks will only identify new connections moving forward
@@ -157,14 +159,29 @@ SSHTraceWrapper::~SSHTraceWrapper() {
   sshtrace_bpf__destroy(skel);
 }
 
+void SSHTraceWrapper::enqueue_terminal_updates() {
+  // We do this at poll time, rather than when the events come in so that it's always triggered at a poll interval
+  for (terminal_update_event term_ev : terminal_aggregator.get()) {
+    enqueue_serialized(&term_ev);
+  }
+}
+
+void SSHTraceWrapper::enqueue_serialized(void* event_struct) {
+  char* event_data;
+  if (event_format == SSHLOG_EVENT_FORMAT::EVENT_FORMAT_BINARY)
+    event_data = serialize_event_binary(event_struct);
+  else
+    event_data = serialize_event(event_struct);
+
+  // Serialization failures are already logged.  Never hand a null event to the poll functions
+  if (event_data != nullptr)
+    q.enqueue(event_data);
+}
+
 char* SSHTraceWrapper::poll(int timeout_ms) {
 
   // First check for events on the terminal aggregator
-  // We do this here, rather than when the events come in so that it's always triggered at a poll interval
-  for (terminal_update_event term_ev : terminal_aggregator.get()) {
-    char* json_data = serialize_event(&term_ev);
-    q.enqueue(json_data);
-  }
+  enqueue_terminal_updates();
 
   char* obj;
 
@@ -181,6 +198,23 @@ char* SSHTraceWrapper::poll(int timeout_ms) {
   return obj;
 }
 
+size_t SSHTraceWrapper::poll_many(char** events, size_t max_events, int timeout_ms) {
+
+  enqueue_terminal_updates();
+
+  // Grab everything that is already waiting in a single pass
+  size_t count = q.try_dequeue_bulk(events, max_events);
+
+  if (count == 0 && timeout_ms > 0) {
+    // Block until events arrive, but never longer than the aggregation delay.  Otherwise buffered
+    // terminal data would sit in the aggregator until the next poll
+    int wait_ms = std::min(timeout_ms, AGGREGATE_TERMINAL_MILLISECONDS_DELAY);
+    count = q.wait_dequeue_bulk_timed(events, max_events, std::chrono::milliseconds(wait_ms));
+  }
+
+  return count;
+}
+
 void SSHTraceWrapper::queue_event(void* event_struct) {
 
   // If this is a terminal update event, send it to the aggregator, don't enqueue
@@ -191,8 +225,7 @@ void SSHTraceWrapper::queue_event(void* event_struct) {
 
     terminal_aggregator.add(e->ptm_pid, e->terminal_data);
   } else {
-    char* json_data = serialize_event(event_struct);
-    q.enqueue(json_data);
+    enqueue_serialized(event_struct);
   }
 }
 
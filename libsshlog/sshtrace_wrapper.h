@@ -8,6 +8,7 @@
 #define SSHLOG_SSHTRACE_WRAPPER_H
 
 #include "failed_login_watcher.h"
+#include "sshlog.h"
 #include "sshtrace.skel.h"
 #include "terminal_aggregator.h"
 #include "utility/blockingconcurrentqueue.h"
@@ -17,18 +18,21 @@
 namespace sshlog {
 
 // This wrapper initializes the BPF interface
-// and polls it in a bg thread.  All data is serialized to JSON and
+// and polls it in a bg thread.  All data is serialized (JSON or binary) and
 // popped onto a queue which is made available to the API in the primary thread
 // the public "poll" function drains strings from the "q" object that were
 // placed there from the bg thread
 
 class SSHTraceWrapper {
  public:
-  SSHTraceWrapper();
+  SSHTraceWrapper(SSHLOG_EVENT_FORMAT event_format = SSHLOG_EVENT_FORMAT::EVENT_FORMAT_JSON);
   virtual ~SSHTraceWrapper();
 
   char* poll(int timeout_ms = 100);
 
+  // Drains up to max_events from the queue into "events".  Returns the number of events written
+  size_t poll_many(char** events, size_t max_events, int timeout_ms = 100);
+
   bool is_ok() { return bpf_err_code >= 0; }
 
   // Used by handler
@@ -46,6 +50,12 @@ class SSHTraceWrapper {
   int bpf_err_code;
 
  private:
+  // Moves any terminal data that has finished aggregating onto the queue
+  void enqueue_terminal_updates();
+  // Serializes the event in the configured format and places it on the queue
+  void enqueue_serialized(void* event_struct);
+
+  SSHLOG_EVENT_FORMAT event_format;
   moodycamel::BlockingConcurrentQueue<char*> q;
   TerminalAggregator terminal_aggregator;
   std::unique_ptr<std::thread> bpf_poll_thread;